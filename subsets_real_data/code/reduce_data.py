@@ -9,14 +9,28 @@ The reduction is made at each dwelling capacity category for the dwelling data s
 and at each household size category for the household data set, as explained in
 Section 4.1.4 of the thesis.
 
+The rows of each category are selected with the stratified sampling of stratified_sampling.py,
+and several proportions can be given at once: each data set is read once and its subsets are
+selected with a single sort of its rows.
+
     Parameters
     ----------
-    proportion : float
-        Proportion of the original data sets that the subsets will correspond to. 
+    proportions : list
+        Proportions of the original data sets that the subsets will correspond to. 
     name_dwe_df_file : str
         Name of the file containing the dwelling data set.
     name_hhd_df_file : str
         Name of the file containing the household data set.
+    engine : str, optional
+        Stratified sampling engine. With "batched", the rows are selected with random keys
+        (see stratified_sampling.py). With "legacy", the random draws of the original
+        implementation are reproduced, i.e., each subset is the same as the one of a separate
+        run with its proportion. The default is "batched".
+    chunk_size : int, optional
+        If given, the data sets are read in chunks of this many rows, twice: once to count the
+        rows of each category and once to select the rows of the subsets, which are written
+        chunk by chunk. The memory needed does not depend on the size of the data sets, and
+        the legacy engine cannot be used. The default is None.
 
     Returns
     ----------
@@ -25,118 +39,110 @@ Section 4.1.4 of the thesis.
 
 import pandas as pd
 import numpy as np
+import argparse
 import os
 import sys 
 from get_files import get_path_to_folder
+from stratified_sampling import ENGINES, get_stratified_masks, stream_stratified_subsets
 
-def reduce_data(proportion,
+def reduce_data(proportions: list,
                 name_dwe_df_file: str,
-                name_hhd_df_file: str):
+                name_hhd_df_file: str,
+                engine: str = "batched",
+                chunk_size: int = None):
     
-    # Seed
-    np.random.seed(42)
-
-    print("\nProcess for dwelling data:\n")
-
-    # Get dwelling data
-    data_path = get_path_to_folder("data")
-    dwelling_path = os.path.join(data_path, name_dwe_df_file)
-    dwelling_df = pd.read_csv(dwelling_path)
-    dwelling_df = dwelling_df.reset_index(drop=True)
-
-    print("\nThe original dwelling dataframe:")
-    print(dwelling_df)
-
-    # Get the subset taking random dwellings from each dwelling capacity class possible
-    subset_dwelling_df = dwelling_df.groupby("capacity", group_keys=False).apply(
-    lambda group: group.sample(frac=proportion))
-
-    # Delete original dwelling data set
-    del dwelling_df
-
-    print("\nThe subset generated:")
-    print(subset_dwelling_df)
-
-    # Reorder the dataframe
-    subset_dwelling_df = subset_dwelling_df.sort_index()
-
-    print("\nThe subset generated reordered:")
-    print(subset_dwelling_df)
-
-    # Create save_path_dwe
-    save_path_dwe = get_path_to_folder("data")
-
-    # Get proportion as a percentage and create the name of the file
-    prop = proportion * 100
-    prop = int(prop) 
-    save_path_dwe = os.path.join(save_path_dwe, "Houses_" + str(prop) + "%"  + ".csv")
-
-    # Set index
-    subset_dwelling_df = subset_dwelling_df.set_index("ID")
-
-    print("\nThe subset with ID as index:")
-    print(subset_dwelling_df)
-
-    # Save the new data set file in CSV format
-    subset_dwelling_df.to_csv(save_path_dwe)
-    print("\nThe new dwelling data set was saved at:", save_path_dwe)
+    if chunk_size is not None and engine == "legacy":
+        raise Exception("The legacy engine cannot read the data sets in chunks.")
 
-    # Delete subset
-    del subset_dwelling_df
-
-    print("_________________________________________________________")
-    print("\nProcess for household data:\n")
-
-    # Get household data
-    data_path = get_path_to_folder("data")
-    hhd_path = os.path.join(data_path, name_hhd_df_file)
-    hhd_df = pd.read_csv(hhd_path)
-    hhd_df = hhd_df.reset_index(drop=True)
-
-    print("\nThe original household dataframe:")
-    print(hhd_df)
-
-    # Get the subset taking random households from each household size class possible
-    subset_hhd_df = hhd_df.groupby("size", group_keys=False).apply(
-    lambda group: group.sample(frac=proportion))
-
-    # Delete original household data set
-    del hhd_df
-
-    print("\nThe subset generated:")
-    print(subset_hhd_df)
-
-    # Reorder the dataframe
-    subset_hhd_df = subset_hhd_df.sort_index()
-
-    print("\nThe subset generated reordered:")
-    print(subset_hhd_df)
-
-    # Create save_path_hhd
-    save_path_hhd = get_path_to_folder("data")
-
-    # Get proportion as a percentage and create the name of the file
-    prop = proportion * 100
-    prop = int(prop) 
-    save_path_hhd = os.path.join(save_path_hhd, "Households_" + str(prop) + "%"  + ".csv")
-
-    # Set index to ID
-    subset_hhd_df = subset_hhd_df.set_index("ID")
-
-    print("\nThe subset with ID as index:")
-    print(subset_hhd_df)
-
-    # Save the new data set file in CSV format
-    subset_hhd_df.to_csv(save_path_hhd)
-    print("\nThe new households data set was saved at:", save_path_hhd)
-
-    # Delete subset
-    del subset_hhd_df
+    # Seed
+    seed_value = 42
+    np.random.seed(seed_value)
+    rng = np.random.default_rng(seed_value)
+
+    # With the legacy engine, the subsets of each proportion continue the random draws of its 
+    # dwelling subset, as in a separate run
+    states = None
+
+    for data_set, element_name, column, name_df_file in [("Houses", "dwelling", "capacity", name_dwe_df_file),
+                                                          ("Households", "household", "size", name_hhd_df_file)]:
+
+        print("\nProcess for " + element_name + " data:\n")
+
+        # Get the names of the files of the subsets (with the proportions as percentages)
+        save_paths = [os.path.join(get_path_to_folder("data"), data_set + "_" + str(int(proportion * 100)) + "%" + ".csv")
+                      for proportion in proportions]
+
+        # Read the data set in chunks and append the subsets chunk by chunk
+        if chunk_size is not None:
+            amounts = stream_stratified_subsets(os.path.join(get_path_to_folder("data"), name_df_file), column,
+                                                proportions, save_paths, chunk_size, rng)
+            for proportion, amount, save_path in zip(proportions, amounts, save_paths):
+                print("\nThe new " + element_name + " data set with the proportion", proportion, "has", amount,
+                      element_name + "s and was saved at:", save_path)
+            print("_________________________________________________________")
+            continue
+
+        # Get data
+        data_path = get_path_to_folder("data")
+        df = pd.read_csv(os.path.join(data_path, name_df_file))
+        df = df.reset_index(drop=True)
+
+        print("\nThe original " + element_name + " dataframe:")
+        print(df)
+
+        # Get the subsets taking random elements from each category possible (dwelling 
+        # capacity or household size)
+        if engine == "legacy":
+            masks = []
+            new_states = []
+            for i, proportion in enumerate(proportions):
+                if states is None:
+                    np.random.seed(seed_value)
+                else:
+                    np.random.set_state(states[i])
+                masks.append(get_stratified_masks(df[column], [proportion], engine)[0])
+                new_states.append(np.random.get_state())
+            states = new_states
+        else:
+            masks = get_stratified_masks(df[column], proportions, engine, rng)
+
+        for proportion, mask, save_path in zip(proportions, masks, save_paths):
+
+            # The subset keeps the order of the original data set
+            subset_df = df[mask]
+
+            print("\nThe subset generated with the proportion", proportion, ":")
+            print(subset_df)
+
+            # Save the new data set file in CSV format with ID as index
+            subset_df.set_index("ID").to_csv(save_path)
+            print("\nThe new " + element_name + " data set was saved at:", save_path)
+
+            # Delete subset
+            del subset_df
+
+        # Delete original data set
+        del df
+
+        print("_________________________________________________________")
 
 if __name__ == "__main__":
 
     print(sys.argv)
 
-    reduce_data(float(sys.argv[1]),
-                sys.argv[2],
-                sys.argv[3])
\ No newline at end of file
+    # Read arguments
+    parser = argparse.ArgumentParser(description="Generate stratified subsets of the real-world data sets.")
+    parser.add_argument("proportions", type=float, nargs="+")
+    parser.add_argument("name_dwe_df_file", type=str)
+    parser.add_argument("name_hhd_df_file", type=str)
+    parser.add_argument("--engine", choices=ENGINES, default="batched",
+                        help="Stratified sampling engine. Use \"legacy\" to reproduce the original random draws.")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Read the data sets in chunks of this many rows to bound the memory.")
+    args = parser.parse_args()
+
+    reduce_data(args.proportions,
+                args.name_dwe_df_file,
+                args.name_hhd_df_file,
+                args.engine,
+                args.chunk_size)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the stratified sampling used to obtain the subsets of the real-world
+data sets: in each stratum (e.g., each dwelling capacity or household size), round(proportion *
+number of rows of the stratum) rows are selected uniformly at random, as with
+DataFrame.sample(frac=proportion) in each group of DataFrame.groupby. Rows with a missing
+stratum are never selected, as they are not part of any group.
+
+Two engines are available:
+    * "batched": the strata are encoded as integer codes, and the rows are shuffled and
+      sorted once by their codes. The rows whose rank in their stratum is
+      smaller than the sample size of the stratum are selected, so several proportions are
+      handled with the same sort (and the subset of a smaller proportion is contained in
+      the subset of a larger one);
+    * "legacy": the rows of each stratum are drawn with np.random.choice, in the order of the
+      strata, which reproduces the random draws of groupby(...).apply(lambda group:
+      group.sample(frac=proportion)) with the global state of np.random (e.g., the subsets
+      of the thesis with the seed 42).
+"""
+
+import numpy as np
+import pandas as pd
+
+ENGINES = ("batched", "legacy")
+
+def get_strata_codes(strata):
+
+    """
+    This function encodes the strata of the rows of a data set as integer codes.
+
+    Parameters
+    ----------
+    strata: pandas.Series or numpy.ndarray
+        Stratum of each row.
+
+    Returns
+    -------
+    codes : numpy.ndarray
+        Code of the stratum of each row (the codes follow the sorted strata, and rows with a
+        missing stratum get -1).
+
+    counts : numpy.ndarray
+        Number of rows of each stratum.
+    """
+
+    codes, uniques = pd.factorize(strata, sort=True)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+    return codes, counts
+
+def get_sample_sizes(counts, proportion: float):
+
+    """
+    This function computes the sample size of each stratum as DataFrame.sample(frac=proportion).
+
+    Parameters
+    ----------
+    counts: numpy.ndarray
+        Number of rows of each stratum.
+
+    proportion: float
+        Proportion of the rows of each stratum to be selected.
+
+    Returns
+    -------
+    sizes : numpy.ndarray
+        Number of rows to be selected in each stratum.
+    """
+
+    if proportion < 0 or proportion > 1:
+        raise Exception("The proportion must be between 0 and 1, but it is " + str(proportion) + ".")
+
+    # np.round rounds halves to the nearest even number, as round in DataFrame.sample
+    return np.round(proportion * counts).astype(np.int64)
+
+def get_stratified_masks(strata, proportions: list, engine: str = "batched", rng=None):
+
+    """
+    This function selects the rows of stratified subsets of a data set.
+
+    Parameters
+    ----------
+    strata: pandas.Series or numpy.ndarray
+        Stratum of each row.
+
+    proportions: list
+        Proportions of the rows of each stratum to be selected (one subset per proportion).
+
+    engine: str, optional
+        Stratified sampling engine ("batched" or "legacy").
+        The default is "batched".
+
+    rng: numpy.random.Generator, optional
+        Random number generator of the batched engine. If None, the global state of
+        np.random is used. The legacy engine always uses the global state of np.random.
+        The default is None.
+
+    Returns
+    -------
+    masks : numpy.ndarray
+        Boolean matrix where row i is the mask of the rows of the subset of proportions[i].
+    """
+
+    if engine not in ENGINES:
+        raise Exception("The engine " + str(engine) + " does not exist. Use one of: " + ", ".join(ENGINES) + ".")
+
+    codes, counts = get_strata_codes(strata)
+    masks = np.zeros((len(proportions), codes.shape[0]), dtype=bool)
+
+    if engine == "legacy":
+
+        # Get the positions of the rows of each stratum (in the order of the rows)
+        order = np.argsort(codes, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1])) + np.count_nonzero(codes < 0)
+
+        # Draw the rows of each stratum as DataFrame.sample
+        for i, proportion in enumerate(proportions):
+            sizes = get_sample_sizes(counts, proportion)
+            for k in range(counts.shape[0]):
+                positions = order[starts[k]:starts[k] + counts[k]]
+                masks[i, positions[np.random.choice(counts[k], size=sizes[k], replace=False)]] = True
+
+        return masks
+
+    # Select the rows with a rank smaller than the sample size of their stratum
+    shifted_codes, ranks = get_stratum_ranks(codes, counts.shape[0], np.random if rng is None else rng)
+    for i, proportion in enumerate(proportions):
+        sizes = np.concatenate(([0], get_sample_sizes(counts, proportion)))
+        masks[i] = ranks < sizes[shifted_codes]
+
+    return masks
+
+def get_stratum_ranks(codes, num_strata: int, random):
+
+    """
+    This function ranks the rows of each stratum in a random order: the rows are shuffled and
+    sorted by a stable sort of their codes (a radix sort for up to 2**15 strata).
+
+    Parameters
+    ----------
+    codes: numpy.ndarray
+        Code of the stratum of each row (-1 for a missing stratum, see get_strata_codes).
+
+    num_strata: int
+        Number of strata.
+
+    random: numpy.random.Generator or module
+        Random number generator (or np.random).
+
+    Returns
+    -------
+    shifted_codes : numpy.ndarray
+        Codes shifted by one, so the rows with a missing stratum get the code 0.
+
+    ranks : numpy.ndarray
+        Rank of each row in its stratum (starting at 0).
+    """
+
+    shifted_codes = (codes + 1).astype(np.int16 if num_strata < 2**15 else np.int64)
+    permutation = random.permutation(codes.shape[0])
+    order = permutation[np.argsort(shifted_codes[permutation], kind="stable")]
+
+    # Get the first position of each stratum in the sorted rows
+    all_counts = np.bincount(shifted_codes, minlength=num_strata + 1)
+    starts = np.cumsum(all_counts) - all_counts
+
+    ranks = np.empty(codes.shape[0], dtype=np.int64)
+    ranks[order] = np.arange(codes.shape[0]) - starts[shifted_codes[order]]
+
+    return shifted_codes, ranks
+
+def stream_stratified_subsets(path: str, column: str, proportions: list, save_paths: list, chunk_size: int, rng):
+
+    """
+    This function generates stratified subsets of a CSV file that is read in chunks, so the 
+    memory needed does not depend on the size of the file.
+
+    The first pass over the file counts the rows of each stratum, which gives the sample size 
+    of each stratum (as in get_stratified_masks). In the second pass, the number of rows of 
+    each stratum selected in a chunk is drawn from the hypergeometric distribution of the rows 
+    still to be selected among the rows not read yet, and these rows are selected uniformly 
+    at random in the chunk (see get_stratum_ranks). Therefore, each subset has exactly the 
+    sample size of each stratum, and its rows are a uniform random sample of the stratum.
+
+    Parameters
+    ----------
+    path: str
+        Path to the CSV file of the data set.
+
+    column: str
+        Column of the strata (e.g., "capacity" or "size").
+
+    proportions: list
+        Proportions of the rows of each stratum to be selected (one subset per proportion).
+
+    save_paths: list
+        Paths to the CSV files of the subsets (with the column ID as index, as in reduce_data).
+
+    chunk_size: int
+        Number of rows of each chunk.
+
+    rng: numpy.random.Generator
+        Random number generator.
+
+    Returns
+    -------
+    amounts : list
+        Number of rows of each subset.
+    """
+
+    if chunk_size is None or chunk_size <= 0:
+        raise Exception("The size of the chunks must be a positive integer.")
+
+    # First pass: count the rows of each stratum
+    counts_by_stratum = pd.Series(dtype=np.int64)
+    for chunk in pd.read_csv(path, usecols=[column], chunksize=chunk_size):
+        counts_by_stratum = counts_by_stratum.add(chunk[column].value_counts(), fill_value=0)
+    counts_by_stratum = counts_by_stratum.sort_index()
+    strata = counts_by_stratum.index
+    counts = counts_by_stratum.to_numpy().astype(np.int64)
+
+    # Get the rows still to be selected in each stratum and the rows not read yet
+    missing = [get_sample_sizes(counts, proportion) for proportion in proportions]
+    amounts = [int(sizes.sum()) for sizes in missing]
+    remaining = counts.copy()
+
+    # Second pass: select the rows of each chunk and append them to the subsets
+    for number, chunk in enumerate(pd.read_csv(path, chunksize=chunk_size)):
+
+        codes = np.asarray(pd.Categorical(chunk[column], categories=strata).codes, dtype=np.int64)
+        chunk_counts = np.bincount(codes[codes >= 0], minlength=counts.shape[0])
+        shifted_codes, ranks = get_stratum_ranks(codes, counts.shape[0], rng)
+
+        for i, save_path in enumerate(save_paths):
+            selected = rng.hypergeometric(missing[i], remaining - missing[i], chunk_counts)
+            missing[i] -= selected
+            mask = ranks < np.concatenate(([0], selected))[shifted_codes]
+            chunk[mask].set_index("ID").to_csv(save_path, mode="w" if number == 0 else "a", header=number == 0)
+
+        remaining -= chunk_counts
+
+    return amounts
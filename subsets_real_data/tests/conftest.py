@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Configuration of the tests of the scripts of the folder "code", which import each other as 
+scripts (e.g., "from get_files import get_path_to_folder").
+
+Run them with "python -m pytest tests" at the sub-directory "subsets_real_data".
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "code"))
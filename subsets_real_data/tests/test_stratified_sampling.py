@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the stratified sampling of the subsets of the real-world data sets (see
+code/stratified_sampling.py).
+
+Run them with "python -m pytest tests" at the sub-directory "subsets_real_data".
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stratified_sampling import get_stratified_masks, get_sample_sizes, stream_stratified_subsets
+
+def get_fake_data(size: int, seed: int = 0):
+
+    # Data set with unbalanced strata (including a stratum with a single row) and missing strata
+    rng = np.random.default_rng(seed)
+    strata = rng.choice([1.0, 2.0, 3.0, 5.0, np.nan], size=size, p=[0.5, 0.3, 0.15, 0.04, 0.01])
+    strata[size // 2] = 8.0
+    return pd.DataFrame({"ID": np.arange(100, 100 + size), "capacity": strata})
+
+def get_groupby_sample(df: pd.DataFrame, proportion: float):
+
+    # Subset of the original implementation of reduce_data (reordered)
+    subset_df = df.groupby("capacity", group_keys=False).apply(lambda group: group.sample(frac=proportion))
+    return subset_df.sort_index()
+
+@pytest.mark.parametrize("proportion", [0.0, 0.1, 0.25, 0.5, 0.9, 1.0])
+def test_legacy_engine_reproduces_groupby_sample(proportion):
+
+    df = get_fake_data(3000)
+
+    np.random.seed(42)
+    expected = get_groupby_sample(df, proportion)
+    expected_state = np.random.get_state()
+
+    np.random.seed(42)
+    mask = get_stratified_masks(df["capacity"], [proportion], "legacy")[0]
+    state = np.random.get_state()
+
+    np.testing.assert_array_equal(df.index[mask], expected.index)
+
+    # The next random draws (e.g., the ones of the household data set) must not change
+    np.testing.assert_array_equal(state[1], expected_state[1])
+    assert state[2:] == expected_state[2:]
+
+def test_legacy_engine_reproduces_consecutive_subsets():
+
+    df = get_fake_data(2000)
+
+    np.random.seed(42)
+    expected = [get_groupby_sample(df, 0.3).index, get_groupby_sample(df, 0.6).index]
+
+    np.random.seed(42)
+    masks = get_stratified_masks(df["capacity"], [0.3, 0.6], "legacy")
+
+    for mask, indices in zip(masks, expected):
+        np.testing.assert_array_equal(df.index[mask], indices)
+
+@pytest.mark.parametrize("engine", ["batched", "legacy"])
+def test_sizes_of_the_strata_match_groupby_sample(engine):
+
+    df = get_fake_data(5000)
+    proportions = [0.05, 0.125, 0.5, 0.75]
+
+    np.random.seed(42)
+    masks = get_stratified_masks(df["capacity"], proportions, engine, np.random.default_rng(42))
+
+    for proportion, mask in zip(proportions, masks):
+        expected_sizes = df.loc[get_groupby_sample(df, proportion).index, "capacity"].value_counts().sort_index()
+        sizes = df[mask]["capacity"].value_counts().sort_index()
+        pd.testing.assert_series_equal(sizes, expected_sizes)
+
+        # Rows with a missing stratum are never selected
+        assert not df[mask]["capacity"].isna().any()
+
+def test_batched_subsets_are_nested():
+
+    df = get_fake_data(5000)
+    masks = get_stratified_masks(df["capacity"], [0.1, 0.4, 0.8], "batched", np.random.default_rng(1))
+
+    assert not (masks[0] & ~masks[1]).any()
+    assert not (masks[1] & ~masks[2]).any()
+
+def test_batched_rows_are_selected_uniformly():
+
+    # Each row of a stratum of 20 rows is selected in about a quarter of the subsets of 5 rows
+    strata = np.repeat([1, 2], [20, 40])
+    rng = np.random.default_rng(7)
+    frequencies = np.mean([get_stratified_masks(strata, [0.25], "batched", rng)[0] for _ in range(4000)], axis=0)
+
+    np.testing.assert_allclose(frequencies, 0.25, atol=0.04)
+
+def test_batched_engine_depends_only_on_the_generator():
+
+    strata = get_fake_data(1000)["capacity"]
+    masks = get_stratified_masks(strata, [0.3], "batched", np.random.default_rng(3))
+
+    np.testing.assert_array_equal(get_stratified_masks(strata, [0.3], "batched", np.random.default_rng(3)), masks)
+    assert not np.array_equal(get_stratified_masks(strata, [0.3], "batched", np.random.default_rng(4)), masks)
+
+@pytest.mark.parametrize("chunk_size", [11, 500, 10000])
+def test_streamed_subsets_have_the_sizes_of_the_strata(tmp_path, chunk_size):
+
+    df = get_fake_data(3000)
+    path = str(tmp_path / "data.csv")
+    df.to_csv(path, index=False)
+    proportions = [0.2, 0.5]
+    save_paths = [str(tmp_path / ("subset_" + str(i) + ".csv")) for i in range(len(proportions))]
+
+    amounts = stream_stratified_subsets(path, "capacity", proportions, save_paths, chunk_size, np.random.default_rng(5))
+
+    counts = df["capacity"].value_counts().sort_index()
+    for proportion, amount, save_path in zip(proportions, amounts, save_paths):
+        subset_df = pd.read_csv(save_path)
+        expected_sizes = pd.Series(get_sample_sizes(counts.to_numpy(), proportion), index=counts.index, name="count")
+        sizes = subset_df["capacity"].value_counts().reindex(counts.index, fill_value=0)
+
+        assert amount == subset_df.shape[0]
+        pd.testing.assert_series_equal(sizes, expected_sizes, check_dtype=False)
+
+        # The subset keeps the rows (and their order) of the data set
+        assert subset_df["ID"].is_unique and subset_df["ID"].is_monotonic_increasing
+        pd.testing.assert_frame_equal(subset_df, df[df["ID"].isin(subset_df["ID"])].reset_index(drop=True))
+
+@pytest.mark.parametrize("proportion", [-0.1, 1.5])
+def test_invalid_proportions_raise(proportion):
+
+    with pytest.raises(Exception):
+        get_stratified_masks(np.array([1, 2, 3]), [proportion])
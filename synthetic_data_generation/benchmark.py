@@ -0,0 +1,215 @@
+# Benchmark of the stages of the generation of synthetic data sets
+#
+# Each stage (gmm_address, gmm_dwelling, gmm_workplace, gmm_hhd and the reduction of
+# create_final_data, without reading and writing files) runs in a new process, so its peak resident set size (RSS) is not
+# affected by the other stages. The inputs of a stage (e.g., the addresses of gmm_dwelling)
+# are generated in the same process before the stage starts, and they are included in
+# its peak RSS. The results are written to a JSON file.
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import contextlib
+import platform
+import argparse
+import json
+import time
+import sys
+import os
+from code.scenarios import SCENARIOS
+from code.options import ENGINES
+
+# Larger data sets generated with the parameters at data/GMM_parameters:
+# (amount_addresses, proportion_workplaces)
+LARGE_CASES = [(100000, 0.3), (345000, 0.3), (1000000, 0.3)]
+
+# Proportion of the initial data sets kept by the reduction in the larger cases
+LARGE_CASES_KEPT = 0.9
+
+STAGES = ("gmm_address", "gmm_dwelling", "gmm_workplace", "gmm_hhd", "create_final_data")
+
+def get_cases(suite: str):
+
+    # Get the cases of the selected suite (the data sets of the thesis are the scenarios of scenarios.py)
+    cases = []
+    if suite in ("reproduction", "all"):
+        for scenario in SCENARIOS.values():
+            cases.append({"case": scenario.name,
+                          "param_path": scenario.param_path,
+                          "amount_addresses": scenario.amount_addresses,
+                          "proportion_workplaces": scenario.proportion_workplaces,
+                          "amount_dwe": scenario.amount_dwe,
+                          "amount_hhd": scenario.amount_hhd})
+    if suite in ("large", "all"):
+        for amount_addresses, proportion_workplaces in LARGE_CASES:
+            cases.append({"case": "city_" + str(amount_addresses) + "addr",
+                          "param_path": "data/GMM_parameters",
+                          "amount_addresses": amount_addresses,
+                          "proportion_workplaces": proportion_workplaces,
+                          "amount_dwe": None,
+                          "amount_hhd": None})
+
+    return cases
+
+def get_peak_rss():
+
+    # Peak RSS of the current process in MB (None if it is not available)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is given in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def run_stage(case: dict, stage: str, engine: str):
+
+    # Import the modules in the process of the stage
+    import numpy as np
+    from code.get_files import get_path_to_folder
+    from code.gmm_parameters import load_gmm_parameters
+    from code.create_gmm_data_dwe import gmm_address, gmm_dwelling
+    from code.create_gmm_data_hhd import gmm_workplace, gmm_hhd
+    from code.create_final_datasets_from_initial_ones import reduce_initial_data
+
+    param_path = get_path_to_folder(case["param_path"])
+    amount_addresses = case["amount_addresses"]
+    amount_workplace = int(round(case["proportion_workplaces"] * amount_addresses))
+
+    # Generate the inputs of the stage and get the stage
+    np.random.seed(10)
+    if stage in ("gmm_address", "gmm_dwelling"):
+        param_addr = load_gmm_parameters(param_path, "city", "addresses")
+        if stage == "gmm_address":
+            run = lambda: gmm_address(amount_addresses, param_addr, engine)
+        else:
+            param_dwe = load_gmm_parameters(param_path, "city", "houses")
+            df_addr = gmm_address(amount_addresses, param_addr, engine)
+            run = lambda: gmm_dwelling(df_addr, param_dwe, engine)
+
+    elif stage in ("gmm_workplace", "gmm_hhd"):
+        param_workplace = load_gmm_parameters(param_path, "city", "workplaces")
+        if stage == "gmm_workplace":
+            run = lambda: gmm_workplace(amount_workplace, param_workplace, engine)
+        else:
+            param_hhd = load_gmm_parameters(param_path, "city", "hhd")
+            df_workplace = gmm_workplace(amount_workplace, param_workplace, engine)
+            run = lambda: gmm_hhd(df_workplace, param_hhd, engine)
+
+    else:
+        # Each initial data set is generated with its own seed, as in create_initial_dwe_data and create_initial_hhd_data
+        df_dwe = gmm_dwelling(gmm_address(amount_addresses, load_gmm_parameters(param_path, "city", "addresses"), engine),
+                              load_gmm_parameters(param_path, "city", "houses"), engine)
+        np.random.seed(10)
+        df_hhd = gmm_hhd(gmm_workplace(amount_workplace, load_gmm_parameters(param_path, "city", "workplaces"), engine),
+                         load_gmm_parameters(param_path, "city", "hhd"), engine)
+        # The batched engine may generate fewer elements than the final data sets of the thesis
+        amount_dwe = min(case["amount_dwe"] or int(LARGE_CASES_KEPT * df_dwe.shape[0]), df_dwe.shape[0])
+        amount_hhd = min(case["amount_hhd"] or int(LARGE_CASES_KEPT * df_hhd.shape[0]), df_hhd.shape[0])
+        rows = df_dwe.shape[0] + df_hhd.shape[0]
+        run = lambda: reduce_initial_data(df_dwe, df_hhd, amount_dwe, amount_hhd, engine)
+
+    # Run the stage (its messages are discarded)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = run()
+        seconds = time.perf_counter() - start
+
+    if stage != "create_final_data":
+        rows = result.shape[0]
+
+    return {"rows": rows, "seconds": seconds, "peak_rss_mb": get_peak_rss()}
+
+def run_benchmark(suite: str, engines: list, stages: list, repeat: int):
+
+    # Each run of a stage uses a new process
+    context = multiprocessing.get_context("spawn")
+    results = []
+
+    for case in get_cases(suite):
+        for engine in engines:
+            for stage in stages:
+
+                runs = []
+                for _ in range(repeat):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        runs.append(executor.submit(run_stage, case, stage, engine).result())
+
+                # Keep the fastest run, which is the least affected by other processes
+                best = min(runs, key=lambda r: r["seconds"])
+                result = {"case": case["case"],
+                          "amount_addresses": case["amount_addresses"],
+                          "proportion_workplaces": case["proportion_workplaces"],
+                          "engine": engine,
+                          "stage": stage,
+                          "rows": best["rows"],
+                          "seconds": best["seconds"],
+                          "all_seconds": [r["seconds"] for r in runs],
+                          "rows_per_second": best["rows"] / best["seconds"] if best["seconds"] > 0 else None,
+                          "peak_rss_mb": max((r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None), default=None)}
+                results.append(result)
+
+                print(result["case"], engine, stage, result["rows"], "rows",
+                      round(result["seconds"], 3), "s", result["peak_rss_mb"] and round(result["peak_rss_mb"], 1), "MB")
+
+    return results
+
+def compare_results(results: list, baseline_results: list, tolerance: float):
+
+    # Get the stages that are slower than in the baseline by more than the tolerance
+    baseline = {(r["case"], r["engine"], r["stage"]): r for r in baseline_results}
+    regressions = []
+
+    for result in results:
+        key = (result["case"], result["engine"], result["stage"])
+        if key not in baseline or baseline[key]["seconds"] <= 0:
+            continue
+        ratio = result["seconds"] / baseline[key]["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append((key, ratio))
+            print("Regression:", *key, "is", round(ratio, 2), "times slower than in the baseline")
+
+    return regressions
+
+# The guard is needed by the processes of the stages
+if __name__ == "__main__":
+
+    # Read arguments
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the generation of synthetic data sets.")
+    parser.add_argument("--suite", choices=("reproduction", "large", "all"), default="reproduction",
+                        help="Sizes of the data sets: the data sets of the thesis, larger data sets or both.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=["legacy", "batched"])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="Number of runs of each stage (the fastest one is kept).")
+    parser.add_argument("--output", type=str, default="benchmark_results.json", help="JSON file of the results.")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="JSON file of previous results. The script fails if a stage became slower than the tolerance.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Accepted relative increase of the time of a stage with respect to the baseline.")
+    args = parser.parse_args()
+
+    import numpy as np
+    import pandas as pd
+
+    # Read previous results before the output file may be overwritten
+    baseline_results = None
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline_results = json.load(f)["results"]
+
+    results = run_benchmark(args.suite, args.engines, args.stages, args.repeat)
+
+    # Save results with information on the environment
+    with open(args.output, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "python": platform.python_version(),
+                   "numpy": np.__version__,
+                   "pandas": pd.__version__,
+                   "platform": platform.platform(),
+                   "cpu_count": os.cpu_count(),
+                   "results": results}, f, indent=2)
+    print("\nThe results were saved at", args.output)
+
+    # Compare with previous results
+    if baseline_results is not None and compare_results(results, baseline_results, args.tolerance):
+        sys.exit(1)
@@ -0,0 +1,508 @@
+# Command-line interface of the generation of synthetic data sets
+#
+# Subcommands:
+#   generate        generate the final data sets of a municipality (as main.py)
+#   reproduce       reproduce the data sets of the thesis (as main_reproduction.py)
+#   reduce          reduce saved initial data sets to the final data sets
+#   grow            add residential addresses (and workplaces) to saved initial data sets
+#   view            generate a part of a data set of the philox engine (see code/lazy_dataset.py)
+#   subset          generate stratified subsets of the real-world data sets (subsets_real_data)
+#   validate        check the arguments of generate and the parameter files without generating data sets
+#   list-scenarios  list the scenarios of the thesis
+#   serve           start the local generation service (see code/service.py)
+#
+# The arguments are checked before numpy, pandas or the modules of the generation are
+# imported, and these modules are only imported by the subcommands that need them, so
+# validate and list-scenarios start in a few milliseconds.
+
+from code.options import ENGINES, OUTPUT_FORMATS, SCHEMAS, PARAMETER_KINDS
+import argparse
+import importlib.util
+import logging
+import json
+import sys
+import os
+
+# Sub-directories of the parameters and of the initial data sets
+PARAM_PATH = "data/GMM_parameters/"
+INITIAL_DATA_PATH = "data/datasets/initial"
+
+# Folder of the subsets of the real-world data sets
+SUBSETS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "subsets_real_data")
+
+def add_instrumentation_arguments(parser):
+
+    # Arguments of the instrumentation (see code/instrumentation.py)
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Record the time, rows and memory of each stage and write them to this JSON file.")
+    parser.add_argument("--no-print-data", action="store_false", dest="print_data",
+                        help="Do not print the complete data sets.")
+    parser.add_argument("--profile", type=str, default=None,
+                        help="Profile the generation with cProfile and write the statistics to this file.")
+
+def add_generate_arguments(parser):
+
+    # Arguments of generate and validate
+    parser.add_argument("city_name", type=str)
+    parser.add_argument("amount_addresses", type=int)
+    parser.add_argument("proportion_workplaces", type=float)
+    parser.add_argument("amount_dwe", type=int)
+    parser.add_argument("amount_hhd", type=int)
+    parser.add_argument("--engine", choices=ENGINES, default="batched",
+                        help="Sampling engine. Use \"legacy\" to reproduce the original random draws, or \"philox\" to compute "
+                        + "the numbers of each row from its ID (the same rows with chunks, shards or growth).")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Generate the initial data sets in chunks of this many addresses (or workplaces) to bound the memory.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", dest="output_format",
+                        help="File format of the data sets (parquet and feather require pyarrow).")
+    parser.add_argument("--keep-initial", action="store_true",
+                        help="Save the initial data sets at data/datasets/initial.")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="Run the dwelling and household branches in separate processes.")
+    parser.add_argument("--shards", type=int, default=None, dest="num_shards",
+                        help="Generate the initial data sets in this many shards in a pool of processes.")
+    parser.add_argument("--schema", choices=SCHEMAS, default="standard",
+                        help="Schema of the columns. \"compact\" uses 32-bit coordinates and integer parent_ID/child_index columns.")
+    parser.add_argument("--no-cache", action="store_false", dest="use_cache",
+                        help="Generate the initial data sets again even if the saved ones were generated with the same inputs.")
+    parser.add_argument("--exact", action="store_true",
+                        help="Generate exactly amount_dwe dwellings and amount_hhd households without removing rows "
+                        + "(amount_addresses and proportion_workplaces are not used).")
+    parser.add_argument("--seed", type=int, default=10, dest="seed_value", metavar="SEED",
+                        help="Seed of the random draws (part of the names of the files).")
+
+def get_parser():
+
+    # Parser of the subcommands
+    parser = argparse.ArgumentParser(description="Generate synthetic dwelling and household data sets.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Generate the final data sets of a municipality.")
+    add_generate_arguments(generate)
+    add_instrumentation_arguments(generate)
+
+    validate = subparsers.add_parser("validate", help="Check the arguments of generate and the parameter files.")
+    add_generate_arguments(validate)
+    validate.add_argument("--full", action="store_true",
+                          help="Also parse the parameters and factorize the covariance matrices (imports numpy).")
+
+    reproduce = subparsers.add_parser("reproduce", help="Reproduce the synthetic data sets of the thesis.")
+    reproduce.add_argument("amount_dwe", type=int, nargs="?")
+    reproduce.add_argument("amount_hhd", type=int, nargs="?")
+    reproduce.add_argument("--all", action="store_true", help="Generate all the scenarios of the thesis in one run.")
+    reproduce.add_argument("--scenarios", nargs="+", default=None,
+                           help="Generate these scenarios in one run (e.g., 10000_dwe_7000_hhd).")
+    reproduce.add_argument("--workers", type=int, default=None,
+                           help="Maximum number of processes of --all and --scenarios (one per CPU by default).")
+    reproduce.add_argument("--list", action="store_true", help="List the scenarios of the thesis.")
+    reproduce.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", dest="output_format",
+                           help="File format of the data sets (parquet and feather require pyarrow).")
+    reproduce.add_argument("--concurrent", action="store_true",
+                           help="Run the dwelling and household branches in separate processes.")
+    reproduce.add_argument("--no-cache", action="store_false", dest="use_cache",
+                           help="Generate the initial data sets again even if the saved ones were generated with the same inputs.")
+    add_instrumentation_arguments(reproduce)
+
+    reduce = subparsers.add_parser("reduce", help="Reduce saved initial data sets to the final data sets.")
+    reduce.add_argument("city_name", type=str)
+    reduce.add_argument("amount_addresses", type=int)
+    reduce.add_argument("proportion_workplaces", type=float)
+    reduce.add_argument("amount_dwe", type=int)
+    reduce.add_argument("amount_hhd", type=int)
+    reduce.add_argument("--engine", choices=ENGINES, default="batched",
+                        help="Selection of the rows to be removed. Use \"legacy\" to reproduce the original random draws.")
+    reduce.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", dest="output_format",
+                        help="File format of the initial and final data sets.")
+    add_instrumentation_arguments(reduce)
+
+    grow = subparsers.add_parser("grow", help="Add residential addresses (and workplaces) to saved initial data sets.")
+    grow.add_argument("city_name", type=str)
+    grow.add_argument("amount_addresses", type=int)
+    grow.add_argument("proportion_workplaces", type=float)
+    grow.add_argument("amount_new_addresses", type=int)
+    add_instrumentation_arguments(grow)
+
+    view = subparsers.add_parser("view", help="Generate the dwellings or households of a part of a data set of the philox engine.")
+    view.add_argument("city_name", type=str)
+    view.add_argument("data_set", choices=("Houses", "Households"))
+    view.add_argument("amount_points", type=int,
+                      help="Number of residential addresses (Houses) or workplaces (Households) of the complete data set.")
+    view.add_argument("--ids", type=int, nargs=2, default=None, metavar=("START", "STOP"),
+                      help="Range of the IDs of the residential addresses or workplaces (STOP is not included).")
+    view.add_argument("--clusters", type=int, nargs="+", default=None, help="Clusters (\"Cluster Nr.\") of the rows.")
+    view.add_argument("--cells", nargs="+", default=None, dest="grid_cells", help="Grid cells (\"Gitter_ID_100m\") of the rows.")
+    view.add_argument("--points", action="store_true", help="Generate the residential addresses or workplaces instead.")
+    view.add_argument("--seed", type=int, default=10, dest="seed_value")
+    view.add_argument("--schema", choices=SCHEMAS, default="standard")
+    view.add_argument("--batch-size", type=int, default=100000,
+                      help="Number of IDs generated at once.")
+    view.add_argument("--output", type=str, default=None,
+                      help="CSV file of the rows (written batch by batch). By default, the rows are written to the standard output.")
+
+    subset = subparsers.add_parser("subset", help="Generate stratified subsets of the real-world data sets.")
+    subset.add_argument("proportions", type=float, nargs="+")
+    subset.add_argument("name_dwe_df_file", type=str)
+    subset.add_argument("name_hhd_df_file", type=str)
+    subset.add_argument("--engine", choices=("batched", "legacy"), default="batched",
+                        help="Stratified sampling engine. Use \"legacy\" to reproduce the original random draws.")
+    subset.add_argument("--chunk-size", type=int, default=None,
+                        help="Read the data sets in chunks of this many rows to bound the memory.")
+
+    subparsers.add_parser("list-scenarios", help="List the scenarios of the thesis.")
+
+    serve = subparsers.add_parser("serve", help="Start the local generation service (see code/service.py).")
+    serve.add_argument("--port", type=int, default=8765, help="Port on localhost.")
+    serve.add_argument("--cities", nargs="+", default=[], dest="city_names",
+                       help="Municipalities whose parameters are loaded at the start.")
+    serve.add_argument("--workers", type=int, default=None, help="Number of processes (one per CPU by default).")
+    serve.add_argument("--verbose", action="store_true", help="Log the requests.")
+
+    # Each subcommand reports its errors with its own usage
+    for subparser in subparsers.choices.values():
+        subparser.set_defaults(parser=subparser)
+
+    return parser
+
+def get_path(sub_dir: str):
+
+    # Full path to a sub-directory of synthetic_data_generation (as code/get_files.py,
+    # but the sub-directory does not need to exist)
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), sub_dir.strip("/"))
+
+def check_parameter_file(path: str, has_probabilities: bool):
+
+    # Check the structure of a parameter file: the features, the probabilities of the nuclei
+    # (for addresses and workplaces) and, for each nucleus, the means, the standard deviations
+    # and the correlation matrix
+    with open(path) as f:
+        list_parameters = json.load(f)
+
+    if not isinstance(list_parameters, list) or len(list_parameters) < 1 or not isinstance(list_parameters[0], list):
+        return "it must be a list starting with the list of features"
+    num_features = len(list_parameters[0])
+    first = 2 if has_probabilities else 1
+    if (len(list_parameters) - first) % 3 != 0 or len(list_parameters) == first:
+        return "it must contain the means, the standard deviations and the correlation matrix of each nucleus"
+    num_nucleus = (len(list_parameters) - first) // 3
+    if has_probabilities and len(list_parameters[1]) != num_nucleus:
+        return "it has " + str(len(list_parameters[1])) + " probabilities for " + str(num_nucleus) + " nuclei"
+
+    for j in range(num_nucleus):
+        means, sds, correlation = list_parameters[first + 3*j:first + 3*j + 3]
+        if len(means) != num_features or len(sds) != num_features or len(correlation) != num_features \
+           or any(len(row) != num_features for row in correlation):
+            return "the parameters of nucleus " + str(j) + " do not match the " + str(num_features) + " features"
+
+    return None
+
+def check_output_format(parser, output_format: str):
+
+    # The columnar formats require pyarrow, which is checked before the data sets are generated
+    if output_format != "csv" and importlib.util.find_spec("pyarrow") is None:
+        parser.error("--format " + output_format + " requires the package pyarrow (pip install pyarrow, see requirements.txt)")
+
+def validate_generate_arguments(parser, args, check_files: bool = True):
+
+    # Check the arguments of generate without importing the generation
+    if not args.exact and args.amount_addresses <= 0:
+        parser.error("amount_addresses must be a positive integer")
+    if not args.exact and args.proportion_workplaces <= 0:
+        parser.error("proportion_workplaces must be positive")
+    if args.amount_dwe <= 0 or args.amount_hhd <= 0:
+        parser.error("amount_dwe and amount_hhd must be positive integers")
+    if args.chunk_size is not None and args.chunk_size <= 0:
+        parser.error("--chunk-size must be a positive integer")
+    if args.num_shards is not None and args.num_shards <= 0:
+        parser.error("--shards must be a positive integer")
+    if args.engine == "legacy" and (args.chunk_size is not None or args.num_shards is not None):
+        parser.error("the legacy engine cannot be combined with --chunk-size or --shards")
+    if args.num_shards is not None and (args.chunk_size is not None or args.concurrent):
+        parser.error("--shards cannot be combined with --chunk-size or --concurrent")
+    if not 0 <= args.seed_value < 2**32:
+        parser.error("--seed must be between 0 and 2**32 - 1")
+    check_output_format(parser, args.output_format)
+
+    if not check_files:
+        return
+
+    # Check the parameter files
+    for kind, has_probabilities in PARAMETER_KINDS.items():
+        path = os.path.join(get_path(PARAM_PATH), args.city_name + "_" + kind + ".json")
+        if not os.path.exists(path):
+            parser.error("the parameter file " + path + " does not exist")
+        try:
+            problem = check_parameter_file(path, has_probabilities)
+        except ValueError as error:
+            problem = "it is not valid JSON (" + str(error) + ")"
+        if problem is not None:
+            parser.error("the parameter file " + path + " is not valid: " + problem)
+
+def start_instrumentation_from_arguments(args):
+
+    from code.instrumentation import start_instrumentation
+
+    # Start the instrumentation of the stages
+    if args.trace is not None:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.trace is not None or args.profile is not None or not args.print_data:
+        start_instrumentation(trace_path=args.trace, print_data=args.print_data, profile_path=args.profile)
+
+def run_generate(parser, args):
+
+    validate_generate_arguments(parser, args)
+    start_instrumentation_from_arguments(args)
+    from code.instrumentation import finish_instrumentation
+
+    # The trace and the profile are written even if the command fails
+    try:
+        from code.pipeline import generate_city, generate_exact_city
+
+        # Generate final data sets with the selected sizes
+        if args.exact:
+            generate_exact_city(city_name = args.city_name,
+                                amount_dwe = args.amount_dwe,
+                                amount_hhd = args.amount_hhd,
+                                param_path = PARAM_PATH,
+                                engine = args.engine,
+                                output_format = args.output_format,
+                                save_points = args.keep_initial,
+                                schema = args.schema,
+                                seed_value = args.seed_value)
+
+        else:
+            # Generate initial and final data sets
+            generate_city(city_name = args.city_name,
+                          amount_addresses = args.amount_addresses,
+                          proportion_workplaces = args.proportion_workplaces,
+                          amount_dwe = args.amount_dwe,
+                          amount_hhd = args.amount_hhd,
+                          param_path = PARAM_PATH,
+                          initial_data_path = INITIAL_DATA_PATH,
+                          engine = args.engine,
+                          output_format = args.output_format,
+                          save_initial = args.keep_initial,
+                          chunk_size = args.chunk_size,
+                          concurrent = args.concurrent,
+                          num_shards = args.num_shards,
+                          schema = args.schema,
+                          use_cache = args.use_cache,
+                          seed_value = args.seed_value)
+    finally:
+        finish_instrumentation()
+
+def run_validate(parser, args):
+
+    validate_generate_arguments(parser, args)
+
+    # Parse the parameters as the generation does
+    if args.full:
+        from code.gmm_parameters import load_gmm_parameters
+        for kind in PARAMETER_KINDS:
+            try:
+                load_gmm_parameters(get_path(PARAM_PATH), args.city_name, kind)
+            except Exception as error:
+                parser.error("the parameters of " + args.city_name + "_" + kind + ".json are not valid: " + str(error))
+
+    print("The arguments and the parameter files are valid.")
+
+def run_reproduce(parser, args):
+
+    from code.scenarios import SCENARIOS, get_scenario_by_name
+
+    # List the scenarios
+    if args.list:
+        run_list_scenarios(parser, args)
+        return
+
+    # Get the scenarios before the generation is imported
+    if args.all or args.scenarios:
+        try:
+            scenarios = list(SCENARIOS.values()) if args.all else [get_scenario_by_name(name) for name in args.scenarios]
+        except Exception as error:
+            parser.error(str(error))
+    else:
+        if args.amount_dwe is None or args.amount_hhd is None:
+            parser.error("amount_dwe and amount_hhd are required without --all or --scenarios")
+        name = str(args.amount_dwe) + "_dwe_" + str(args.amount_hhd) + "_hhd"
+        if name not in SCENARIOS:
+            parser.error("the scenario " + name + " does not exist. Use one of: " + ", ".join(SCENARIOS))
+        scenarios = [SCENARIOS[name]]
+    check_output_format(parser, args.output_format)
+
+    start_instrumentation_from_arguments(args)
+    from code.instrumentation import finish_instrumentation
+
+    try:
+        from code.scenarios import generate_scenarios
+        from code.pipeline import generate_city
+
+        # Generate all the scenarios in one run
+        if args.all or args.scenarios:
+            generate_scenarios(scenarios, engine="legacy", output_format=args.output_format, max_workers=args.workers,
+                               use_cache=args.use_cache)
+
+        else:
+            # Generate initial and final data sets (the legacy engine saves the initial data sets)
+            scenario = scenarios[0]
+            generate_city(city_name = scenario.city_name,
+                          amount_addresses = scenario.amount_addresses,
+                          proportion_workplaces = scenario.proportion_workplaces,
+                          amount_dwe = scenario.amount_dwe,
+                          amount_hhd = scenario.amount_hhd,
+                          param_path = scenario.param_path,
+                          initial_data_path = INITIAL_DATA_PATH,
+                          engine = "legacy",
+                          output_format = args.output_format,
+                          concurrent = args.concurrent,
+                          use_cache = args.use_cache)
+    finally:
+        finish_instrumentation()
+
+def run_reduce(parser, args):
+
+    if args.amount_dwe <= 0 or args.amount_hhd <= 0:
+        parser.error("amount_dwe and amount_hhd must be positive integers")
+    check_output_format(parser, args.output_format)
+
+    from code.dataset_io import get_initial_df_name, get_final_df_name
+
+    # Check that the initial data sets were saved (e.g., with generate --keep-initial)
+    names = {}
+    for data_set in ["Houses", "Households"]:
+        names[data_set] = get_initial_df_name(data_set, args.city_name, args.amount_addresses, args.proportion_workplaces,
+                                              output_format=args.output_format)
+        if not os.path.exists(os.path.join(get_path(INITIAL_DATA_PATH), names[data_set])):
+            parser.error("the initial data set " + names[data_set] + " does not exist at " + INITIAL_DATA_PATH)
+
+    start_instrumentation_from_arguments(args)
+    from code.instrumentation import finish_instrumentation
+
+    try:
+        from code.create_final_datasets_from_initial_ones import create_final_data
+
+        # Generate final data sets
+        create_final_data(initial_dwe_df_name = names["Houses"],
+                          initial_hhd_df_name = names["Households"],
+                          amount_dwe = args.amount_dwe,
+                          amount_hhd = args.amount_hhd,
+                          final_dwe_df_name = get_final_df_name("Houses", args.city_name, args.amount_dwe, args.amount_hhd, output_format=args.output_format),
+                          final_hhd_df_name = get_final_df_name("Households", args.city_name, args.amount_dwe, args.amount_hhd, output_format=args.output_format),
+                          engine = args.engine)
+    finally:
+        finish_instrumentation()
+
+def run_grow(parser, args):
+
+    if args.amount_new_addresses < 0:
+        parser.error("amount_new_addresses must be a non-negative integer")
+
+    from code.dataset_io import get_initial_df_name
+
+    # Check that the initial data sets were saved as CSV files
+    for data_set in ["Addresses", "Houses", "Workplaces", "Households"]:
+        name = get_initial_df_name(data_set, args.city_name, args.amount_addresses, args.proportion_workplaces)
+        if not os.path.exists(os.path.join(get_path(INITIAL_DATA_PATH), name)):
+            parser.error("the initial data set " + name + " does not exist at " + INITIAL_DATA_PATH)
+
+    start_instrumentation_from_arguments(args)
+    from code.instrumentation import finish_instrumentation
+
+    try:
+        from code.create_gmm_data_dwe import grow_initial_dwe_data
+        from code.create_gmm_data_hhd import grow_initial_hhd_data
+
+        # Extend the initial data sets
+        for grow_initial_data in [grow_initial_hhd_data, grow_initial_dwe_data]:
+            grow_initial_data(amount_addresses = args.amount_addresses,
+                              amount_new_addresses = args.amount_new_addresses,
+                              proportion_workplaces = args.proportion_workplaces,
+                              param_path = PARAM_PATH,
+                              city_name = args.city_name,
+                              data_path = INITIAL_DATA_PATH)
+    finally:
+        finish_instrumentation()
+
+def run_view(parser, args):
+
+    if args.amount_points < 0 or args.batch_size <= 0:
+        parser.error("amount_points must be non-negative and --batch-size positive")
+    for kind in ["addresses", "houses"] if args.data_set == "Houses" else ["workplaces", "hhd"]:
+        if not os.path.exists(os.path.join(get_path(PARAM_PATH), args.city_name + "_" + kind + ".json")):
+            parser.error("the parameter file " + args.city_name + "_" + kind + ".json does not exist at " + PARAM_PATH)
+
+    from code.lazy_dataset import LazyDataset
+
+    view = LazyDataset(args.data_set, args.amount_points, args.city_name, PARAM_PATH, args.seed_value, args.schema, args.batch_size)
+    view = view.filter(ids=args.ids, clusters=args.clusters, grid_cells=args.grid_cells)
+
+    # Write the rows batch by batch
+    output = sys.stdout if args.output is None else open(args.output, "w", newline="")
+    try:
+        header = True
+        for df in view.iter_points() if args.points else view.iter_batches():
+            df.to_csv(output, header=header, index=False)
+            header = False
+    finally:
+        if args.output is not None:
+            output.close()
+
+def run_subset(parser, args):
+
+    # Check the arguments before the subsets are imported
+    if any(proportion < 0 or proportion > 1 for proportion in args.proportions):
+        parser.error("the proportions must be between 0 and 1")
+    if args.chunk_size is not None and (args.chunk_size <= 0 or args.engine == "legacy"):
+        parser.error("--chunk-size must be a positive integer and cannot be combined with the legacy engine")
+    for name in [args.name_dwe_df_file, args.name_hhd_df_file]:
+        if not os.path.exists(os.path.join(SUBSETS_PATH, "data", name)):
+            parser.error("the file " + name + " does not exist at " + os.path.join(SUBSETS_PATH, "data"))
+
+    # The modules of subsets_real_data import each other as scripts
+    sys.path.insert(0, os.path.join(SUBSETS_PATH, "code"))
+    from reduce_data import reduce_data
+
+    reduce_data(args.proportions, args.name_dwe_df_file, args.name_hhd_df_file, args.engine, args.chunk_size)
+
+def run_list_scenarios(parser, args):
+
+    from code.scenarios import SCENARIOS
+
+    for scenario in SCENARIOS.values():
+        print(scenario.name, scenario.amount_addresses, "addresses", scenario.proportion_workplaces, "workplaces")
+
+def run_serve(parser, args):
+
+    # Check the parameter files of the municipalities loaded at the start
+    if args.workers is not None and args.workers <= 0:
+        parser.error("--workers must be a positive integer")
+    for city_name in args.city_names:
+        for kind in PARAMETER_KINDS:
+            if not os.path.exists(os.path.join(get_path(PARAM_PATH), city_name + "_" + kind + ".json")):
+                parser.error("the parameter file " + city_name + "_" + kind + ".json does not exist at " + PARAM_PATH)
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from code.service import serve
+    serve(port=args.port, city_names=args.city_names, param_path=PARAM_PATH, max_workers=args.workers)
+
+COMMANDS = {"generate": run_generate,
+            "validate": run_validate,
+            "reproduce": run_reproduce,
+            "reduce": run_reduce,
+            "grow": run_grow,
+            "view": run_view,
+            "subset": run_subset,
+            "list-scenarios": run_list_scenarios,
+            "serve": run_serve}
+
+def main(argv: list = None):
+
+    # Read arguments and run the subcommand
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    COMMANDS[args.command](args.parser, args)
+
+# The guard is needed by the processes of the concurrent mode, of the shards and of the scenarios
+if __name__ == "__main__":
+
+    main()
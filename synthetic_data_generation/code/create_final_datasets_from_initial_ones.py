@@ -9,79 +9,421 @@ number of households and dwellings.
     Parameters
     ----------
     initial_dwe_df_name : string
-        Name of the file containing the initial dwelling data set. 
+        Name of the file containing the initial dwelling data set (CSV, Parquet or Feather,
+        according to its extension).
     initial_hhd_df_name : string
-        Name of the file containing the initial household data set.
+        Name of the file containing the initial household data set (CSV, Parquet or Feather,
+        according to its extension).
     amount_dwe : int
         Number of dwellings in the final dwelling data set.
     amount_hhd : int
         Number of households in the final household data set.
     final_dwe_df_name : string
-        Name of the file containing the final dwelling data set. 
+        Name of the file containing the final dwelling data set (CSV, Parquet or Feather,
+        according to its extension).
     final_hhd_df_name : string
-        Name of the file containing the final household data set.
+        Name of the file containing the final household data set (CSV, Parquet or Feather,
+        according to its extension).
+    engine : string, optional
+        Selection of the rows to be removed. With "batched", the rows are selected 
+        with a single sampling without replacement. With "legacy", the original sequence 
+        of random indices is reproduced. The default is "batched".
+    seed_value : int, optional
+        Seed of the random draws. The default is 10.
 
     Returns
     ----------
     None.
 """
 
-import pandas as pd 
 import numpy as np
 import os
 from code.get_files import get_path_to_folder
+from code.gmm_sampling import check_engine
+from code.instrumentation import trace_stage, print_dataframe
+from code.dataset_io import read_dataset, write_dataset
+
+# Index of the random stream of the reduction of each data set (not used by the legacy engine)
+REDUCTION_STREAMS = {"dwelling": 0, "household": 1}
+
+def get_rows_to_remove(original_amount: int, amount_to_remove: int, engine: str = "batched", rng=None):
+
+    """
+    This function selects, uniformly at random, the rows of a data set to be removed.
+
+    Parameters
+    ----------
+    original_amount: int
+        Number of rows of the data set.
+
+    amount_to_remove: int
+        Number of rows to be removed.
+
+    engine: str, optional
+        With "batched", the rows are selected with a single sampling without replacement.
+        With "legacy", the indices are drawn with np.random.randint(0, original_amount-1) 
+        until there are amount_to_remove different indices, which reproduces the data sets 
+        generated with the original implementation (where the last row is never removed).
+        The default is "batched".
+
+    rng: numpy.random.Generator, optional
+        Random number generator of the selection (see get_reduction_generators). If None, the 
+        global state of np.random is used. It must be None with the legacy engine.
+        The default is None.
+
+    Returns
+    -------
+    rows_to_remove : numpy.ndarray
+        Boolean mask of the rows to be removed.
+    """
+
+    check_engine(engine)
+    if engine == "legacy" and rng is not None:
+        raise Exception("The legacy engine uses the global state of np.random.")
+
+    # Check amounts
+    if amount_to_remove < 0:
+        raise Exception("The final data set cannot have more rows (" + str(original_amount - amount_to_remove) 
+                        + ") than the initial one (" + str(original_amount) + ").")
+    max_amount_to_remove = original_amount - 1 if engine == "legacy" else original_amount
+    if amount_to_remove > max_amount_to_remove:
+        raise Exception("It is not possible to remove " + str(amount_to_remove) + " rows from a data set with " 
+                        + str(original_amount) + " rows.")
+
+    rows_to_remove = np.zeros(original_amount, dtype=bool)
+
+    if engine == "legacy":
+
+        # Draw indices in batches. Each drawn index adds at most one new index, so a batch with the 
+        # amount of missing indices never draws beyond the last index drawn by the original loop 
+        # (and the state of the random number generator stays the same)
+        amount_selected = 0
+        while amount_selected < amount_to_remove:
+            draws = np.random.randint(0, original_amount-1, size=amount_to_remove - amount_selected)
+            unique_draws = np.unique(draws)
+            new_indices = unique_draws[~rows_to_remove[unique_draws]]
+            rows_to_remove[new_indices] = True
+            amount_selected += new_indices.size
+
+        return rows_to_remove
+
+    # Select all the rows at once
+    random = np.random if rng is None else rng
+    rows_to_remove[random.choice(original_amount, size=amount_to_remove, replace=False)] = True
+
+    return rows_to_remove
+
+def reduce_data_set(df, amount: int, element_name: str, engine: str = "batched", rng=None):
+
+    """
+    This function removes randomly selected rows of a data set until it has the selected 
+    number of rows. The random draws use the global state of np.random, unless a random 
+    number generator is given.
+
+    Parameters
+    ----------
+    df: dataframe
+        Initial data set.
+
+    amount: int
+        Number of rows of the final data set.
+
+    element_name: str
+        Name of the elements of the data set in singular ("dwelling" or "household").
+
+    engine: str, optional
+        Selection of the rows to be removed ("batched" or "legacy").
+        The default is "batched".
+
+    rng: numpy.random.Generator, optional
+        Random number generator of the selection (see get_rows_to_remove).
+        The default is None.
+
+    Returns
+    -------
+    df : dataframe
+        Final data set.
+    """
+
+    # Get amount of elements
+    original_amount = df.shape[0]
+
+    print("\nThe initial amount of " + element_name + "s is", original_amount)
+
+    print_dataframe("\nThe initial " + element_name + " data set is:", df)
+
+    # Get amount of elements to remove
+    amount_to_remove = original_amount - amount
+    print("\nThe amount of " + element_name + "s to be removed is", amount_to_remove) 
+
+    # Select the rows to be removed
+    with trace_stage("row selection", rows=original_amount):
+        rows_to_remove = get_rows_to_remove(original_amount, amount_to_remove, engine, rng)
+
+    # Remove the elements corresponding to the selected rows
+    with trace_stage("removal", rows=amount):
+        df = df[~rows_to_remove]
+
+    print_dataframe("\nThe new " + element_name + " data set is:", df)
+    print("\nIts amount of " + element_name + "s is", df.shape[0])
+
+    return df
+
+def get_reduction_generators(engine: str = "batched", seed_value: int = 10):
+
+    """
+    This function returns the random number generators of the reductions of the dwelling and 
+    household data sets.
+
+    With the legacy engine, np.random is seeded and both data sets are reduced with its global 
+    state, one after the other, as in the original implementation. With the other engines, each 
+    data set gets its own stream spawned from a SeedSequence of the seed, so both reductions are 
+    independent (e.g., they can run in separate processes without waiting for each other).
+
+    Parameters
+    ----------
+    engine: str, optional
+        Selection of the rows to be removed ("batched" or "legacy").
+        The default is "batched".
+
+    seed_value: int, optional
+        Seed of the random draws.
+        The default is 10.
+
+    Returns
+    -------
+    rngs : list
+        Random number generators of the reductions of the dwelling and household data sets 
+        (None with the legacy engine), in the order of REDUCTION_STREAMS.
+    """
+
+    # Set seed
+    np.random.seed(seed_value)
+
+    if engine == "legacy":
+        return [None] * len(REDUCTION_STREAMS)
+
+    return [np.random.default_rng(stream) for stream in np.random.SeedSequence(seed_value).spawn(len(REDUCTION_STREAMS))]
+
+def seed_reduction(engine: str = "batched", previous_reductions: list = (), seed_value: int = 10,
+                   element_name: str = "dwelling"):
+
+    """
+    This function returns the random number generator used to select the rows of one final 
+    data set (see get_reduction_generators), so that a data set can be reduced in a separate 
+    process with the same random draws it would have in create_final_data.
+
+    With the legacy engine, np.random is seeded as in create_final_data and the selection of 
+    the rows of the data sets reduced before the current one is replayed. The replay only 
+    needs the amounts of rows of the previous data sets.
+
+    Parameters
+    ----------
+    engine: str, optional
+        Selection of the rows to be removed ("batched" or "legacy").
+        The default is "batched".
+
+    previous_reductions: list, optional
+        Pairs (initial amount of rows, final amount of rows) of the data sets reduced before, 
+        e.g., [(initial amount of dwellings, amount_dwe)] for the household data set. They are 
+        only used by the legacy engine.
+        The default is ().
+
+    seed_value: int, optional
+        Seed of the random draws.
+        The default is 10.
+
+    element_name: str, optional
+        Name of the elements of the data set in singular ("dwelling" or "household").
+        The default is "dwelling".
+
+    Returns
+    -------
+    rng : numpy.random.Generator
+        Random number generator of the reduction (None with the legacy engine).
+    """
+
+    rng = get_reduction_generators(engine, seed_value)[REDUCTION_STREAMS[element_name]]
+
+    # Replay the random draws of the previous reductions
+    if engine == "legacy":
+        for original_amount, amount in previous_reductions:
+            get_rows_to_remove(original_amount, original_amount - amount, engine)
+
+    return rng
+
+def reduce_and_save_data_set(df, amount: int, final_df_name: str, element_name: str,
+                             engine: str = "batched", previous_reductions: list = (), seed_value: int = 10):
+
+    """
+    This function reduces one initial data set, given as a dataframe, with the random draws 
+    of create_final_data and saves it at the sub-directory "data/datasets/final".
+
+    Parameters
+    ----------
+    df: dataframe
+        Initial data set.
+
+    amount: int
+        Number of rows of the final data set.
+
+    final_df_name: str
+        Name of the file of the final data set (its extension defines the format).
+
+    element_name: str
+        Name of the elements of the data set in singular ("dwelling" or "household").
+
+    engine: str, optional
+        Selection of the rows to be removed ("batched" or "legacy").
+        The default is "batched".
+
+    previous_reductions: list, optional
+        Pairs (initial amount of rows, final amount of rows) of the data sets reduced before 
+        (see seed_reduction).
+        The default is ().
+
+    seed_value: int, optional
+        Seed of the random draws.
+        The default is 10.
+
+    Returns
+    -------
+    path_to_new_file : str
+        Path to the saved file.
+    """
+
+    rng = seed_reduction(engine, previous_reductions, seed_value, element_name)
+
+    print("\nCreation of final " + element_name + " data set:")
+    df = reduce_data_set(df, amount, element_name, engine, rng)
+
+    # Save final data set
+    path_to_new_file = save_final_data(df, final_df_name)
+    print("\nThe new " + element_name + " data set was saved at", path_to_new_file)
+
+    return path_to_new_file
+
+def create_final_data_set(initial_df_name: str, amount: int, final_df_name: str, element_name: str,
+                          engine: str = "batched", previous_reductions: list = (), seed_value: int = 10):
+
+    """
+    This function reads one initial data set from the sub-directory "data/datasets/initial", 
+    reduces it with the random draws of create_final_data and saves it at the sub-directory 
+    "data/datasets/final".
+
+    Parameters
+    ----------
+    initial_df_name: str
+        Name of the file of the initial data set (its extension defines the format).
+
+    amount: int
+        Number of rows of the final data set.
+
+    final_df_name: str
+        Name of the file of the final data set (its extension defines the format).
+
+    element_name: str
+        Name of the elements of the data set in singular ("dwelling" or "household").
+
+    engine: str, optional
+        Selection of the rows to be removed ("batched" or "legacy").
+        The default is "batched".
+
+    previous_reductions: list, optional
+        Pairs (initial amount of rows, final amount of rows) of the data sets reduced before 
+        (see seed_reduction).
+        The default is ().
+
+    seed_value: int, optional
+        Seed of the random draws.
+        The default is 10.
+
+    Returns
+    -------
+    path_to_new_file : str
+        Path to the saved file.
+    """
+
+    # Get initial data set 
+    df_path = get_path_to_folder("data/datasets/initial")
+    df_path = os.path.join(df_path, initial_df_name)
+    df = read_dataset(df_path)
+
+    return reduce_and_save_data_set(df, amount, final_df_name, element_name, engine, previous_reductions, seed_value)
+
+def reduce_initial_data(df_dwe, df_hhd, amount_dwe: int, amount_hhd: int, engine: str = "batched", seed_value: int = 10):
+
+    """
+    This function transforms the initial dwelling and household data sets, given as dataframes, 
+    into data sets with the selected number of dwellings and households. It uses the same 
+    random draws as create_final_data, but no file is read or written.
+
+    Parameters
+    ----------
+    df_dwe: dataframe
+        Initial dwelling data set.
+
+    df_hhd: dataframe
+        Initial household data set.
+
+    amount_dwe: int
+        Number of dwellings in the final dwelling data set.
+
+    amount_hhd: int
+        Number of households in the final household data set.
+
+    engine: str, optional
+        Selection of the rows to be removed ("batched" or "legacy").
+        The default is "batched".
+
+    seed_value: int, optional
+        Seed of the random draws.
+        The default is 10.
+
+    Returns
+    -------
+    df_dwe : dataframe
+        Final dwelling data set.
+
+    df_hhd : dataframe
+        Final household data set.
+    """
+
+    # Set seed
+    rng_dwe, rng_hhd = get_reduction_generators(engine, seed_value)
+
+    print("\nCreation of final dwelling data set:")
+    df_dwe = reduce_data_set(df_dwe, amount_dwe, "dwelling", engine, rng_dwe)
+
+    print("\nCreation of final household data set:") 
+    df_hhd = reduce_data_set(df_hhd, amount_hhd, "household", engine, rng_hhd)
+
+    return df_dwe, df_hhd
 
 def create_final_data(initial_dwe_df_name: str,
                         initial_hhd_df_name: str,
                         amount_dwe: int,
                         amount_hhd: int,
                         final_dwe_df_name: str,
-                        final_hhd_df_name: str):
+                        final_hhd_df_name: str,
+                        engine: str = "batched",
+                        seed_value: int = 10):
     
     # Set seed
-    seed_value = 10
-    np.random.seed(seed_value)
+    rng_dwe, rng_hhd = get_reduction_generators(engine, seed_value)
 
     print("\nCreation of final dwelling data set:")
 
     # Get initial dwelling data set 
     df_path = get_path_to_folder("data/datasets/initial")
     df_path = os.path.join(df_path, initial_dwe_df_name)
-    df = pd.read_csv(df_path)
-
-    # Get amount of dwellings
-    original_amount_dwe = df.shape[0]
-
-    print("\nThe initial amount of dwellings is", original_amount_dwe)
-
-    print("\nThe initial dwelling data set is:")
-    print(df) 
-
-    # Get amount of dwellings to remove
-    amount_dwe_to_remove = original_amount_dwe - amount_dwe
-    print("\nThe amount of dwellings to be removed is", amount_dwe_to_remove) 
+    df = read_dataset(df_path)
 
-    # Create the list of indices to be removed
-    list_indices_to_remove = []
-    while len(list_indices_to_remove) < amount_dwe_to_remove:
-        index = np.random.randint(0, original_amount_dwe-1)
-        if index not in list_indices_to_remove:
-            list_indices_to_remove.append(index) 
-
-    # Remove the dwellings corresponding to the selected indices
-    df = df.drop(list_indices_to_remove)
-
-    print("\nThe new dwelling data set is:")
-    print(df) 
-    print("\nIts amount of dwellings is", df.shape[0])
-
-    # Get path to save final dwelling data set
-    path_to_new_file_dwe = get_path_to_folder("data/datasets/final")
-    path_to_new_file_dwe = os.path.join(path_to_new_file_dwe, final_dwe_df_name)
+    # Get final dwelling data set
+    df = reduce_data_set(df, amount_dwe, "dwelling", engine, rng_dwe)
 
     # Save final dwelling data set
-    df.to_csv(path_to_new_file_dwe, index=False) 
-
+    path_to_new_file_dwe = save_final_data(df, final_dwe_df_name)
     print("\nThe new dwelling data set was saved at", path_to_new_file_dwe) 
 
     print("\nCreation of final household data set:") 
@@ -89,37 +431,41 @@ def create_final_data(initial_dwe_df_name: str,
     # Get initial household data set
     df_path = get_path_to_folder("data/datasets/initial")
     df_path = os.path.join(df_path, initial_hhd_df_name)
-    df = pd.read_csv(df_path)
+    df = read_dataset(df_path)
 
-    # Get amount of households
-    original_amount_hhd = df.shape[0]
-    print("\nThe initial amount of households is", original_amount_hhd)
+    # Get final household data set
+    df = reduce_data_set(df, amount_hhd, "household", engine, rng_hhd)
 
-    print("\nThe initial household data set is:")
-    print(df) 
+    # Save final household data set
+    path_to_new_file_hhd = save_final_data(df, final_hhd_df_name)
+    print("\nThe new household data set was saved at", path_to_new_file_hhd)
 
-    # Get the amount of households to be removed
-    amount_hhd_to_remove = original_amount_hhd - amount_hhd 
-    print("\nThe amount of households to be removed is", amount_hhd_to_remove) 
+    return path_to_new_file_dwe, path_to_new_file_hhd
 
-    # Create the list of indices to be removed
-    list_indices_to_remove = []
-    while len(list_indices_to_remove) < amount_hhd_to_remove:
-        index = np.random.randint(0, original_amount_hhd-1)
-        if index not in list_indices_to_remove:
-            list_indices_to_remove.append(index) 
+def save_final_data(df, final_df_name: str):
 
-    # Remove the households corresponding to the selected indices
-    df = df.drop(list_indices_to_remove)
+    """
+    This function saves a final data set at the sub-directory "data/datasets/final".
 
-    print("\nThe new household data set is:")
-    print(df) 
-    print("\nIts amount of households is", df.shape[0])
+    Parameters
+    ----------
+    df: dataframe
+        Final data set.
 
-    # Get path to save final household data set
-    path_to_new_file_hhd = get_path_to_folder("data/datasets/final")
-    path_to_new_file_hhd = os.path.join(path_to_new_file_hhd, final_hhd_df_name)
+    final_df_name: str
+        Name of the file (its extension defines the format).
 
-    # Save final household data set
-    df.to_csv(path_to_new_file_hhd, index=False) 
-    print("\nThe new household data set was saved at", path_to_new_file_hhd)
\ No newline at end of file
+    Returns
+    -------
+    path_to_new_file : str
+        Path to the saved file.
+    """
+
+    # Get path to save final data set
+    path_to_new_file = get_path_to_folder("data/datasets/final")
+    path_to_new_file = os.path.join(path_to_new_file, final_df_name)
+
+    # Save final data set
+    write_dataset(df, path_to_new_file)
+
+    return path_to_new_file
@@ -7,11 +7,15 @@ Section 4.2 of the thesis.
 """
 
 import numpy as np
-import pandas as pd
-import json 
-from code.get_files import get_path_to_folder
+from code.gmm_sampling import sample_nuclei_points, build_point_dataframe, expand_points
+from code.nucleus_selection import NucleusSelector
+from code.gmm_parameters import get_gmm_parameters
+from code.philox import PhiloxGenerator, get_philox_generator
+from code.initial_data import InitialDataBranch, create_initial_data, create_exact_data, grow_initial_data
+from code.instrumentation import trace_stage
 
-def gmm_address(data_size: int, list_parameters: list):
+def gmm_address(data_size: int, list_parameters: list, engine: str = "batched", selection_method: str = "searchsorted",
+                first_id: int = 0, rng=None, schema: str = "standard"):
 
     """
     This function generates the data set of residential addresses using GMM.
@@ -21,8 +25,8 @@ def gmm_address(data_size: int, list_parameters: list):
     data_size: int
         Number of elements in the data set that will be generated.
         
-    list_parameters : list
-        It must have the form [list_of_address_features, probabilities, 
+    list_parameters : list or GMMParameters
+        Parsed parameters (see gmm_parameters.py) or a list of the form [list_of_address_features, probabilities, 
         list_means_1, list_standard_deviations_1, list_correlations_1, ..., 
         list_means_N, list_standard_deviations_N, list_correlations_N], where:
         * list_of_address_features is the list of characteristics that we will 
@@ -35,111 +39,67 @@ def gmm_address(data_size: int, list_parameters: list):
         * list_correlations_i is the correlation matrix of distribution (nucleus) i in 
           "list of lists" (LIL) format.
 
+    engine: str, optional
+        Sampling engine. With "batched", the points of each nucleus are generated at once.
+        With "legacy", one point is generated per row following the original order of the
+        random draws, which reproduces the data sets generated with the original implementation.
+        With "philox", the numbers of each row are computed from its ID (see philox.py).
+        The default is "batched".
+
+    selection_method: str, optional
+        Method used to assign the points to the nuclei ("searchsorted" or "alias").
+        Only "searchsorted" reproduces the assignment of the original implementation.
+        The default is "searchsorted".
+
+    first_id: int, optional
+        ID of the first element of the data set (used when the data set is generated in chunks).
+        The default is 0.
+
+    rng: numpy.random.Generator or PhiloxGenerator, optional
+        Random number generator (used when the data set is generated in shards). If None, 
+        the global state of np.random is used. With the "philox" engine, it is the generator of 
+        the seed (if None, the seed is 10).
+        The default is None.
+
+    schema: str, optional
+        Schema of the columns ("standard" or "compact", see schema.py).
+        The default is "standard".
+
     Returns
     -------
     df : dataframe
         The generated data set.
     """
 
-    # Get input
-    w = list_parameters[1]
-    num_nucleus = len(w) 
-    select_nucleus = np.random.uniform(low=0.0, high=1.0,size=data_size)
-    num_characteristics = len(list_parameters[0])
-    
-    # Build the list of selected nuclei
-    nuclei_selected = []
-    for i in select_nucleus:
-        upper = w[0]
-        index = 0
-        found = False 
-        while found == False: 
-            if i <= upper: 
-                nuclei_selected.append(index)  
-                found = True 
-            else: 
-                index += 1
-                upper += w[index]
-                
-    # Build a list containing the cholesky factorizations of the covariance matrices
-    list_cholesky = []
-    for i in range(num_nucleus):
-        
-        # Create the diagonal matrix of standard deviations
-        sd_matrix = np.zeros((num_characteristics, num_characteristics))
-        for j in range(num_characteristics):
-            sd_matrix[j,j] = round(list_parameters[(3*i)+3][j], 2) 
-        
-        # Get the covariance matrix and store the matrix from its cholesky factorization
-        cov = sd_matrix @ np.array(list_parameters[(3*i)+4]) @ sd_matrix
-        q = np.linalg.cholesky(cov) 
-        list_cholesky.append(q)    
-        
-    # Initialize dataframe and ID count
-    df = []
-    id = 0
-    
-    # Generate the elements of the data set
-    for j in nuclei_selected:
+    # Get parsed parameters
+    parameters = get_gmm_parameters(list_parameters, has_probabilities=True)
 
-        # Get a vector from the standard Gaussian distribution
-        z = np.random.normal(size=num_characteristics) 
+    # Get input (the philox engine draws the numbers of each row from its ID, see philox.py)
+    random = np.random if rng is None else rng
+    if engine == "philox":
+        random = (rng if isinstance(rng, PhiloxGenerator) else get_philox_generator(engine)).for_table("addresses")
+        ids = np.arange(first_id, first_id + data_size)
+    with trace_stage("nucleus selection", rows=data_size):
+        if engine == "philox":
+            select_nucleus = random.uniform(ids)
+        else:
+            select_nucleus = random.uniform(low=0.0, high=1.0,size=data_size)
 
-        # Transform into the Gaussian distribution with parameters associated to nucleus j
-        # (this x stores the observation in a vector where the sequence of values follows the sequence 
-        # of characteristics inserted in the parameters of the input)
-        x = (list_cholesky[j] @ z) + list_parameters[(3*j) + 2]    
-        
-        # Transform the numpy arrays into lists
-        x = list(x) 
-        
-        # Insert ID and nucleus number into x 
-        x.insert(0, id)
-        x.append(j)
+        # Build the list of selected nuclei and get the amount of points of each nucleus
+        nuclei_selected, counts = NucleusSelector(parameters.probabilities, selection_method).select(select_nucleus, return_counts=True)
 
-        # Insert x into the dataframe
-        df.append(x) 
+    # Generate the elements of the data set
+    with trace_stage("sampling", rows=data_size):
+        z = random.normal(ids, parameters.num_characteristics, first_block=1) if engine == "philox" else None
+        values = sample_nuclei_points(nuclei_selected, parameters.cholesky, parameters.means, engine, counts, rng, z)
 
-        # Update ID count 
-        id += 1  
-        
-    # Initialize the head of the dataframe
-    characteristics = list_parameters[0].copy() 
-    characteristics.insert(0, "ID")
-    characteristics.append("Cluster Nr.")
-
-    # Identify the coordinates of the input corresponding to lables X and Y
-    for j in range(len(characteristics)):
-        if characteristics[j] == "X":
-            x_coor = j 
-        if characteristics[j] == "Y":
-            y_coor = j 
-    
-    # Round some necessary values for the dataframe and insert grid cell information
-    for vector in df: 
+    # Round some necessary values, insert grid cell information and generate dataframe
+    with trace_stage("post-processing", rows=data_size):
+        df = build_point_dataframe(values, nuclei_selected, parameters.features, first_id, schema)
 
-        # Treat information on amount of dwellings per building
-        vector[3] = int(round(vector[3]))
-        if vector[3] <= 0:
-            vector[3] = 1
-        
-        # Insert grid cell labels and information on its lower-left corner coordinates
-        grid_cell_name = "100mN" + str(round(vector[y_coor] - (vector[y_coor] % 100))) + "E" + str(round(vector[x_coor] - (vector[x_coor] % 100)))
-        vector.append(grid_cell_name)
-        vector.append(round(vector[x_coor] - (vector[x_coor] % 100)))
-        vector.append(round(vector[y_coor] - (vector[y_coor] % 100)))
-
-    # Insert more information into the head of the dataframe    
-    characteristics.append("Gitter_ID_100m")
-    characteristics.append("coord_x_grid")
-    characteristics.append("coord_y_grid")
-        
-    # Generate dataframe
-    df = pd.DataFrame(df, columns = characteristics)    
-    
-    return df  
+    return df
 
-def gmm_dwelling(address_data, list_parameters: list):
+def gmm_dwelling(address_data, list_parameters: list, engine: str = "batched", rng=None, schema: str = "standard"):
 
     """
     This function generates the dwelling data set from the address data set using 
@@ -150,8 +110,8 @@ def gmm_dwelling(address_data, list_parameters: list):
     address_data: dataframe
         Dataframe containing the address data set.
         
-    list_parameters : list
-        It must have the form [list_of_dwelling_features, 
+    list_parameters : list or GMMParameters
+        Parsed parameters (see gmm_parameters.py) or a list of the form [list_of_dwelling_features, 
         list_means_1, list_standard_deviations_1, list_correlations_1, ..., 
         list_means_N, list_standard_deviations_N, list_correlations_N], where:
         * list_of_dwelling_features is the list of characteristics that we will 
@@ -162,100 +122,58 @@ def gmm_dwelling(address_data, list_parameters: list):
         * list_correlations_i is the correlation matrix of these features associated to 
           nucleus i in "list of lists" (LIL) format.
 
+    engine: str, optional
+        Sampling engine. With "batched", the features of the elements of each nucleus are 
+        generated at once. With "legacy", they are generated element by element following the 
+        original order of the random draws. With "philox", the features of each element are 
+        computed from the ID of its point and its index in the point (see philox.py).
+        The default is "batched".
+
+    rng: numpy.random.Generator or PhiloxGenerator, optional
+        Random number generator. If None, the global state of np.random is used. With the 
+        "philox" engine, it is the generator of the seed (if None, the seed is 10).
+        The default is None.
+
+    schema: str, optional
+        Schema of the columns ("standard" or "compact", see schema.py).
+        The default is "standard".
+
     Returns
     -------
     df : dataframe
         The generated data set.
     """
 
-    # Get input
-    num_characteristics = len(list_parameters[0])
-
-    # Define the number of nuclei
-    num_nucleus = int((len(list_parameters)-1)/3) 
-                
-    # Build a list containing the cholesky factorizations of the covariance matrices
-    list_cholesky = []
-    for i in range(num_nucleus):
-        
-        # Get the diagonal matrix of standard deviations
-        sd_matrix = np.zeros((num_characteristics, num_characteristics))
-        for j in range(num_characteristics):
-            sd_matrix[j,j] = round(list_parameters[(3*i)+2][j], 2) 
-        
-        # Get covariance matrix
-        cov = sd_matrix @ np.array(list_parameters[(3*i)+3]) @ sd_matrix
-        
-        # Get and store matrix from cholesky factorization
-        q = np.linalg.cholesky(cov) 
-        list_cholesky.append(q)   
-        
-    # Initialize dataframe
-    df = []
-    
-    # Generate the elements of the data set
-    for index, row in address_data.iterrows():
-        
-        for i in range(row["amount of dwellings per building"]):
-
-            # Initialize row of the data set
-            dwelling_line = [] 
-
-            # Insert ID with the form [building ID]_[index of dwelling in this building]
-            dwelling_line.append(str(row["ID"]) + "_" + str(i))
-
-            # Insert spatial coordinates
-            dwelling_line.append(row["X"])
-            dwelling_line.append(row["Y"])
-
-            # Get vector from standard Gaussian distribution
-            z = np.random.normal(size=num_characteristics) 
+    # Get parsed parameters
+    parameters = get_gmm_parameters(list_parameters, has_probabilities=False)
 
-            # Get vector from Gaussian distribution corresponding to features [cost, size]
-            x = (list_cholesky[row["Cluster Nr."]] @ z) + list_parameters[(3*row["Cluster Nr."]) + 1]
+    if engine == "philox":
+        rng = (rng if isinstance(rng, PhiloxGenerator) else get_philox_generator(engine)).for_table("dwellings")
 
-            # Insert cost and size to row
-            dwelling_line.append(x[0])
-            dwelling_line.append(x[1])  
+    # Generate the elements of the data set by expanding each building
+    df = expand_points(address_data, "amount of dwellings per building", parameters.cholesky, parameters.means, parameters.features,
+                       ["Gitter_ID_100m", "coord_x_grid", "coord_y_grid", "Cluster Nr."], engine, rng, schema)
 
-            # Inset remaining information from the building
-            dwelling_line.append(row["Gitter_ID_100m"])
-            dwelling_line.append(row["coord_x_grid"]) 
-            dwelling_line.append(row["coord_y_grid"]) 
-            dwelling_line.append(row["Cluster Nr."]) 
-
-            # Update the dataframe
-            df.append(dwelling_line)  
-        
-    # Generate the head of the data set
-    characteristics = list_parameters[0].copy() 
-    characteristics.insert(0, "ID")
-    characteristics.insert(1, "X")
-    characteristics.insert(2, "Y")
-    characteristics.append("Gitter_ID_100m")
-    characteristics.append("coord_x_grid") 
-    characteristics.append("coord_y_grid") 
-    characteristics.append("Cluster Nr.") 
-    
-    # Treat values of cost and size
-    for vector in df:
-
-        vector[3] = round(vector[3], 2)    #cost
-        vector[4] = int(round(vector[4]))  #size
-
-        if vector[4] <= 0:
-            vector[4] = 1
-
-    # Create the dataframe
-    df = pd.DataFrame(df, columns = characteristics)    
-    
     return df
 
+DWELLING_BRANCH = InitialDataBranch(points="Addresses", elements="Houses", kinds=("addresses", "houses"),
+                                    points_label="residential addresses", elements_label="dwellings",
+                                    amount_column="amount of dwellings per building",
+                                    generate_points=gmm_address, generate_elements=gmm_dwelling)
+
 def create_initial_dwe_data(amount_addresses: int, 
                             proportion_workplaces: float, 
                             param_path: str = "data/GMM_parameters",
                             city_name: str = None,
-                            data_path: str = "data/datasets"):
+                            data_path: str = "data/datasets",
+                            engine: str = "batched",
+                            chunk_size: int = None,
+                            output_format: str = "csv",
+                            save: bool = True,
+                            num_shards: int = None,
+                            schema: str = "standard",
+                            seed_value: int = 10,
+                            use_cache: bool = True):
     """
     This function takes a file containing the list of GMM parameters and generates the dwelling data set.
 
@@ -282,46 +200,157 @@ def create_initial_dwe_data(amount_addresses: int,
         Path to save the data sets created.
         The default is "data/datasets".
 
+    engine: str, optional
+        Sampling engine used to generate the data sets ("batched", "legacy" or "philox").
+        The default is "batched".
+
+    chunk_size: int, optional
+        If given, the residential addresses are generated in chunks of this size, and each chunk and its 
+        dwellings are appended to the files before the next chunk is generated, which bounds 
+        the memory needed. The random draws (and, therefore, the data sets) depend on the size 
+        of the chunks, and the legacy engine cannot be used.
+        The default is None.
+
+    output_format: str, optional
+        Format of the files of the data sets ("csv", "parquet" or "feather").
+        The default is "csv".
+
+    save: bool, optional
+        Whether to save the data sets. If False, the data sets are only returned.
+        The default is True.
+
+    num_shards: int, optional
+        If given, the residential addresses are split into this many shards, which are generated in a pool 
+        of processes with random number generators spawned from a SeedSequence of the seed. The 
+        data sets depend on the number of shards, and the legacy engine cannot be used.
+        The default is None.
+
+    schema: str, optional
+        Schema of the columns of the data sets ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    seed_value: int, optional
+        Seed of the random draws (it is also part of the names of the files).
+        The default is 10.
+
+    use_cache: bool, optional
+        Whether to use the saved data sets if they were generated with the same parameters, numbers of 
+        points, seed, engine, schema and chunks or shards, or the entry of the cache with these inputs (see 
+        initial_cache.py). On a miss, the generated data sets are stored in the cache, even if save is False 
+        (then only in the sub-directory "cache" of data_path).
+        The default is True.
+
     Returns
     -------
-    None.
+    df_addr : dataframe
+        The generated address data set (None if it is generated in chunks).
+
+    df_dwe : dataframe
+        The generated dwelling data set (None if it is generated in chunks).
     
     """
 
-    # Set seed
-    seed_value = 10
-    np.random.seed(seed_value)
-    
-    # Get full paths
-    param_path = get_path_to_folder(param_path)
-    data_path = get_path_to_folder(data_path) 
-    
-    # Get path to parameters for the data set of residential addresses and import them
-    complete_param_path_addr = param_path + "/" + city_name + "_addresses.json"
-    with open(complete_param_path_addr, encoding = "utf-8") as t:
-        list_param_addr = json.load(t)
+    return create_initial_data(DWELLING_BRANCH, amount_addresses, amount_addresses, proportion_workplaces, param_path, city_name,
+                               data_path, engine, chunk_size, output_format, save, num_shards, schema, seed_value, use_cache)
+
+def create_exact_dwe_data(amount_dwe: int,
+                          param_path: str = "data/GMM_parameters",
+                          city_name: str = None,
+                          engine: str = "batched",
+                          schema: str = "standard",
+                          seed_value: int = 10):
+    """
+    This function takes a file containing the list of GMM parameters and generates a dwelling data set 
+    with exactly the selected number of dwellings. The residential addresses are generated until their amounts of 
+    dwellings reach this number, and the amount of dwellings of the last one is reduced (see target_size.py), 
+    so no dwelling has to be removed afterwards.
+
+    Parameters
+    ----------
+    amount_dwe: int
+        Number of dwellings in the data set.
         
-    # Generate data set of residential addresses   
-    df_addr = gmm_address(amount_addresses, list_param_addr)
-    
-    # Use specific information to update the path to the data set
-    data_path_addr = data_path + "/Addresses_" + str(city_name) + str(amount_addresses) + "addr" + "(" + str(int(proportion_workplaces * 100)) + "%workplaces)"+ "seed=" + str(seed_value) + ".csv"
-    
-    # Save data set in CSV file
-    df_addr.to_csv(data_path_addr, index=False) 
-    print("\nThe new data set of residential addresses was saved at:", data_path_addr)
-
-    # Get path to parameters for the dwelling data set and import them
-    complete_param_path_dwe = param_path + "/" + city_name + "_houses.json"
-    with open(complete_param_path_dwe, encoding = "utf-8") as t:
-        list_param_dwe = json.load(t)
+    param_path : str, optional
+        Sub-directory to find the JSON files containing the GMM parameters. 
+        It must start at one level above the current file. 
+        The default is "data/GMM_parameters".
         
-    # Generate dwelling data set   
-    df_dwe = gmm_dwelling(address_data= df_addr, list_parameters= list_param_dwe)    
-    
-    # Use specific information to update the path to the data set
-    data_path_dwe = data_path + "/Houses_" + str(city_name) + str(amount_addresses) + "addr" + "(" + str(int(proportion_workplaces * 100)) + "%workplaces)"+ "seed=" + str(seed_value) + ".csv"
-    
-    # Save the data set in CSV file
-    df_dwe.to_csv(data_path_dwe, index=False) 
-    print("\nThe new dwelling data set was saved at:", data_path_dwe)
\ No newline at end of file
+    city_name: str, optional
+        Name of the municipality created. 
+        The title of the JSON files must be "[name of city]_[addresses or houses].json".
+        The default is None.
+
+    engine: str, optional
+        Sampling engine used to generate the data sets ("batched", "legacy" or "philox").
+        The default is "batched".
+
+    schema: str, optional
+        Schema of the columns of the data sets ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    seed_value: int, optional
+        Seed of the random draws.
+        The default is 10.
+
+    Returns
+    -------
+    df_addr : dataframe
+        The generated residential address data set.
+
+    df_dwe : dataframe
+        The generated dwelling data set.
+    """
+
+    return create_exact_data(DWELLING_BRANCH, amount_dwe, param_path, city_name, engine, schema, seed_value)
+
+def grow_initial_dwe_data(amount_addresses: int,
+                          amount_new_addresses: int,
+                          proportion_workplaces: float,
+                          param_path: str = "data/GMM_parameters",
+                          city_name: str = None,
+                          data_path: str = "data/datasets/initial",
+                          seed_value: int = 10):
+    """
+    This function adds residential addresses and their dwellings to saved initial data sets without 
+    generating the saved rows again (see growth.py). The extended files are renamed after the new 
+    number of residential addresses.
+
+    Parameters
+    ----------
+    amount_addresses: int
+        Amount of residential addresses in the saved data set.
+
+    amount_new_addresses: int
+        Amount of residential addresses to be added.
+
+    proportion_workplaces: float
+        Proportion of the number of residential addresses that corresponds to the number of workplaces 
+        (part of the names of the files).
+
+    param_path : str, optional
+        Sub-directory to find the JSON files containing the GMM parameters. 
+        The default is "data/GMM_parameters".
+
+    city_name: str, optional
+        Name of the municipality. 
+        The default is None.
+
+    data_path: str, optional
+        Path of the saved data sets.
+        The default is "data/datasets/initial".
+
+    seed_value: int, optional
+        Seed of the saved data sets (part of the names of the files).
+        The default is 10.
+
+    Returns
+    -------
+    df_addr : dataframe
+        The new residential addresses.
+
+    df_dwe : dataframe
+        The new dwellings.
+    """
+
+    return grow_initial_data(DWELLING_BRANCH, amount_new_addresses, amount_addresses, amount_new_addresses, proportion_workplaces,
+                             param_path, city_name, data_path, seed_value)
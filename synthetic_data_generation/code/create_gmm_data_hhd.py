@@ -7,11 +7,15 @@ Section 4.2 of the thesis.
 """
 
 import numpy as np
-import pandas as pd
-import json 
-from code.get_files import get_path_to_folder
-
-def gmm_workplace(data_size: int, list_parameters: list):
+from code.gmm_sampling import sample_nuclei_points, build_point_dataframe, expand_points
+from code.nucleus_selection import NucleusSelector
+from code.gmm_parameters import get_gmm_parameters
+from code.philox import PhiloxGenerator, get_philox_generator
+from code.initial_data import InitialDataBranch, create_initial_data, create_exact_data, grow_initial_data
+from code.instrumentation import trace_stage
+
+def gmm_workplace(data_size: int, list_parameters: list, engine: str = "batched", selection_method: str = "searchsorted",
+                  first_id: int = 0, rng=None, schema: str = "standard"):
     
     """
     This function generates the workplace data set using GMM.
@@ -21,8 +25,8 @@ def gmm_workplace(data_size: int, list_parameters: list):
     data_size: int
         Number of elements in the data set that will be generated.
         
-    list_parameters : list
-        It must have the form [list_of_workplace_features, probabilities, 
+    list_parameters : list or GMMParameters
+        Parsed parameters (see gmm_parameters.py) or a list of the form [list_of_workplace_features, probabilities, 
         list_means_1, list_standard_deviations_1, list_correlations_1, ..., 
         list_means_N, list_standard_deviations_N, list_correlations_N], where:
         * list_of_workplace_features is the list of characteristics that we will 
@@ -35,111 +39,67 @@ def gmm_workplace(data_size: int, list_parameters: list):
         * list_correlations_i is the correlation matrix of distribution (nucleus) i in 
           "list of lists" (LIL) format.
 
+    engine: str, optional
+        Sampling engine. With "batched", the points of each nucleus are generated at once.
+        With "legacy", one point is generated per row following the original order of the
+        random draws, which reproduces the data sets generated with the original implementation.
+        With "philox", the numbers of each row are computed from its ID (see philox.py).
+        The default is "batched".
+
+    selection_method: str, optional
+        Method used to assign the points to the nuclei ("searchsorted" or "alias").
+        Only "searchsorted" reproduces the assignment of the original implementation.
+        The default is "searchsorted".
+
+    first_id: int, optional
+        ID of the first element of the data set (used when the data set is generated in chunks).
+        The default is 0.
+
+    rng: numpy.random.Generator or PhiloxGenerator, optional
+        Random number generator (used when the data set is generated in shards). If None, 
+        the global state of np.random is used. With the "philox" engine, it is the generator of 
+        the seed (if None, the seed is 10).
+        The default is None.
+
+    schema: str, optional
+        Schema of the columns ("standard" or "compact", see schema.py).
+        The default is "standard".
+
     Returns
     -------
     df : dataframe
         The generated data set.
     """
 
-    # Get input
-    w = list_parameters[1]
-    num_nucleus = len(w) 
-    select_nucleus = np.random.uniform(low=0.0, high=1.0,size=data_size)
-    num_characteristics = len(list_parameters[0])
-    
-    #build the list of selected nuclei
-    nuclei_selected = []
-    for i in select_nucleus:
-        upper = w[0]
-        index = 0
-        found = False 
-        while found == False: 
-            if i <= upper: 
-                nuclei_selected.append(index)  
-                found = True 
-            else: 
-                index += 1
-                upper += w[index]
-                
-    # Build a list containing the cholesky factorizations of the covariance matrices
-    list_cholesky = []
-    for i in range(num_nucleus):
-        
-        # Create the diagonal matrix of standard deviations
-        sd_matrix = np.zeros((num_characteristics, num_characteristics))
-        for j in range(num_characteristics):
-            sd_matrix[j,j] = round(list_parameters[(3*i)+3][j], 2) 
-        
-        # Get the covariance matrix and store the matrix from its cholesky factorization
-        cov = sd_matrix @ np.array(list_parameters[(3*i)+4]) @ sd_matrix
-        q = np.linalg.cholesky(cov) 
-        list_cholesky.append(q)    
-        
-    # Initialize dataframe and ID count
-    df = []
-    id = 0
-    
-    # Generate the elements of the data set
-    for j in nuclei_selected:
+    # Get parsed parameters
+    parameters = get_gmm_parameters(list_parameters, has_probabilities=True)
 
-        # Get a vector from the standard Gaussian distribution
-        z = np.random.normal(size=num_characteristics)
+    # Get input (the philox engine draws the numbers of each row from its ID, see philox.py)
+    random = np.random if rng is None else rng
+    if engine == "philox":
+        random = (rng if isinstance(rng, PhiloxGenerator) else get_philox_generator(engine)).for_table("workplaces")
+        ids = np.arange(first_id, first_id + data_size)
+    with trace_stage("nucleus selection", rows=data_size):
+        if engine == "philox":
+            select_nucleus = random.uniform(ids)
+        else:
+            select_nucleus = random.uniform(low=0.0, high=1.0,size=data_size)
 
-        # Transform into the Gaussian distribution with parameters associated to nucleus j
-        # (this x stores the observation in a vector where the sequence of values follows the sequence 
-        # of characteristics inserted in the parameters of the input) 
-        x = (list_cholesky[j] @ z) + list_parameters[(3*j) + 2]    
-        
-        # Transform the numpy arrays into lists
-        x = list(x) 
-        
-        # Insert ID and nucleus number into x
-        x.insert(0, id)
-        x.append(j)
-
-        # Insert x into the dataframe
-        df.append(x)  
-
-        # Update ID count 
-        id += 1  
-
-    # Initialize the head of the dataframe
-    characteristics = list_parameters[0].copy() 
-    characteristics.insert(0, "ID")
-    characteristics.append("Cluster Nr.")
-
-    # Identify the coordinates of the input corresponding to lables X and Y
-    for j in range(len(characteristics)):
-        if characteristics[j] == "X":
-            x_coor = j 
-        if characteristics[j] == "Y":
-            y_coor = j 
-    
-    # Round some necessary values for the dataframe and insert grid cell information
-    for vector in df: 
+        # Build the list of selected nuclei and get the amount of points of each nucleus
+        nuclei_selected, counts = NucleusSelector(parameters.probabilities, selection_method).select(select_nucleus, return_counts=True)
 
-        # Treat information on amount of households per workplace
-        vector[3] = int(round(vector[3]))
-        if vector[3] <= 0:
-            vector[3] = 1
-        
-        # Insert grid cell labels and information on its lower-left corner coordinates
-        grid_cell_name = "100mN" + str(round(vector[y_coor] - (vector[y_coor] % 100))) + "E" + str(round(vector[x_coor] - (vector[x_coor] % 100)))
-        vector.append(grid_cell_name)
-        vector.append(round(vector[x_coor] - (vector[x_coor] % 100)))
-        vector.append(round(vector[y_coor] - (vector[y_coor] % 100)))
-
-    # Insert more information into the head of the dataframe  
-    characteristics.append("Gitter_ID_100m")
-    characteristics.append("coord_x_grid")
-    characteristics.append("coord_y_grid")   
-    
-    # Generate dataframe
-    df = pd.DataFrame(df, columns = characteristics)    
-    
-    return df  
+    # Generate the elements of the data set
+    with trace_stage("sampling", rows=data_size):
+        z = random.normal(ids, parameters.num_characteristics, first_block=1) if engine == "philox" else None
+        values = sample_nuclei_points(nuclei_selected, parameters.cholesky, parameters.means, engine, counts, rng, z)
 
-def gmm_hhd(workplace_data, list_parameters: list):
+    # Round some necessary values, insert grid cell information and generate dataframe
+    with trace_stage("post-processing", rows=data_size):
+        df = build_point_dataframe(values, nuclei_selected, parameters.features, first_id, schema)
+
+    return df
+
+def gmm_hhd(workplace_data, list_parameters: list, engine: str = "batched", rng=None, schema: str = "standard"):
 
     """
     This function generates the household data set from the workplace data set using 
@@ -150,8 +110,8 @@ def gmm_hhd(workplace_data, list_parameters: list):
     workplace_data: dataframe
         Dataframe containing the workplace data set.
         
-    list_parameters : list
-        It must have the form [list_of_household_features, 
+    list_parameters : list or GMMParameters
+        Parsed parameters (see gmm_parameters.py) or a list of the form [list_of_household_features, 
         list_means_1, list_standard_deviations_1, list_correlations_1, ..., 
         list_means_N, list_standard_deviations_N, list_correlations_N], where:
         * list_of_household_features is the list of characteristics that we will 
@@ -162,96 +122,58 @@ def gmm_hhd(workplace_data, list_parameters: list):
         * list_correlations_i is the correlation matrix of these features associated 
           to nucleus i in "list of lists" (LIL) format.
 
+    engine: str, optional
+        Sampling engine. With "batched", the features of the elements of each nucleus are 
+        generated at once. With "legacy", they are generated element by element following the 
+        original order of the random draws. With "philox", the features of each element are 
+        computed from the ID of its point and its index in the point (see philox.py).
+        The default is "batched".
+
+    rng: numpy.random.Generator or PhiloxGenerator, optional
+        Random number generator. If None, the global state of np.random is used. With the 
+        "philox" engine, it is the generator of the seed (if None, the seed is 10).
+        The default is None.
+
+    schema: str, optional
+        Schema of the columns ("standard" or "compact", see schema.py).
+        The default is "standard".
+
     Returns
     -------
     df : dataframe
         The generated data set.
     """
 
-    # Get input
-    num_characteristics = len(list_parameters[0])
+    # Get parsed parameters
+    parameters = get_gmm_parameters(list_parameters, has_probabilities=False)
 
-    # Define the number of nuclei
-    num_nucleus = int((len(list_parameters)-1)/3)
-                
-    # Build a list containing the cholesky factorizations of the covariance matrices
-    list_cholesky = []
-    for i in range(num_nucleus):
-        
-        # Get the diagonal matrix of standard deviations
-        sd_matrix = np.zeros((num_characteristics, num_characteristics))
-        for j in range(num_characteristics):
-            sd_matrix[j,j] = round(list_parameters[(3*i)+2][j], 2) 
-        
-        # Get covariance matrix
-        cov = sd_matrix @ np.array(list_parameters[(3*i)+3]) @ sd_matrix
-        
-        # Get and store matrix from cholesky factorization
-        q = np.linalg.cholesky(cov) 
-        list_cholesky.append(q)   
-        
-    # Initialize dataframe
-    df = []
-    
-    # Generate the elements of the data set
-    for index, row in workplace_data.iterrows():
-        
-        for i in range(int(row["hhd per workplace"])):
-
-            # Initialize row of the data set
-            hhd_line = []
-
-            # Insert ID with the form [workplace ID]_[index of head of household in this workplace] 
-            hhd_line.append(str(row["ID"]) + "_" + str(i))
-
-            # Insert spatial coordinates
-            hhd_line.append(row["X"])
-            hhd_line.append(row["Y"])
-
-            # Get vector from standard Gaussian distribution
-            z = np.random.normal(size=num_characteristics) 
-
-            # Get vector from Gaussian distribution corresponding to features [income, size] 
-            x = (list_cholesky[int(row["Cluster Nr."])] @ z) + list_parameters[(3*int(row["Cluster Nr."])) + 1]
-
-            # Insert income and size to row
-            hhd_line.append(x[0])
-            hhd_line.append(x[1])  
-
-            # Insert remaining information from the head of household's workplace
-            hhd_line.append(row["Gitter_ID_100m"])
-            hhd_line.append(row["Cluster Nr."]) 
-
-            # Update the dataframe 
-            df.append(hhd_line)  
-        
-    # Generate the head of the data set
-    characteristics = list_parameters[0].copy() 
-    characteristics.insert(0, "ID")
-    characteristics.insert(1, "X")
-    characteristics.insert(2, "Y")
-    characteristics.append("Gitter_ID_100m")
-    characteristics.append("Cluster Nr.") 
-    
-    # Treat values of income and size
-    for vector in df: 
-
-        vector[3] = round(vector[3], 2)    #income
-        vector[4] = int(round(vector[4]))  #size
+    if engine == "philox":
+        rng = (rng if isinstance(rng, PhiloxGenerator) else get_philox_generator(engine)).for_table("households")
 
-        if vector[4] <= 0:
-            vector[4] = 1
+    # Generate the elements of the data set by expanding each workplace
+    df = expand_points(workplace_data, "hhd per workplace", parameters.cholesky, parameters.means, parameters.features,
+                       ["Gitter_ID_100m", "Cluster Nr."], engine, rng, schema)
 
-    # Create the dataframe
-    df = pd.DataFrame(df, columns = characteristics)    
-    
     return df
 
+HOUSEHOLD_BRANCH = InitialDataBranch(points="Workplaces", elements="Households", kinds=("workplaces", "hhd"),
+                                     points_label="workplaces", elements_label="households",
+                                     amount_column="hhd per workplace",
+                                     generate_points=gmm_workplace, generate_elements=gmm_hhd)
+
 def create_initial_hhd_data(amount_addresses: int, 
                             proportion_workplaces: float,
                             param_path: str = "data/GMM_parameters",
                             city_name: str = None,
-                            data_path: str = "data/datasets"):
+                            data_path: str = "data/datasets",
+                            engine: str = "batched",
+                            chunk_size: int = None,
+                            output_format: str = "csv",
+                            save: bool = True,
+                            num_shards: int = None,
+                            schema: str = "standard",
+                            seed_value: int = 10,
+                            use_cache: bool = True):
     """
     This function takes a file containing the list of GMM parameters and generates the household data set.
 
@@ -278,47 +200,163 @@ def create_initial_hhd_data(amount_addresses: int,
         Path to save the data sets created.
         The default is "data/datasets".
 
+    engine: str, optional
+        Sampling engine used to generate the data sets ("batched", "legacy" or "philox").
+        The default is "batched".
+
+    chunk_size: int, optional
+        If given, the workplaces are generated in chunks of this size, and each chunk and its 
+        households are appended to the files before the next chunk is generated, which bounds 
+        the memory needed. The random draws (and, therefore, the data sets) depend on the size 
+        of the chunks, and the legacy engine cannot be used.
+        The default is None.
+
+    output_format: str, optional
+        Format of the files of the data sets ("csv", "parquet" or "feather").
+        The default is "csv".
+
+    save: bool, optional
+        Whether to save the data sets. If False, the data sets are only returned.
+        The default is True.
+
+    num_shards: int, optional
+        If given, the workplaces are split into this many shards, which are generated in a pool 
+        of processes with random number generators spawned from a SeedSequence of the seed. The 
+        data sets depend on the number of shards, and the legacy engine cannot be used.
+        The default is None.
+
+    schema: str, optional
+        Schema of the columns of the data sets ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    seed_value: int, optional
+        Seed of the random draws (it is also part of the names of the files).
+        The default is 10.
+
+    use_cache: bool, optional
+        Whether to use the saved data sets if they were generated with the same parameters, numbers of 
+        points, seed, engine, schema and chunks or shards, or the entry of the cache with these inputs (see 
+        initial_cache.py). On a miss, the generated data sets are stored in the cache, even if save is False 
+        (then only in the sub-directory "cache" of data_path).
+        The default is True.
+
     Returns
     -------
-    None.
+    df_workplace : dataframe
+        The generated workplace data set (None if it is generated in chunks).
+
+    df_hhd : dataframe
+        The generated household data set (None if it is generated in chunks).
     
     """
 
-    # Set seed
-    seed_value = 10
-    np.random.seed(seed_value)
-    
-    # Get full paths
-    param_path = get_path_to_folder(param_path)
-    data_path = get_path_to_folder(data_path) 
-
-    # Get path to parameters for the workplace data set and import them
-    complete_param_path_workplace = param_path + "/" + city_name + "_workplaces.json"
-    with open(complete_param_path_workplace, encoding = "utf-8") as t:
-        list_param_workplace = json.load(t)
+    # Get amount of workplaces
+    amount_workplace = int(round(proportion_workplaces * amount_addresses))
+
+    return create_initial_data(HOUSEHOLD_BRANCH, amount_workplace, amount_addresses, proportion_workplaces, param_path, city_name,
+                               data_path, engine, chunk_size, output_format, save, num_shards, schema, seed_value, use_cache)
+
+def create_exact_hhd_data(amount_hhd: int,
+                          param_path: str = "data/GMM_parameters",
+                          city_name: str = None,
+                          engine: str = "batched",
+                          schema: str = "standard",
+                          seed_value: int = 10):
+    """
+    This function takes a file containing the list of GMM parameters and generates a household data set 
+    with exactly the selected number of households. The workplaces are generated until their amounts of 
+    households reach this number, and the amount of households of the last one is reduced (see target_size.py), 
+    so no household has to be removed afterwards.
+
+    Parameters
+    ----------
+    amount_hhd: int
+        Number of households in the data set.
         
-    # Get amount of workplaces and generate the workplace data set   
-    amount_workplace = int(round(proportion_workplaces * amount_addresses)) 
-    df_workplace = gmm_workplace(amount_workplace, list_param_workplace)
-    
-    # Use specific information to update the path to the data set 
-    data_path_workplace = data_path + "/Workplaces_" + str(city_name) + str(amount_addresses) + "addr" + "(" + str(int(proportion_workplaces * 100)) + "%workplaces)" + "seed=" + str(seed_value) + ".csv"
-    
-    # Save the data set in CSV file
-    df_workplace.to_csv(data_path_workplace, index=False) 
-    print("\nThe new workplace data set was saved at:", data_path_workplace)
-
-    # Get path to parameters for the household data set and import them
-    complete_param_path_hhd = param_path + "/" + city_name + "_hhd.json"
-    with open(complete_param_path_hhd, encoding = "utf-8") as t:
-        list_param_hhd = json.load(t)
+    param_path : str, optional
+        Sub-directory to find the JSON files containing the GMM parameters. 
+        It must start at one level above the current file. 
+        The default is "data/GMM_parameters".
         
-    # Generate household data set   
-    df_hhd = gmm_hhd(workplace_data= df_workplace, list_parameters= list_param_hhd)    
-    
-    # Use specific information to update the path to the data set
-    data_path_hhd = data_path + "/Households_" + str(city_name) + str(amount_addresses) + "addr" + "(" + str(int(proportion_workplaces * 100)) + "%workplaces)" + "seed=" + str(seed_value) + ".csv"
-    
-    # Save the data set in CSV file
-    df_hhd.to_csv(data_path_hhd, index=False) 
-    print("\nThe new household data set was saved at:", data_path_hhd)
\ No newline at end of file
+    city_name: str, optional
+        Name of the municipality created. 
+        The title of the JSON files must be "[name of city]_[workplaces or hhd].json".
+        The default is None.
+
+    engine: str, optional
+        Sampling engine used to generate the data sets ("batched", "legacy" or "philox").
+        The default is "batched".
+
+    schema: str, optional
+        Schema of the columns of the data sets ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    seed_value: int, optional
+        Seed of the random draws.
+        The default is 10.
+
+    Returns
+    -------
+    df_workplace : dataframe
+        The generated workplace data set.
+
+    df_hhd : dataframe
+        The generated household data set.
+    """
+
+    return create_exact_data(HOUSEHOLD_BRANCH, amount_hhd, param_path, city_name, engine, schema, seed_value)
+
+def grow_initial_hhd_data(amount_addresses: int,
+                          amount_new_addresses: int,
+                          proportion_workplaces: float,
+                          param_path: str = "data/GMM_parameters",
+                          city_name: str = None,
+                          data_path: str = "data/datasets/initial",
+                          seed_value: int = 10):
+    """
+    This function adds workplaces and their households to saved initial data sets without generating 
+    the saved rows again (see growth.py). The number of new workplaces is the difference between the 
+    numbers of workplaces of the new and of the saved numbers of residential addresses, and the 
+    extended files are renamed after the new number of residential addresses.
+
+    Parameters
+    ----------
+    amount_addresses: int
+        Amount of residential addresses of the saved data sets.
+
+    amount_new_addresses: int
+        Amount of residential addresses to be added.
+
+    proportion_workplaces: float
+        Proportion of the number of residential addresses that corresponds to the number of workplaces.
+
+    param_path : str, optional
+        Sub-directory to find the JSON files containing the GMM parameters. 
+        The default is "data/GMM_parameters".
+
+    city_name: str, optional
+        Name of the municipality. 
+        The default is None.
+
+    data_path: str, optional
+        Path of the saved data sets.
+        The default is "data/datasets/initial".
+
+    seed_value: int, optional
+        Seed of the saved data sets (part of the names of the files).
+        The default is 10.
+
+    Returns
+    -------
+    df_workplace : dataframe
+        The new workplaces.
+
+    df_hhd : dataframe
+        The new households.
+    """
+
+    # Get amount of new workplaces
+    amount_new_workplaces = int(round(proportion_workplaces * (amount_addresses + amount_new_addresses))) - int(round(proportion_workplaces * amount_addresses))
+
+    return grow_initial_data(HOUSEHOLD_BRANCH, amount_new_workplaces, amount_addresses, amount_new_addresses, proportion_workplaces,
+                             param_path, city_name, data_path, seed_value)
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the functions to write and read the data sets in the supported
+file formats:
+    * "csv": comma-separated values (the default format);
+    * "parquet": Apache Parquet (columnar and compressed);
+    * "feather": Feather version 2, i.e., the Arrow IPC file format.
+
+The columnar formats require the package pyarrow and store typed columns, e.g., the
+grid cell labels as a categorical column and the cluster numbers as 16-bit integers
+(see schema.py).
+The format of a file is identified by its extension.
+"""
+
+import pandas as pd
+import os
+from code.schema import CLUSTER_TYPE, GRID_TYPE
+from code.instrumentation import trace_stage
+from code.options import OUTPUT_FORMATS
+
+# Types of the columns stored in the columnar formats
+COLUMN_TYPES = {"Gitter_ID_100m": "category", "Cluster Nr.": CLUSTER_TYPE, "coord_x_grid": GRID_TYPE, "coord_y_grid": GRID_TYPE}
+
+def check_output_format(output_format: str):
+
+    """
+    This function checks if the selected file format is supported.
+
+    Parameters
+    ----------
+    output_format: str
+        File format ("csv", "parquet" or "feather").
+
+    Returns
+    -------
+    None.
+    """
+
+    if output_format not in OUTPUT_FORMATS:
+        raise Exception("The file format " + str(output_format) + " is not supported. Use one of: " + ", ".join(OUTPUT_FORMATS) + ".")
+
+def get_file_extension(output_format: str):
+
+    """
+    This function returns the extension of the files of a format.
+
+    Parameters
+    ----------
+    output_format: str
+        File format ("csv", "parquet" or "feather").
+
+    Returns
+    -------
+    extension : str
+        Extension of the files, including the dot.
+    """
+
+    check_output_format(output_format)
+
+    return OUTPUT_FORMATS[output_format]
+
+def get_file_format(path: str):
+
+    """
+    This function identifies the format of a file by its extension.
+
+    Parameters
+    ----------
+    path: str
+        Path to the file.
+
+    Returns
+    -------
+    output_format : str
+        File format ("csv", "parquet" or "feather").
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+    for output_format in OUTPUT_FORMATS:
+        if OUTPUT_FORMATS[output_format] == extension:
+            return output_format
+
+    raise Exception("The format of the file " + str(path) + " is not supported. Its extension must be one of: "
+                    + ", ".join(OUTPUT_FORMATS.values()) + ".")
+
+def get_initial_df_name(data_set: str, city_name: str, amount_addresses: int, proportion_workplaces: float,
+                        seed_value: int = 10, output_format: str = "csv"):
+
+    """
+    This function returns the name of the file of an initial data set.
+
+    Parameters
+    ----------
+    data_set: str
+        Data set ("Addresses", "Houses", "Workplaces" or "Households").
+
+    city_name: str
+        Name of the municipality.
+
+    amount_addresses: int
+        Amount of residential addresses.
+
+    proportion_workplaces: float
+        Proportion of the number of residential addresses that corresponds to the number of workplaces.
+
+    seed_value: int, optional
+        Seed of the generation.
+        The default is 10.
+
+    output_format: str, optional
+        File format ("csv", "parquet" or "feather").
+        The default is "csv".
+
+    Returns
+    -------
+    name : str
+        Name of the file.
+    """
+
+    return (data_set + "_" + str(city_name) + str(amount_addresses) + "addr" + "(" + str(int(proportion_workplaces * 100)) 
+            + "%workplaces)" + "seed=" + str(seed_value) + get_file_extension(output_format))
+
+def get_final_df_name(data_set: str, city_name: str, amount_dwe: int, amount_hhd: int,
+                      seed_value: int = 10, output_format: str = "csv", exact: bool = False):
+
+    """
+    This function returns the name of the file of a final data set.
+
+    Parameters
+    ----------
+    data_set: str
+        Data set ("Houses" or "Households").
+
+    city_name: str
+        Name of the municipality.
+
+    amount_dwe: int
+        Number of dwellings.
+
+    amount_hhd: int
+        Number of households.
+
+    seed_value: int, optional
+        Seed of the generation.
+        The default is 10.
+
+    output_format: str, optional
+        File format ("csv", "parquet" or "feather").
+        The default is "csv".
+
+    exact: bool, optional
+        Whether the data set was generated directly with the selected sizes (see
+        target_size.py). These data sets are tagged with "exact", so they do not overwrite the
+        ones reduced from initial data sets.
+        The default is False.
+
+    Returns
+    -------
+    name : str
+        Name of the file.
+    """
+
+    return (data_set + "_" + str(city_name) + str(amount_dwe) + "(" + str(amount_hhd) + "hhd" + (",exact" if exact else "") + ")" + "seed=" 
+            + str(seed_value) + get_file_extension(output_format))
+
+def apply_column_types(df):
+
+    """
+    This function converts the columns of a data set to the types stored in the columnar formats.
+
+    Parameters
+    ----------
+    df: dataframe
+        Data set.
+
+    Returns
+    -------
+    df : dataframe
+        Data set with typed columns.
+    """
+
+    types = {column: COLUMN_TYPES[column] for column in COLUMN_TYPES if column in df.columns}
+
+    return df.astype(types)
+
+def _import_pyarrow():
+
+    # pyarrow is only needed for the columnar formats
+    try:
+        import pyarrow
+    except ImportError:
+        raise Exception("The formats parquet and feather require the package pyarrow (pip install pyarrow, see requirements.txt).")
+
+    return pyarrow
+
+def write_dataset(df, path: str):
+
+    """
+    This function writes a data set in the format given by the extension of the file.
+
+    Parameters
+    ----------
+    df: dataframe
+        Data set.
+
+    path: str
+        Path to the file.
+
+    Returns
+    -------
+    None.
+    """
+
+    output_format = get_file_format(path)
+
+    with trace_stage("write", rows=df.shape[0], file=os.path.basename(path)):
+
+        if output_format == "csv":
+            df.to_csv(path, index=False)
+            return
+
+        _import_pyarrow()
+        df = apply_column_types(df).reset_index(drop=True)
+
+        # pandas raises an ImportError if the installed pyarrow is too old
+        try:
+            if output_format == "parquet":
+                df.to_parquet(path, index=False)
+            else:
+                df.to_feather(path)
+        except ImportError as error:
+            raise Exception("The formats parquet and feather require a version of pyarrow supported by pandas: " + str(error))
+
+def read_dataset(path: str, exact_floats: bool = False):
+
+    """
+    This function reads a data set in the format given by the extension of the file.
+
+    Parameters
+    ----------
+    path: str
+        Path to the file.
+
+    exact_floats: bool, optional
+        Whether to parse the floats of CSV files exactly (float_precision="round_trip"), so they 
+        are the same as the written ones. By default, the parser of the original implementation 
+        is used, which can change the last digit of some floats.
+        The default is False.
+
+    Returns
+    -------
+    df : dataframe
+        Data set.
+    """
+
+    output_format = get_file_format(path)
+
+    with trace_stage("read", file=os.path.basename(path)) as record:
+
+        if output_format == "csv":
+            df = pd.read_csv(path, float_precision="round_trip" if exact_floats else None)
+        else:
+            _import_pyarrow()
+            try:
+                df = pd.read_parquet(path) if output_format == "parquet" else pd.read_feather(path)
+            except ImportError as error:
+                raise Exception("The formats parquet and feather require a version of pyarrow supported by pandas: " + str(error))
+
+        record["rows"] = df.shape[0]
+
+    return df
+
+def count_dataset_rows(path: str):
+
+    """
+    This function counts the rows of a data set without loading it.
+
+    Parameters
+    ----------
+    path: str
+        Path to the file.
+
+    Returns
+    -------
+    amount_rows : int
+        Number of rows of the data set.
+    """
+
+    output_format = get_file_format(path)
+
+    if output_format == "csv":
+        with open(path, "rb") as f:
+            return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")) - 1
+
+    _import_pyarrow()
+
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+
+    import pyarrow.ipc as ipc
+    with ipc.open_file(path) as reader:
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+class DatasetWriter:
+
+    """
+    This class writes a data set chunk by chunk in the format given by the extension of the file.
+
+    The categorical columns are stored as strings in the columnar formats, since the categories
+    of the chunks are not the same (Parquet still encodes them with a dictionary).
+
+    Parameters
+    ----------
+    path: str
+        Path to the file.
+
+    append: bool, optional
+        Whether to append the chunks to an existing file (only for CSV files).
+        The default is False.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+
+        self.path = path
+        self.output_format = get_file_format(path)
+        self.writer = None
+        self.schema = None
+        self.started = append
+        self.amount_rows = 0
+
+        if append and self.output_format != "csv":
+            raise Exception("Only CSV files can be extended, but the file is " + path + ".")
+        if self.output_format != "csv":
+            _import_pyarrow()
+
+    def write(self, df):
+
+        """
+        This function appends a chunk to the file.
+
+        Parameters
+        ----------
+        df: dataframe
+            Chunk of the data set.
+
+        Returns
+        -------
+        None.
+        """
+
+        with trace_stage("write", rows=df.shape[0], file=os.path.basename(self.path)):
+            self._write(df)
+
+    def _write(self, df):
+
+        first_chunk = not self.started
+        self.started = True
+        self.amount_rows += df.shape[0]
+
+        if self.output_format == "csv":
+            df.to_csv(self.path, mode="w" if first_chunk else "a", header=first_chunk, index=False)
+            return
+
+        import pyarrow as pa
+
+        # Convert the chunk to an Arrow table with the schema of the first chunk
+        df = apply_column_types(df).reset_index(drop=True)
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype(str)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        if first_chunk:
+            self.schema = table.schema
+            if self.output_format == "parquet":
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.path, self.schema)
+            else:
+                import pyarrow.ipc as ipc
+                self.writer = ipc.new_file(self.path, self.schema)
+        else:
+            table = table.cast(self.schema)
+
+        self.writer.write_table(table)
+
+    def close(self):
+
+        """
+        This function finishes the file.
+
+        Returns
+        -------
+        None.
+        """
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
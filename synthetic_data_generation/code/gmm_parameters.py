@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the parsed and validated representation of the GMM parameters
+stored in the JSON files "[name of city]_[addresses or houses or workplaces or hhd].json".
+
+The parameters of each file are parsed and the covariance matrices are factorized only
+once. The results are kept in memory and on disk, keyed by a hash of the content of the
+JSON file, so repeated runs over the same parameter files skip parsing and factorization.
+"""
+
+import numpy as np
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from code.get_files import get_path_to_folder
+from code.options import PARAMETER_KINDS
+
+# Version of the parsed representation (part of the cache key)
+PARAMETERS_FORMAT_VERSION = "1"
+
+# Sub-directory of the disk cache of parsed parameters
+PARAMETERS_CACHE_DIR = "data/GMM_parameters_cache"
+
+# In-memory cache of parsed parameters
+_parameters_cache = {}
+
+@dataclass(frozen=True)
+class GMMParameters:
+
+    """
+    Parsed GMM parameters.
+
+    Attributes
+    ----------
+    features: list
+        List of features of the data set except for the IDs.
+
+    probabilities: numpy.ndarray or None
+        Probability of a point to belong to each nucleus, or None for the parameters of
+        dwellings and households.
+
+    means: numpy.ndarray
+        Matrix where row i contains the means of nucleus i.
+
+    cholesky: numpy.ndarray
+        Array where entry i contains the matrix from the cholesky factorization of the
+        covariance matrix of nucleus i.
+
+    content_hash: str
+        Hash of the content the parameters were parsed from.
+    """
+
+    features: list
+    probabilities: np.ndarray
+    means: np.ndarray
+    cholesky: np.ndarray
+    content_hash: str
+
+    @property
+    def num_nucleus(self):
+        return self.means.shape[0]
+
+    @property
+    def num_characteristics(self):
+        return len(self.features)
+
+def parse_gmm_parameters(list_parameters: list, has_probabilities: bool, content_hash: str = None):
+
+    """
+    This function validates a list of GMM parameters and factorizes its covariance matrices.
+
+    Parameters
+    ----------
+    list_parameters: list
+        It must have the form [list_of_features, probabilities, list_means_1,
+        list_standard_deviations_1, list_correlations_1, ..., list_means_N,
+        list_standard_deviations_N, list_correlations_N], where the list probabilities
+        only exists if has_probabilities is True.
+
+    has_probabilities: bool
+        Whether the list contains the probabilities of the nuclei.
+
+    content_hash: str, optional
+        Hash of the content the list was read from. If None, it is computed from the list.
+        The default is None.
+
+    Returns
+    -------
+    parameters : GMMParameters
+        The parsed parameters.
+    """
+
+    if content_hash is None:
+        content_hash = get_content_hash(json.dumps(list_parameters).encode("utf-8"), has_probabilities)
+
+    # Get features
+    features = list_parameters[0]
+    if not isinstance(features, list) or len(features) < 2 or not all(isinstance(f, str) for f in features):
+        raise Exception("The first element of the GMM parameters must be the list of (at least two) features.")
+    num_characteristics = len(features)
+
+    # Get the position of the first list of means and the number of nuclei
+    first = 2 if has_probabilities else 1
+    if len(list_parameters) <= first or (len(list_parameters) - first) % 3 != 0:
+        raise Exception("The GMM parameters must contain a list of means, a list of standard deviations "
+                        + "and a correlation matrix for each nucleus.")
+    num_nucleus = int((len(list_parameters) - first) / 3)
+
+    # Get probabilities
+    probabilities = None
+    if has_probabilities:
+        probabilities = np.ascontiguousarray(list_parameters[1], dtype=float)
+        if probabilities.shape != (num_nucleus,):
+            raise Exception("The GMM parameters have " + str(num_nucleus) + " nuclei, but "
+                            + str(probabilities.size) + " probabilities.")
+
+    means = np.empty((num_nucleus, num_characteristics))
+    cholesky = np.empty((num_nucleus, num_characteristics, num_characteristics))
+
+    for i in range(num_nucleus):
+
+        list_means = list_parameters[first + (3*i)]
+        list_sd = list_parameters[first + (3*i) + 1]
+        corr = np.array(list_parameters[first + (3*i) + 2], dtype=float)
+
+        # Check dimensions of the parameters of nucleus i
+        if len(list_means) != num_characteristics or len(list_sd) != num_characteristics:
+            raise Exception("The means and standard deviations of nucleus " + str(i) + " must have "
+                            + str(num_characteristics) + " elements.")
+        if corr.shape != (num_characteristics, num_characteristics) or not np.allclose(corr, corr.T):
+            raise Exception("The correlation matrix of nucleus " + str(i) + " must be a symmetric "
+                            + str(num_characteristics) + "x" + str(num_characteristics) + " matrix.")
+
+        means[i] = list_means
+
+        # Create the diagonal matrix of standard deviations
+        sd_matrix = np.zeros((num_characteristics, num_characteristics))
+        for j in range(num_characteristics):
+            sd_matrix[j,j] = round(list_sd[j], 2)
+
+        # Get the covariance matrix and store the matrix from its cholesky factorization
+        cov = sd_matrix @ corr @ sd_matrix
+        try:
+            cholesky[i] = np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            raise Exception("The covariance matrix of nucleus " + str(i) + " is not positive definite.")
+
+    return GMMParameters(features=list(features), probabilities=probabilities, means=means,
+                         cholesky=cholesky, content_hash=content_hash)
+
+def get_gmm_parameters(list_parameters, has_probabilities: bool):
+
+    """
+    This function returns the parsed version of GMM parameters given either as a list
+    (in the format of the JSON files) or as an already parsed GMMParameters object.
+
+    Parameters
+    ----------
+    list_parameters: list or GMMParameters
+        GMM parameters.
+
+    has_probabilities: bool
+        Whether the parameters contain the probabilities of the nuclei.
+
+    Returns
+    -------
+    parameters : GMMParameters
+        The parsed parameters.
+    """
+
+    if isinstance(list_parameters, GMMParameters):
+        if (list_parameters.probabilities is not None) != has_probabilities:
+            raise Exception("The GMM parameters do not match the data set to be generated.")
+        return list_parameters
+
+    return parse_gmm_parameters(list_parameters, has_probabilities)
+
+def get_content_hash(content: bytes, has_probabilities: bool):
+
+    """
+    This function computes the key of the cache of parsed parameters.
+
+    Parameters
+    ----------
+    content: bytes
+        Content of the parameter file.
+
+    has_probabilities: bool
+        Whether the parameters contain the probabilities of the nuclei.
+
+    Returns
+    -------
+    content_hash : str
+        SHA-256 hash of the content, the kind of parameters and the format version.
+    """
+
+    h = hashlib.sha256()
+    h.update(("GMMParameters-v" + PARAMETERS_FORMAT_VERSION + "-" + str(has_probabilities) + "\n").encode("utf-8"))
+    h.update(content)
+
+    return h.hexdigest()
+
+def load_gmm_parameters(param_path: str, city_name: str, kind: str, disk_cache: bool = True):
+
+    """
+    This function loads the GMM parameters of the file "[city_name]_[kind].json".
+
+    The parsed parameters are cached in memory and, if disk_cache is True, in the
+    sub-directory "data/GMM_parameters_cache". Both caches are keyed by the hash of the
+    content of the file, so changes to the file are always taken into account.
+
+    Parameters
+    ----------
+    param_path: str
+        Full path to the folder containing the JSON files.
+
+    city_name: str
+        Name of the municipality.
+
+    kind: str
+        Kind of parameters ("addresses", "houses", "workplaces" or "hhd").
+
+    disk_cache: bool, optional
+        Whether to use the disk cache of parsed parameters.
+        The default is True.
+
+    Returns
+    -------
+    parameters : GMMParameters
+        The parsed parameters.
+    """
+
+    if kind not in PARAMETER_KINDS:
+        raise Exception("The kind of parameters " + str(kind) + " does not exist. Use one of: " + ", ".join(PARAMETER_KINDS) + ".")
+    has_probabilities = PARAMETER_KINDS[kind]
+
+    # Read the parameter file and get its hash
+    complete_param_path = os.path.join(param_path, str(city_name) + "_" + kind + ".json")
+    with open(complete_param_path, "rb") as t:
+        content = t.read()
+    content_hash = get_content_hash(content, has_probabilities)
+
+    # Use the parameters kept in memory
+    if content_hash in _parameters_cache:
+        return _parameters_cache[content_hash]
+
+    # Use the parameters stored on disk
+    cache_file = None
+    if disk_cache:
+        cache_dir = os.path.join(get_path_to_folder("data"), os.path.basename(PARAMETERS_CACHE_DIR))
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_file = os.path.join(cache_dir, content_hash + ".npz")
+        parameters = _read_cached_parameters(cache_file, content_hash)
+        if parameters is not None:
+            _parameters_cache[content_hash] = parameters
+            return parameters
+
+    # Parse the parameters and factorize the covariance matrices
+    parameters = parse_gmm_parameters(json.loads(content.decode("utf-8")), has_probabilities, content_hash)
+    _parameters_cache[content_hash] = parameters
+
+    if cache_file is not None:
+        _write_cached_parameters(cache_file, parameters)
+
+    return parameters
+
+def _read_cached_parameters(cache_file: str, content_hash: str):
+
+    # Read the parameters stored on disk (a damaged file is ignored and rewritten)
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with np.load(cache_file, allow_pickle=False) as stored:
+            probabilities = stored["probabilities"] if bool(stored["has_probabilities"]) else None
+            return GMMParameters(features=[str(f) for f in stored["features"]],
+                                 probabilities=probabilities,
+                                 means=stored["means"],
+                                 cholesky=stored["cholesky"],
+                                 content_hash=content_hash)
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _write_cached_parameters(cache_file: str, parameters: GMMParameters):
+
+    # Write to a temporary file first, so concurrent runs never read a partial file
+    tmp_file = cache_file + "." + str(os.getpid()) + ".tmp.npz"
+    has_probabilities = parameters.probabilities is not None
+    np.savez(tmp_file,
+             features=np.array(parameters.features),
+             has_probabilities=np.array(has_probabilities),
+             probabilities=parameters.probabilities if has_probabilities else np.empty(0),
+             means=parameters.means,
+             cholesky=parameters.cholesky)
+    os.replace(tmp_file, cache_file)
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the sampling engines shared by create_gmm_data_dwe.py and
+create_gmm_data_hhd.py to draw the points of the GMMs (residential addresses and
+workplaces) and to build the corresponding data sets from column arrays.
+
+Three engines are available:
+    * "batched": all the vectors of the standard Gaussian distribution of a nucleus are
+      drawn at once and transformed with a single matrix product;
+    * "legacy": one vector of the standard Gaussian distribution is drawn per row, in
+      the order of the rows, which reproduces exactly the data sets generated with the
+      original implementation (e.g., the data sets of the thesis with seed=10);
+    * "philox": as "batched", but the vectors of each row are computed from its ID by a
+      counter-based generator (see philox.py), so each row does not depend on the others.
+"""
+
+import numpy as np
+import pandas as pd
+from code.instrumentation import trace_stage
+from code.options import ENGINES
+from code.schema import check_schema, to_integer_type, to_coordinate_type, CLUSTER_TYPE, COUNT_TYPE, GRID_TYPE, ID_TYPES
+
+def check_engine(engine: str):
+
+    """
+    This function checks if the selected sampling engine exists.
+
+    Parameters
+    ----------
+    engine: str
+        Name of the sampling engine.
+
+    Returns
+    -------
+    None.
+    """
+
+    if engine not in ENGINES:
+        raise Exception("The engine " + str(engine) + " does not exist. Use one of: " + ", ".join(ENGINES) + ".")
+
+def sample_nuclei_points(nuclei_selected, list_cholesky: list, list_means: list, engine: str = "batched", counts=None,
+                         rng=None, z=None):
+
+    """
+    This function draws one point of the Gaussian distribution of the nucleus selected
+    for each row of the data set.
+
+    Parameters
+    ----------
+    nuclei_selected: array_like
+        Nucleus selected for each row of the data set.
+
+    list_cholesky: list
+        Matrices from the cholesky factorizations of the covariance matrices of the nuclei.
+
+    list_means: list
+        Lists of means of the nuclei.
+
+    engine: str, optional
+        Sampling engine ("batched", "legacy" or "philox").
+        The default is "batched".
+
+    counts: array_like, optional
+        Amount of rows assigned to each nucleus. If None, it is computed from nuclei_selected.
+        The default is None.
+
+    rng: numpy.random.Generator, optional
+        Random number generator. If None, the global state of np.random is used.
+        The default is None.
+
+    z: numpy.ndarray, optional
+        Vectors of the standard Gaussian distribution of the rows, which are required by the
+        "philox" engine (see philox.py). Row i is transformed into the point of row i.
+        The default is None.
+
+    Returns
+    -------
+    values : numpy.ndarray
+        Matrix where row i contains the point generated for row i of the data set.
+    """
+
+    check_engine(engine)
+    random = np.random if rng is None else rng
+
+    # Get input
+    nuclei_selected = np.asarray(nuclei_selected, dtype=np.int64)
+    num_characteristics = len(list_means[0])
+    values = np.empty((nuclei_selected.size, num_characteristics))
+
+    if engine == "legacy":
+
+        # Draw one vector per row following the order of the rows
+        for row, j in enumerate(nuclei_selected):
+            z = random.normal(size=num_characteristics)
+            values[row] = (list_cholesky[j] @ z) + list_means[j]
+
+        return values
+
+    if engine == "philox" and z is None:
+        raise Exception("The philox engine needs the vectors of the standard Gaussian distribution of the rows.")
+
+    # Get the rows of each nucleus as consecutive blocks of a stable ordering of the rows
+    if counts is None:
+        counts = np.bincount(nuclei_selected, minlength=len(list_cholesky))
+    order = np.argsort(nuclei_selected, kind="stable")
+    block_ends = np.cumsum(counts)
+
+    # Draw all the vectors of each nucleus at once and transform them with one matrix product
+    for j in range(len(list_cholesky)):
+        if counts[j] == 0:
+            continue
+        rows = order[block_ends[j] - counts[j]:block_ends[j]]
+        z_rows = z[rows] if engine == "philox" else random.normal(size=(rows.size, num_characteristics))
+        values[rows] = (z_rows @ list_cholesky[j].T) + np.asarray(list_means[j], dtype=float)
+
+    return values
+
+def get_grid_coordinates(x, y):
+
+    """
+    This function computes the lower-left corner coordinates of the 100 m grid cells 
+    containing the given points.
+
+    Parameters
+    ----------
+    x: numpy.ndarray
+        X coordinates of the points.
+
+    y: numpy.ndarray
+        Y coordinates of the points.
+
+    Returns
+    -------
+    coord_x_grid : numpy.ndarray
+        X coordinates of the lower-left corners of the grid cells.
+
+    coord_y_grid : numpy.ndarray
+        Y coordinates of the lower-left corners of the grid cells.
+    """
+
+    coord_x_grid = to_integer_type(np.round(x - np.mod(x, 100)), GRID_TYPE, "coord_x_grid")
+    coord_y_grid = to_integer_type(np.round(y - np.mod(y, 100)), GRID_TYPE, "coord_y_grid")
+
+    return coord_x_grid, coord_y_grid
+
+def get_grid_cell_labels(coord_x_grid, coord_y_grid):
+
+    """
+    This function returns the labels of the 100 m grid cells with the form 
+    "100mN[coord_y_grid]E[coord_x_grid]" as a categorical array. Each distinct cell gets an 
+    integer code, and its label is only built once (the strings are only produced for 
+    every row when the data set is exported).
+
+    Parameters
+    ----------
+    coord_x_grid: numpy.ndarray
+        X coordinates of the lower-left corners of the grid cells.
+
+    coord_y_grid: numpy.ndarray
+        Y coordinates of the lower-left corners of the grid cells.
+
+    Returns
+    -------
+    labels : pandas.Categorical
+        Label of the grid cell of each point.
+    """
+
+    # Get the distinct cells and the code of the cell of each point
+    cells, codes = np.unique(np.column_stack((coord_y_grid, coord_x_grid)), axis=0, return_inverse=True)
+
+    # Build the labels of the distinct cells
+    categories = "100mN" + pd.Series(cells[:, 0]).astype(str) + "E" + pd.Series(cells[:, 1]).astype(str)
+
+    return pd.Categorical.from_codes(codes.reshape(-1), categories)
+
+def build_point_dataframe(values, nuclei_selected, list_features: list, first_id: int = 0, schema: str = "standard", ids=None):
+
+    """
+    This function builds the data set of points of a GMM (residential addresses or workplaces)
+    from the generated values, rounding the amount of elements (dwellings or households)
+    associated to each point and inserting the grid cell information.
+
+    Parameters
+    ----------
+    values: numpy.ndarray
+        Matrix where row i contains the values of the features of row i of the data set.
+
+    nuclei_selected: array_like
+        Nucleus selected for each row of the data set.
+
+    list_features: list
+        List of features of the points. It must contain "X" and "Y", and its third element
+        must be the amount of elements associated to each point.
+
+    first_id: int, optional
+        ID of the first point.
+        The default is 0.
+
+    schema: str, optional
+        Schema of the columns ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    ids: numpy.ndarray, optional
+        IDs of the points (used when only some points are generated, see lazy_dataset.py). 
+        If None, the IDs start at first_id.
+        The default is None.
+
+    Returns
+    -------
+    df : dataframe
+        The generated data set.
+    """
+
+    check_schema(schema)
+
+    # Get coordinates
+    x = values[:, list_features.index("X")]
+    y = values[:, list_features.index("Y")]
+
+    # Initialize the columns of the dataframe
+    if ids is None:
+        ids = np.arange(first_id, first_id + values.shape[0], dtype=np.int64)
+    columns = {"ID": to_integer_type(np.asarray(ids, dtype=np.int64), ID_TYPES[schema], "ID")}
+    for j in range(len(list_features)):
+        columns[list_features[j]] = values[:, j]
+    columns["X"] = to_coordinate_type(x, schema)
+    columns["Y"] = to_coordinate_type(y, schema)
+
+    # Treat information on amount of elements per point
+    amount = np.round(values[:, 2])
+    amount[amount <= 0] = 1
+    columns[list_features[2]] = to_integer_type(amount, COUNT_TYPE, list_features[2])
+
+    columns["Cluster Nr."] = to_integer_type(np.asarray(nuclei_selected), CLUSTER_TYPE, "Cluster Nr.")
+
+    # Get information on the lower-left corner coordinates of the grid cells
+    coord_x_grid, coord_y_grid = get_grid_coordinates(x, y)
+
+    # Insert grid cell labels and information on its lower-left corner coordinates
+    columns["Gitter_ID_100m"] = get_grid_cell_labels(coord_x_grid, coord_y_grid)
+    columns["coord_x_grid"] = coord_x_grid
+    columns["coord_y_grid"] = coord_y_grid
+
+    # Generate dataframe
+    df = pd.DataFrame(columns)
+
+    return df
+
+def expand_points(parent_data, amount_column: str, list_cholesky: list, list_means: list,
+                  list_features: list, parent_columns: list, engine: str = "batched", rng=None,
+                  schema: str = "standard"):
+
+    """
+    This function generates the elements associated to each point of a GMM (the dwellings of 
+    each residential address or the households of each workplace). The columns of the points 
+    are repeated for their elements, and the features of the elements are drawn from the 
+    Gaussian distribution of the nucleus of their point.
+
+    Parameters
+    ----------
+    parent_data: dataframe
+        Dataframe containing the points (residential addresses or workplaces).
+
+    amount_column: str
+        Column of parent_data with the amount of elements associated to each point.
+
+    list_cholesky: list
+        Matrices from the cholesky factorizations of the covariance matrices of the features 
+        of the elements associated to each nucleus.
+
+    list_means: list
+        Lists of means of the features of the elements associated to each nucleus.
+
+    list_features: list
+        List of features of the elements. The first feature is rounded to two decimals 
+        (cost or income) and the second one to a positive integer (size).
+
+    parent_columns: list
+        Columns of parent_data inserted after the features of the elements.
+
+    engine: str, optional
+        Sampling engine ("batched", "legacy" or "philox").
+        The default is "batched".
+
+    rng: numpy.random.Generator or PhiloxGenerator, optional
+        Random number generator. If None, the global state of np.random is used. The "philox" 
+        engine requires the PhiloxGenerator of the table of the elements (see philox.py).
+        The default is None.
+
+    schema: str, optional
+        Schema of the columns ("standard" or "compact", see schema.py). With "compact", 
+        the IDs of the elements are stored in the integer columns "parent_ID" and "child_index".
+        The default is "standard".
+
+    Returns
+    -------
+    df : dataframe
+        The generated data set.
+    """
+
+    check_schema(schema)
+
+    # Get the amount of elements of each point and the point of each element
+    counts = parent_data[amount_column].to_numpy().astype(np.int64)
+    total = int(counts.sum())
+    parents = np.repeat(np.arange(counts.size), counts)
+    starts = np.cumsum(counts) - counts
+
+    # Get the index of each element in its point
+    child_index = np.arange(total, dtype=np.int64) - np.repeat(starts, counts)
+
+    # Get the nucleus of each element and draw its features
+    clusters = np.repeat(parent_data["Cluster Nr."].to_numpy().astype(np.int64), counts)
+    with trace_stage("sampling", rows=total):
+        z = None
+        if engine == "philox":
+            z = rng.normal(np.repeat(parent_data["ID"].to_numpy(), counts), len(list_means[0]), sub_ids=child_index)
+        values = sample_nuclei_points(clusters, list_cholesky, list_means, engine, rng=rng, z=z)
+
+    with trace_stage("expansion", rows=total):
+
+        # Insert ID with the form [point ID]_[index of element in this point] (or its two parts)
+        parent_ids = np.repeat(parent_data["ID"].to_numpy(), counts)
+        if schema == "compact":
+            columns = {"parent_ID": to_integer_type(parent_ids, ID_TYPES[schema], "parent_ID"),
+                       "child_index": to_integer_type(child_index, COUNT_TYPE, "child_index")}
+        else:
+            columns = {"ID": (pd.Series(parent_ids).astype(str) + "_" + pd.Series(child_index).astype(str)).to_numpy(dtype=object)}
+
+        # Insert spatial coordinates
+        columns["X"] = to_coordinate_type(np.repeat(parent_data["X"].to_numpy(), counts), schema)
+        columns["Y"] = to_coordinate_type(np.repeat(parent_data["Y"].to_numpy(), counts), schema)
+
+        # Treat values of the features (e.g., cost and size)
+        columns[list_features[0]] = np.round(values[:, 0], 2)
+        size = np.round(values[:, 1])
+        size[size <= 0] = 1
+        columns[list_features[1]] = to_integer_type(size, COUNT_TYPE, list_features[1])
+
+        # Insert remaining information from the points (categorical columns, e.g. the grid cell 
+        # labels, only repeat their codes)
+        for column in parent_columns:
+            values = parent_data[column].array
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                columns[column] = values.take(parents)
+            else:
+                columns[column] = np.repeat(values.to_numpy(), counts)
+
+        # Create the dataframe
+        df = pd.DataFrame(columns)
+
+    return df
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the incremental growth of saved initial data sets, i.e., the addition of
+new points (residential addresses or workplaces) and their elements (dwellings or households)
+without generating the saved rows again.
+
+When a pair of initial data sets is saved (without shards), create_initial_dwe_data and
+create_initial_hhd_data write a state file "[name of the file of the points].state.json" with
+the state of np.random after the generation, the numbers of points and elements, and the
+engine, schema and parameters of the generation. The growth restores this state, generates
+the new points with the next IDs and their elements, appends them to the files and updates the
+state. Therefore, the new rows continue the random draws of the saved ones exactly as the next
+chunk of the streaming mode (see streaming.py): generating 2000 addresses and growing them by
+500 gives the same data sets as generating 2500 addresses in chunks of 2000.
+
+Only CSV files can be extended. The extended files are renamed after the new number of
+residential addresses (see grow_initial_dwe_data and grow_initial_hhd_data), and their
+metadata file of the cache (and the one of the data sets they replace) is removed (see
+initial_cache.py), since they are not the data sets that would be generated at once with the
+new number of addresses. The entries of the cache are not changed.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from code.dataset_io import DatasetWriter
+from code.initial_cache import INITIAL_DATA_VERSION, remove_metadata, detach_file
+from code.instrumentation import trace_stage
+
+def get_growth_state_path(data_path: str):
+
+    """
+    This function returns the path to the state file of a saved data set of points.
+
+    Parameters
+    ----------
+    data_path: str
+        Path to the file of the data set of points.
+
+    Returns
+    -------
+    state_path : str
+        Path to the state file.
+    """
+
+    return data_path + ".state.json"
+
+def write_growth_state(data_path: str, list_parameters: list, amount_points: int, amount_elements: int, seed_value: int,
+                       engine: str, schema: str):
+
+    """
+    This function writes the state file of a saved data set of points with the current state of
+    np.random.
+
+    Parameters
+    ----------
+    data_path: str
+        Path to the file of the data set of points.
+
+    list_parameters: list
+        Parsed parameters of the points and of the elements (see gmm_parameters.py).
+
+    amount_points: int
+        Number of points of the data set.
+
+    amount_elements: int
+        Number of elements of the data set of elements.
+
+    seed_value: int
+        Seed of the generation.
+
+    engine: str
+        Sampling engine of the generation.
+
+    schema: str
+        Schema of the columns of the data sets.
+
+    Returns
+    -------
+    None.
+    """
+
+    name, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    state = {"version": INITIAL_DATA_VERSION,
+             "parameters": [parameters.content_hash for parameters in list_parameters],
+             "amount_points": int(amount_points),
+             "amount_elements": int(amount_elements),
+             "seed": int(seed_value),
+             "engine": engine,
+             "schema": schema,
+             "random_state": [name, keys.tolist(), int(position), int(has_gauss), float(cached_gaussian)]}
+
+    with open(get_growth_state_path(data_path), "w") as f:
+        json.dump(state, f)
+
+def read_growth_state(data_path: str):
+
+    """
+    This function reads the state file of a saved data set of points.
+
+    Parameters
+    ----------
+    data_path: str
+        Path to the file of the data set of points.
+
+    Returns
+    -------
+    state : dict
+        State of the data set (see write_growth_state).
+    """
+
+    if not os.path.exists(get_growth_state_path(data_path)):
+        raise Exception("The data set " + data_path + " has no state file, so it cannot be extended. "
+                        + "It must be saved without shards.")
+
+    with open(get_growth_state_path(data_path)) as f:
+        return json.load(f)
+
+def remove_growth_state(data_path: str):
+
+    """
+    This function removes the state file of a saved data set of points, which must be done
+    before the data set is overwritten.
+
+    Parameters
+    ----------
+    data_path: str
+        Path to the file of the data set of points.
+
+    Returns
+    -------
+    None.
+    """
+
+    if os.path.exists(get_growth_state_path(data_path)):
+        os.remove(get_growth_state_path(data_path))
+
+def grow_data_sets(amount_new_points: int, list_parameters: list, get_generators,
+                   path_points: str, path_elements: str, new_path_points: str = None, new_path_elements: str = None):
+
+    """
+    This function appends new points and their elements to a saved pair of initial data sets,
+    continuing the random draws and the IDs of the saved rows.
+
+    Parameters
+    ----------
+    amount_new_points: int
+        Number of points to be added.
+
+    list_parameters: list
+        Parsed parameters of the points and of the elements (see gmm_parameters.py). They must
+        be the parameters of the generation of the saved data sets.
+
+    get_generators: function
+        Function that takes the engine and the schema of the saved data sets and returns the
+        functions that generate the points (from the number of points and the ID of the first
+        one) and their elements (from a dataframe of points), see initial_data.py.
+
+    path_points: str
+        Path to the file of the data set of points.
+
+    path_elements: str
+        Path to the file of the data set of elements.
+
+    new_path_points: str, optional
+        Path to which the extended data set of points is renamed. If None, it keeps its path.
+        The default is None.
+
+    new_path_elements: str, optional
+        Path to which the extended data set of elements is renamed. If None, it keeps its path.
+        The default is None.
+
+    Returns
+    -------
+    df_points : dataframe
+        The new points.
+
+    df_elements : dataframe
+        The new elements.
+    """
+
+    if amount_new_points < 0:
+        raise Exception("The number of new points must be non-negative, but it is " + str(amount_new_points) + ".")
+
+    state = read_growth_state(path_points)
+    if state["version"] != INITIAL_DATA_VERSION or state["parameters"] != [parameters.content_hash for parameters in list_parameters]:
+        raise Exception("The data set " + path_points + " was generated with other parameters or another version of the "
+                        + "generation, so it cannot be extended.")
+
+    # Continue the random draws of the saved data sets
+    name, keys, position, has_gauss, cached_gaussian = state["random_state"]
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), position, has_gauss, cached_gaussian))
+
+    with trace_stage("growth", rows=amount_new_points, first_id=state["amount_points"]):
+
+        # Generate the new points with the next IDs and their elements
+        generate_points, generate_elements = get_generators(state["engine"], state["schema"])
+        df_points = generate_points(amount_new_points, state["amount_points"])
+        df_elements = generate_elements(df_points)
+
+        # Append the new rows to the files (not to the entries of the cache linked to them)
+        for df, path in [(df_points, path_points), (df_elements, path_elements)]:
+            detach_file(path)
+            writer = DatasetWriter(path, append=True)
+            writer.write(df)
+            writer.close()
+
+    # The extended data sets are not the ones that would be generated at once
+    remove_metadata(path_elements)
+    remove_growth_state(path_points)
+    if new_path_points is not None:
+        os.replace(path_points, new_path_points)
+        path_points = new_path_points
+    if new_path_elements is not None:
+        remove_metadata(new_path_elements)
+        os.replace(path_elements, new_path_elements)
+
+    write_growth_state(path_points, list_parameters, state["amount_points"] + df_points.shape[0],
+                       state["amount_elements"] + df_elements.shape[0], state["seed"], state["engine"], state["schema"])
+
+    return df_points, df_elements
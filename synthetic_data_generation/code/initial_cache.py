@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the cache of the saved initial data sets.
+
+Each saved pair of initial data sets (residential addresses and dwellings, or workplaces and
+households) gets a metadata file "[name of the file of the elements].meta.json" with a key,
+i.e., a hash of the content of the parameter files (see get_content_hash), the number of
+points, the seed, the engine, the schema, the chunks or shards and the version of the
+generation.
+
+Since the names of the files only contain the numbers of points and the seed, data sets
+generated with other inputs (e.g., with other parameter files) have the same names. Therefore,
+each generated pair is also stored in the sub-directory "cache/[key]" of the directory of the
+files (see get_cached_paths), where the entries of several keys live side by side; the files
+of the entries are hard links of the saved files (or copies, if the file system does not
+support hard links), so they take no further space while the saved files are not replaced.
+Before generating initial data sets, create_initial_dwe_data and create_initial_hhd_data
+compare their key with the key of the saved data sets: if they match, the saved data sets are
+used; otherwise, if the cache has an entry with their key, the entry is restored at the names
+of the files (see restore_initial_data) and used; otherwise, the data sets are generated
+again, replace the saved ones and are stored in the cache (see store_initial_data). If the
+data sets are not saved (e.g., without --keep-initial), the entry of their key is read
+directly, and the data sets generated on a miss are only written to their entry. The entries
+are never removed automatically, but the sub-directory "cache" can be deleted at any time.
+
+INITIAL_DATA_VERSION must be increased when a change of the generation changes the
+generated data sets.
+"""
+
+import hashlib
+import json
+import shutil
+import time
+import os
+
+# Version of the generation of the initial data sets (part of the key)
+INITIAL_DATA_VERSION = "1"
+
+# Sub-directory of the entries of the cache and number of characters of the key in their names
+CACHE_DIRECTORY = "cache"
+CACHE_KEY_LENGTH = 16
+
+def get_initial_data_key(list_parameters: list, amount_points: int, seed_value: int, engine: str, schema: str,
+                         chunk_size: int = None, num_shards: int = None):
+
+    """
+    This function computes the key of a pair of initial data sets.
+
+    Parameters
+    ----------
+    list_parameters: list
+        Parsed parameters of the points and of the elements (see gmm_parameters.py).
+
+    amount_points: int
+        Number of points (residential addresses or workplaces).
+
+    seed_value: int
+        Seed of the random draws.
+
+    engine: str
+        Sampling engine ("batched", "legacy" or "philox").
+
+    schema: str
+        Schema of the columns ("standard" or "compact").
+
+    chunk_size: int, optional
+        Size of the chunks of points, if the data sets are generated in chunks.
+        The default is None.
+
+    num_shards: int, optional
+        Number of shards, if the data sets are generated in shards.
+        The default is None.
+
+    Returns
+    -------
+    key : str
+        SHA-256 hash of the inputs of the generation.
+    """
+
+    information = {"version": INITIAL_DATA_VERSION,
+                   "parameters": [parameters.content_hash for parameters in list_parameters],
+                   "amount_points": int(amount_points),
+                   "seed": int(seed_value),
+                   "engine": engine,
+                   "schema": schema,
+                   "chunk_size": chunk_size,
+                   "num_shards": num_shards}
+
+    return hashlib.sha256(json.dumps(information, sort_keys=True).encode("utf-8")).hexdigest()
+
+def get_metadata_path(data_path: str):
+
+    """
+    This function returns the path to the metadata file of a saved data set.
+
+    Parameters
+    ----------
+    data_path: str
+        Path to the file of the data set.
+
+    Returns
+    -------
+    metadata_path : str
+        Path to the metadata file.
+    """
+
+    return data_path + ".meta.json"
+
+def find_initial_data(key: str, data_paths: list):
+
+    """
+    This function checks if the saved initial data sets were generated with the inputs of
+    the selected key.
+
+    Parameters
+    ----------
+    key: str
+        Key of the initial data sets (see get_initial_data_key).
+
+    data_paths: list
+        Paths to the files of the points and of the elements. The metadata file is the one
+        of the last file.
+
+    Returns
+    -------
+    found : bool
+        Whether all the files exist and their key is the selected one.
+    """
+
+    if not all(os.path.exists(path) for path in data_paths):
+        return False
+
+    try:
+        with open(get_metadata_path(data_paths[-1])) as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    return metadata.get("key") == key
+
+def remove_metadata(data_path: str):
+
+    """
+    This function removes the metadata file of a saved data set, which must be done before
+    the data set is overwritten.
+
+    Parameters
+    ----------
+    data_path: str
+        Path to the file of the data set.
+
+    Returns
+    -------
+    None.
+    """
+
+    if os.path.exists(get_metadata_path(data_path)):
+        os.remove(get_metadata_path(data_path))
+
+def write_metadata(key: str, data_path: str, **information):
+
+    """
+    This function writes the metadata file of a saved data set.
+
+    Parameters
+    ----------
+    key: str
+        Key of the data set (see get_initial_data_key).
+
+    data_path: str
+        Path to the file of the data set.
+
+    information: optional
+        Further information on the data set (e.g., the number of rows).
+
+    Returns
+    -------
+    None.
+    """
+
+    metadata = {"key": key, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "version": INITIAL_DATA_VERSION}
+    metadata.update(information)
+
+    with open(get_metadata_path(data_path), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+def get_cached_paths(key: str, data_paths: list):
+
+    """
+    This function returns the paths to the files of the entry of the cache of a key.
+
+    Parameters
+    ----------
+    key: str
+        Key of the initial data sets (see get_initial_data_key).
+
+    data_paths: list
+        Paths to the saved files of the data sets.
+
+    Returns
+    -------
+    cached_paths : list
+        Paths to the files of the entry, in the same order.
+    """
+
+    return [os.path.join(os.path.dirname(path), CACHE_DIRECTORY, key[:CACHE_KEY_LENGTH], os.path.basename(path))
+            for path in data_paths]
+
+def link_file(source: str, destination: str):
+
+    """
+    This function makes a hard link of a file (or a copy, if the file system does not support
+    hard links), replacing the destination.
+
+    Parameters
+    ----------
+    source: str
+        Path to the file.
+
+    destination: str
+        Path to the link.
+
+    Returns
+    -------
+    None.
+    """
+
+    if os.path.exists(destination):
+        os.remove(destination)
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+def detach_file(data_path: str):
+
+    """
+    This function replaces a saved file that is linked to an entry of the cache with a copy,
+    which must be done before the file is modified in place (e.g., before rows are appended
+    to it, see growth.py).
+
+    Parameters
+    ----------
+    data_path: str
+        Path to the file.
+
+    Returns
+    -------
+    None.
+    """
+
+    if os.path.exists(data_path) and os.stat(data_path).st_nlink > 1:
+        shutil.copyfile(data_path, data_path + ".tmp")
+        os.replace(data_path + ".tmp", data_path)
+
+def remove_initial_data(data_paths: list, state_paths: list = ()):
+
+    """
+    This function removes saved initial data sets and their metadata and state files, which
+    must be done before they are generated again, so the files of the entries of the cache
+    are not overwritten.
+
+    Parameters
+    ----------
+    data_paths: list
+        Paths to the files of the points and of the elements. The metadata file is the one
+        of the last file.
+
+    state_paths: list, optional
+        Paths to further files of the data sets (e.g., the state files of growth.py).
+        The default is ().
+
+    Returns
+    -------
+    None.
+    """
+
+    for path in list(data_paths) + [get_metadata_path(data_paths[-1])] + list(state_paths):
+        if os.path.exists(path):
+            os.remove(path)
+
+def store_initial_data(key: str, data_paths: list, state_paths: list = ()):
+
+    """
+    This function stores saved initial data sets in the entry of the cache of their key.
+
+    Parameters
+    ----------
+    key: str
+        Key of the initial data sets (see get_initial_data_key).
+
+    data_paths: list
+        Paths to the files of the points and of the elements. The metadata file is the one
+        of the last file.
+
+    state_paths: list, optional
+        Paths to further files of the data sets (e.g., the state files of growth.py), which
+        are copied if they exist.
+        The default is ().
+
+    Returns
+    -------
+    None.
+    """
+
+    cached_paths = get_cached_paths(key, list(data_paths) + list(state_paths))
+    os.makedirs(os.path.dirname(cached_paths[0]), exist_ok=True)
+
+    # The metadata file is written last, so an interrupted entry is never found
+    for path, cached_path in zip(data_paths, cached_paths):
+        link_file(path, cached_path)
+    for path, cached_path in zip(state_paths, cached_paths[len(data_paths):]):
+        if os.path.exists(path):
+            shutil.copyfile(path, cached_path)
+    shutil.copyfile(get_metadata_path(data_paths[-1]), get_metadata_path(cached_paths[len(data_paths) - 1]))
+
+def restore_initial_data(key: str, data_paths: list, state_paths: list = ()):
+
+    """
+    This function restores the entry of the cache of a key at the paths of the saved initial
+    data sets, if the entry exists.
+
+    Parameters
+    ----------
+    key: str
+        Key of the initial data sets (see get_initial_data_key).
+
+    data_paths: list
+        Paths to the files of the points and of the elements. The metadata file is the one
+        of the last file.
+
+    state_paths: list, optional
+        Paths to further files of the data sets (e.g., the state files of growth.py), which
+        are copied if they exist in the entry.
+        The default is ().
+
+    Returns
+    -------
+    found : bool
+        Whether the entry exists (and was restored).
+    """
+
+    cached_paths = get_cached_paths(key, list(data_paths) + list(state_paths))
+    if not find_initial_data(key, cached_paths[:len(data_paths)]):
+        return False
+
+    # The metadata file is written last, as in store_initial_data
+    remove_initial_data(data_paths, state_paths)
+    for path, cached_path in zip(data_paths, cached_paths):
+        link_file(cached_path, path)
+    for path, cached_path in zip(state_paths, cached_paths[len(data_paths):]):
+        if os.path.exists(cached_path):
+            shutil.copyfile(cached_path, path)
+    shutil.copyfile(get_metadata_path(cached_paths[len(data_paths) - 1]), get_metadata_path(data_paths[-1]))
+
+    return True
@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the generation of a pair of initial data sets, i.e., of a data set of
+points of a GMM (residential addresses or workplaces) and of the data set of their elements
+(dwellings or households).
+
+The procedure is the same for both pairs, so create_gmm_data_dwe.py and
+create_gmm_data_hhd.py only define their branch (see InitialDataBranch) and call the
+functions of this script:
+    * create_initial_data generates the pair at once, in chunks (see streaming.py) or in
+      shards (see sharding.py), and saves and caches it (see initial_cache.py and growth.py);
+    * create_exact_data generates the pair with an exact number of elements (see
+      target_size.py);
+    * grow_initial_data adds points and their elements to a saved pair (see growth.py).
+"""
+
+from dataclasses import dataclass
+from functools import partial
+import os
+
+import numpy as np
+
+from code.get_files import get_path_to_folder
+from code.gmm_parameters import load_gmm_parameters
+from code.streaming import stream_gmm_data
+from code.sharding import generate_sharded_data
+from code.target_size import get_expected_amount, generate_points_for_elements
+from code.dataset_io import get_initial_df_name, write_dataset, read_dataset
+from code.initial_cache import get_initial_data_key, find_initial_data, write_metadata, get_cached_paths, remove_initial_data, \
+    store_initial_data, restore_initial_data
+from code.philox import get_philox_generator
+from code.growth import get_growth_state_path, write_growth_state, grow_data_sets
+from code.instrumentation import trace_stage
+
+@dataclass(frozen=True)
+class InitialDataBranch:
+
+    """
+    This class contains a branch of the generation, i.e., a pair of initial data sets.
+
+    Attributes
+    ----------
+    points: str
+        Data set of the points in the names of the files ("Addresses" or "Workplaces").
+
+    elements: str
+        Data set of the elements in the names of the files ("Houses" or "Households").
+
+    kinds: tuple
+        Kinds of the parameter files of the points and of the elements (see gmm_parameters.py).
+
+    points_label: str
+        Name of the points in plural, used in the messages (e.g., "residential addresses").
+
+    elements_label: str
+        Name of the elements in plural, used in the messages (e.g., "dwellings").
+
+    amount_column: str
+        Column of the points with their amount of elements.
+
+    generate_points: function
+        Function that generates the points (gmm_address or gmm_workplace).
+
+    generate_elements: function
+        Function that generates the elements of a dataframe of points (gmm_dwelling or gmm_hhd).
+    """
+
+    points: str
+    elements: str
+    kinds: tuple
+    points_label: str
+    elements_label: str
+    amount_column: str
+    generate_points: object
+    generate_elements: object
+
+    def load_parameters(self, param_path: str, city_name: str):
+
+        """
+        This function loads the (cached) parameters of the points and of the elements.
+
+        Parameters
+        ----------
+        param_path: str
+            Full path to the directory with the JSON files containing the GMM parameters.
+
+        city_name: str
+            Name of the municipality.
+
+        Returns
+        -------
+        list_parameters : list
+            Parsed parameters of the points and of the elements (see gmm_parameters.py).
+        """
+
+        with trace_stage("parameter load"):
+            return [load_gmm_parameters(param_path, city_name, kind) for kind in self.kinds]
+
+    def get_generators(self, list_parameters: list, engine: str, seed_value: int, schema: str, rng=None):
+
+        """
+        This function returns the functions that generate the points and their elements with
+        the selected parameters, engine, seed and schema.
+
+        Parameters
+        ----------
+        list_parameters: list
+            Parsed parameters of the points and of the elements.
+
+        engine: str
+            Sampling engine ("batched", "legacy" or "philox").
+
+        seed_value: int
+            Seed of the generation (used by the "philox" engine).
+
+        schema: str
+            Schema of the columns ("standard" or "compact").
+
+        rng: numpy.random.Generator, optional
+            Random number generator of a shard. If None, the global state of np.random is
+            used. The "philox" engine computes the numbers of each row from its ID instead.
+            The default is None.
+
+        Returns
+        -------
+        generate_points : function
+            Function that takes a number of points and the ID of the first one and returns
+            the dataframe of the points.
+
+        generate_elements : function
+            Function that takes a dataframe of points and returns the dataframe of their
+            elements.
+        """
+
+        rng = get_philox_generator(engine, seed_value) or rng
+        list_param_points, list_param_elements = list_parameters
+
+        def generate_points(size: int, first_id: int = 0):
+            return self.generate_points(size, list_param_points, engine, first_id=first_id, rng=rng, schema=schema)
+
+        def generate_elements(df_points):
+            return self.generate_elements(df_points, list_param_elements, engine=engine, rng=rng, schema=schema)
+
+        return generate_points, generate_elements
+
+    def get_paths(self, data_path: str, city_name: str, amount_addresses: int, proportion_workplaces: float,
+                  seed_value: int = 10, output_format: str = "csv"):
+
+        """
+        This function returns the paths to the files of the pair of initial data sets.
+
+        Parameters
+        ----------
+        data_path: str
+            Full path to the directory of the files.
+
+        city_name: str
+            Name of the municipality.
+
+        amount_addresses: int
+            Amount of residential addresses (part of the names of the files).
+
+        proportion_workplaces: float
+            Proportion of workplaces (part of the names of the files).
+
+        seed_value: int, optional
+            Seed of the generation.
+            The default is 10.
+
+        output_format: str, optional
+            File format ("csv", "parquet" or "feather").
+            The default is "csv".
+
+        Returns
+        -------
+        path_points : str
+            Path to the file of the points.
+
+        path_elements : str
+            Path to the file of the elements.
+        """
+
+        return tuple(os.path.join(data_path, get_initial_df_name(data_set, city_name, amount_addresses, proportion_workplaces,
+                                                                 seed_value, output_format))
+                     for data_set in [self.points, self.elements])
+
+def _generate_shard(size: int, first_id: int, rng, branch: InitialDataBranch, list_parameters: list, engine: str,
+                    schema: str, seed_value: int):
+
+    # Generate a shard of points and their elements with the generator of the shard (see sharding.py)
+    generate_points, generate_elements = branch.get_generators(list_parameters, engine, seed_value, schema, rng)
+    df_points = generate_points(size, first_id)
+
+    return df_points, generate_elements(df_points)
+
+def create_initial_data(branch: InitialDataBranch,
+                        amount_points: int,
+                        amount_addresses: int,
+                        proportion_workplaces: float,
+                        param_path: str = "data/GMM_parameters",
+                        city_name: str = None,
+                        data_path: str = "data/datasets",
+                        engine: str = "batched",
+                        chunk_size: int = None,
+                        output_format: str = "csv",
+                        save: bool = True,
+                        num_shards: int = None,
+                        schema: str = "standard",
+                        seed_value: int = 10,
+                        use_cache: bool = True):
+
+    """
+    This function generates a pair of initial data sets (see create_initial_dwe_data and
+    create_initial_hhd_data).
+
+    Parameters
+    ----------
+    branch: InitialDataBranch
+        Branch of the data sets.
+
+    amount_points: int
+        Number of points of the data set.
+
+    amount_addresses: int
+        Amount of residential addresses (part of the names of the files).
+
+    proportion_workplaces: float
+        Proportion of workplaces (part of the names of the files).
+
+    param_path, city_name, data_path, engine, chunk_size, output_format, save, num_shards,
+    schema, seed_value, use_cache:
+        See create_initial_dwe_data.
+
+    Returns
+    -------
+    df_points : dataframe
+        The generated data set of points (None if it is generated in chunks).
+
+    df_elements : dataframe
+        The generated data set of elements (None if it is generated in chunks).
+    """
+
+    # Set seed
+    np.random.seed(seed_value)
+
+    # Get full paths and the (cached) parameters of the points and of the elements
+    param_path = get_path_to_folder(param_path)
+    data_path = get_path_to_folder(data_path)
+    list_parameters = branch.load_parameters(param_path, city_name)
+    path_points, path_elements = branch.get_paths(data_path, city_name, amount_addresses, proportion_workplaces, seed_value, output_format)
+
+    if num_shards is not None and (engine == "legacy" or chunk_size is not None):
+        raise Exception("The data sets generated in shards cannot use the legacy engine or chunks.")
+
+    # Get the key of the inputs and the paths to the entry of the cache with this key
+    key = get_initial_data_key(list_parameters, amount_points, seed_value, engine, schema, chunk_size, num_shards)
+    data_paths = [path_points, path_elements]
+    cached_paths = get_cached_paths(key, data_paths)
+
+    # Use the saved data sets (or the entry of the cache) if they were generated with the same inputs. 
+    # If the data sets are not saved, the entry is read without being restored at the names of the files
+    if use_cache:
+        if save:
+            found_paths = data_paths if (find_initial_data(key, data_paths)
+                                         or restore_initial_data(key, data_paths, [get_growth_state_path(path_points)])) else None
+        else:
+            found_paths = next((paths for paths in [data_paths, cached_paths] if find_initial_data(key, paths)), None)
+
+        if found_paths is not None:
+            print("\nThe saved data sets of " + branch.points_label + " and " + branch.elements_label
+                  + " were generated with the same inputs and are used:", *found_paths)
+            if chunk_size is not None:
+                return None, None
+            return read_dataset(found_paths[0], exact_floats=True), read_dataset(found_paths[1], exact_floats=True)
+
+    # The saved files are removed (not overwritten), since the entries of the cache may be linked to them
+    if save:
+        remove_initial_data(data_paths, [get_growth_state_path(path_points)])
+
+    generate_points, generate_elements = branch.get_generators(list_parameters, engine, seed_value, schema)
+
+    # Generate the data sets in chunks of points and append them to the files
+    if chunk_size is not None:
+
+        if engine == "legacy":
+            raise Exception("The legacy engine cannot generate the data sets in chunks.")
+        if not save:
+            raise Exception("The data sets generated in chunks must be saved.")
+
+        amount_elements = stream_gmm_data(amount_points, chunk_size, generate_points, generate_elements, path_points, path_elements)
+
+        print("\nThe new data set of " + branch.points_label + " was saved at:", path_points)
+        print("\nThe new data set with", amount_elements, branch.elements_label, "was saved at:", path_elements)
+        write_metadata(key, path_elements, amount_points=amount_points, rows=amount_elements, seed=seed_value, engine=engine)
+        write_growth_state(path_points, list_parameters, amount_points, amount_elements, seed_value, engine, schema)
+        if use_cache:
+            store_initial_data(key, data_paths, [get_growth_state_path(path_points)])
+        return None, None
+
+    # Generate the data sets in shards of points in a pool of processes
+    if num_shards is not None:
+        generate_shard = partial(_generate_shard, branch=branch, list_parameters=list_parameters, engine=engine, schema=schema,
+                                 seed_value=seed_value)
+        df_points, df_elements = generate_sharded_data(amount_points, num_shards, generate_shard, seed_value)
+
+    else:
+        # Generate the data set of points
+        with trace_stage(branch.generate_points.__name__) as record:
+            df_points = generate_points(amount_points)
+            record["rows"] = df_points.shape[0]
+
+        # Generate the data set of elements
+        with trace_stage(branch.generate_elements.__name__) as record:
+            df_elements = generate_elements(df_points)
+            record["rows"] = df_elements.shape[0]
+
+    # Save the data sets in the selected format (or only in the entry of the cache, if they are not saved)
+    if save or use_cache:
+        written_paths = data_paths if save else cached_paths
+        if not save:
+            remove_initial_data(cached_paths, [get_growth_state_path(cached_paths[0])])
+            os.makedirs(os.path.dirname(cached_paths[0]), exist_ok=True)
+
+        location = " was saved at:" if save else " was stored in the cache at:"
+        write_dataset(df_points, written_paths[0])
+        print("\nThe new data set of " + branch.points_label + location, written_paths[0])
+
+        write_dataset(df_elements, written_paths[1])
+        print("\nThe new data set of " + branch.elements_label + location, written_paths[1])
+
+        # The metadata file is written last, so an interrupted entry of the cache is never found
+        if num_shards is None:
+            write_growth_state(written_paths[0], list_parameters, amount_points, df_elements.shape[0], seed_value, engine, schema)
+        write_metadata(key, written_paths[1], amount_points=amount_points, rows=df_elements.shape[0], seed=seed_value, engine=engine)
+        if save and use_cache:
+            store_initial_data(key, data_paths, [get_growth_state_path(path_points)])
+
+    return df_points, df_elements
+
+def create_exact_data(branch: InitialDataBranch,
+                      amount_elements: int,
+                      param_path: str = "data/GMM_parameters",
+                      city_name: str = None,
+                      engine: str = "batched",
+                      schema: str = "standard",
+                      seed_value: int = 10):
+
+    """
+    This function generates a data set of points and the data set of their elements with
+    exactly the selected number of elements (see create_exact_dwe_data and
+    create_exact_hhd_data).
+
+    Parameters
+    ----------
+    branch: InitialDataBranch
+        Branch of the data sets.
+
+    amount_elements: int
+        Number of elements.
+
+    param_path, city_name, engine, schema, seed_value:
+        See create_exact_dwe_data.
+
+    Returns
+    -------
+    df_points : dataframe
+        The generated data set of points.
+
+    df_elements : dataframe
+        The generated data set of elements.
+    """
+
+    # Set seed
+    np.random.seed(seed_value)
+
+    # Load the (cached) parameters of the points and of the elements
+    list_parameters = branch.load_parameters(get_path_to_folder(param_path), city_name)
+    generate_points, generate_elements = branch.get_generators(list_parameters, engine, seed_value, schema)
+
+    # Generate the points whose amounts of elements sum up to the selected number
+    with trace_stage(branch.generate_points.__name__, rows=amount_elements) as record:
+        df_points = generate_points_for_elements(amount_elements, branch.amount_column, generate_points,
+                                                 get_expected_amount(list_parameters[0]))
+        record["rows"] = df_points.shape[0]
+
+    # Generate the data set of elements
+    with trace_stage(branch.generate_elements.__name__, rows=amount_elements):
+        df_elements = generate_elements(df_points)
+
+    return df_points, df_elements
+
+def grow_initial_data(branch: InitialDataBranch,
+                      amount_new_points: int,
+                      amount_addresses: int,
+                      amount_new_addresses: int,
+                      proportion_workplaces: float,
+                      param_path: str = "data/GMM_parameters",
+                      city_name: str = None,
+                      data_path: str = "data/datasets/initial",
+                      seed_value: int = 10):
+
+    """
+    This function adds points and their elements to a saved pair of initial data sets (see
+    grow_initial_dwe_data and grow_initial_hhd_data). The extended files are renamed after
+    the new number of residential addresses.
+
+    Parameters
+    ----------
+    branch: InitialDataBranch
+        Branch of the data sets.
+
+    amount_new_points: int
+        Number of points to be added.
+
+    amount_addresses: int
+        Amount of residential addresses of the saved data sets (part of the names of the files).
+
+    amount_new_addresses: int
+        Amount of residential addresses to be added (part of the names of the new files).
+
+    proportion_workplaces, param_path, city_name, data_path, seed_value:
+        See grow_initial_dwe_data.
+
+    Returns
+    -------
+    df_points : dataframe
+        The new points.
+
+    df_elements : dataframe
+        The new elements.
+    """
+
+    # Get full paths and the (cached) parameters of the points and of the elements
+    param_path = get_path_to_folder(param_path)
+    data_path = get_path_to_folder(data_path)
+    list_parameters = branch.load_parameters(param_path, city_name)
+
+    # Get the paths to the saved and to the extended data sets
+    paths = (branch.get_paths(data_path, city_name, amount_addresses, proportion_workplaces, seed_value)
+             + branch.get_paths(data_path, city_name, amount_addresses + amount_new_addresses, proportion_workplaces, seed_value))
+
+    df_points, df_elements = grow_data_sets(amount_new_points, list_parameters,
+                                            lambda engine, schema: branch.get_generators(list_parameters, engine, seed_value, schema),
+                                            *paths)
+
+    print("\nThe data set of " + branch.points_label + " was extended by", df_points.shape[0], branch.points_label, "and saved at:", paths[2])
+    print("\nThe data set of " + branch.elements_label + " was extended by", df_elements.shape[0], branch.elements_label, "and saved at:", paths[3])
+
+    return df_points, df_elements
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the instrumentation of the generation of the data sets.
+
+The stages of the generation (e.g., parameter load, nucleus selection, sampling,
+expansion, post-processing and I/O) are wrapped with trace_stage. When the instrumentation
+is started, each stage records its time, its number of rows and the change of the resident
+set size (RSS) of the process. The records are sent to the logger "synthetic_data_generation"
+and, when the instrumentation is finished, written to a JSON trace. Stages inside other
+stages are recorded with the path of the enclosing stages, e.g.,
+"create_initial_dwe_data/gmm_address/sampling".
+
+The instrumentation can also switch off the messages with complete data sets (see
+print_dataframe) and profile the generation with cProfile.
+
+Only the stages of the main process are recorded. The processes of the concurrent mode and of
+the shards get the settings of the main process (see get_instrumentation_settings), so the
+data sets are not printed there either, and their work is recorded by the stages of the main
+process that wait for them.
+"""
+
+from contextlib import contextmanager
+import logging
+import time
+import json
+import os
+
+logger = logging.getLogger("synthetic_data_generation")
+
+# Settings and state of the instrumentation
+_settings = {"enabled": False, "print_data": True}
+_state = {"records": [], "stack": [], "trace_path": None, "profiler": None, "profile_path": None}
+
+def start_instrumentation(trace_path: str = None, print_data: bool = True, profile_path: str = None):
+
+    """
+    This function starts recording the stages of the generation.
+
+    Parameters
+    ----------
+    trace_path: str, optional
+        Path to the JSON file where the records are written by finish_instrumentation.
+        If None, the records are only sent to the logger.
+        The default is None.
+
+    print_data: bool, optional
+        Whether to print the complete data sets (see print_dataframe).
+        The default is True.
+
+    profile_path: str, optional
+        If given, the generation is profiled with cProfile, and the statistics are written to
+        this file (it can be read with pstats).
+        The default is None.
+
+    Returns
+    -------
+    None.
+    """
+
+    _settings["enabled"] = True
+    _settings["print_data"] = print_data
+    _state.update({"records": [], "stack": [], "trace_path": trace_path, "profiler": None, "profile_path": profile_path})
+
+    if profile_path is not None:
+        import cProfile
+        _state["profiler"] = cProfile.Profile()
+        _state["profiler"].enable()
+
+def finish_instrumentation():
+
+    """
+    This function stops recording the stages of the generation and writes the JSON trace
+    and the statistics of the profiler.
+
+    Returns
+    -------
+    records : list
+        Records of the stages, in the order they finished.
+    """
+
+    if _state["profiler"] is not None:
+        _state["profiler"].disable()
+        _state["profiler"].dump_stats(_state["profile_path"])
+        logger.info("The profile was saved at %s", _state["profile_path"])
+
+    records = _state["records"]
+    if _settings["enabled"] and _state["trace_path"] is not None:
+        with open(_state["trace_path"], "w") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "stages": records}, f, indent=2)
+        logger.info("The trace was saved at %s", _state["trace_path"])
+
+    _settings["enabled"] = False
+    _state.update({"records": [], "stack": [], "trace_path": None, "profiler": None, "profile_path": None})
+
+    return records
+
+def get_instrumentation_settings():
+
+    """
+    This function returns the settings of the instrumentation, which are passed to
+    set_instrumentation_settings in the worker processes (as the initializer of their pool).
+
+    Returns
+    -------
+    settings : dict
+        Settings of the instrumentation.
+    """
+
+    return dict(_settings, enabled=False)
+
+def set_instrumentation_settings(settings: dict):
+
+    """
+    This function sets the settings of the instrumentation (see get_instrumentation_settings).
+
+    Parameters
+    ----------
+    settings: dict
+        Settings of the instrumentation.
+
+    Returns
+    -------
+    None.
+    """
+
+    _settings.update(settings)
+
+def get_rss_mb():
+
+    """
+    This function returns the current resident set size (RSS) of the process in MB. On systems
+    without /proc, the peak RSS is returned instead, and None if it is not available either.
+
+    Returns
+    -------
+    rss : float
+        RSS of the process in MB.
+    """
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    except ImportError:
+        return None
+
+@contextmanager
+def trace_stage(stage: str, rows: int = None, **information):
+
+    """
+    This function records a stage of the generation (used in a with statement). The rows
+    of the stage can be given or set in the yielded record, e.g.,
+
+        with trace_stage("sampling") as record:
+            ...
+            record["rows"] = values.shape[0]
+
+    Parameters
+    ----------
+    stage: str
+        Name of the stage.
+
+    rows: int, optional
+        Number of rows produced by the stage.
+        The default is None.
+
+    information: optional
+        Further information on the stage (e.g., the path of a file).
+
+    Returns
+    -------
+    record : dict
+        Record of the stage.
+    """
+
+    record = {"stage": stage, "rows": rows}
+    record.update(information)
+
+    if not _settings["enabled"]:
+        yield record
+        return
+
+    # Measure the stage
+    _state["stack"].append(stage)
+    record["path"] = "/".join(_state["stack"])
+    rss_before = get_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        rss_after = get_rss_mb()
+        record["rss_mb"] = rss_after
+        record["rss_delta_mb"] = None if rss_before is None or rss_after is None else rss_after - rss_before
+        _state["stack"].pop()
+        _state["records"].append(record)
+        logger.info("%s: %.3f s, %s rows, RSS %+.1f MB", record["path"], record["seconds"], record["rows"],
+                    record["rss_delta_mb"] or 0.0)
+
+def print_dataframe(message: str, df):
+
+    """
+    This function prints a message followed by a complete data set, unless the messages with
+    complete data sets were switched off (see start_instrumentation).
+
+    Parameters
+    ----------
+    message: str
+        Message printed before the data set.
+
+    df: dataframe
+        Data set.
+
+    Returns
+    -------
+    None.
+    """
+
+    if _settings["print_data"]:
+        print(message)
+        print(df)
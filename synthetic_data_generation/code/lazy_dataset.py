@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains a lazy view of an initial data set generated with the "philox" engine,
+which only generates the rows that are requested.
+
+With the "philox" engine, the rows of a data set only depend on their IDs (see philox.py), so
+a part of the data set can be generated without the rest. The view is defined by the number of
+points (residential addresses or workplaces) of the data set and, optionally, by filters:
+    * a range of IDs of the points (the dwellings or households of these points);
+    * the clusters of the points ("Cluster Nr.");
+    * the grid cells of the points ("Gitter_ID_100m").
+The view generates the points batch by batch of IDs as gmm_address and gmm_workplace do: the
+nucleus of each point is selected first, only the points of the selected clusters are
+sampled, and only the points in the selected grid cells are expanded into their dwellings or
+households (see expand_points). Therefore, the rows are the same as the ones of the complete
+data set generated with the "philox" engine and the same seed, but the rows outside the
+filters cost at most the selection of a nucleus (or the sampling of a point).
+"""
+
+import copy
+
+import numpy as np
+
+from code.get_files import get_path_to_folder
+from code.gmm_parameters import load_gmm_parameters
+from code.gmm_sampling import sample_nuclei_points, build_point_dataframe, expand_points
+from code.nucleus_selection import NucleusSelector
+from code.philox import PhiloxGenerator
+from code.schema import check_schema
+from code.sharding import concat_shards
+
+# Tables, parameter files, amount columns and point columns of the data sets of the view
+# (as in gmm_dwelling and gmm_hhd)
+DATA_SETS = {"Houses": {"tables": ("addresses", "dwellings"), "kinds": ("addresses", "houses"),
+                        "amount_column": "amount of dwellings per building",
+                        "parent_columns": ["Gitter_ID_100m", "coord_x_grid", "coord_y_grid", "Cluster Nr."]},
+             "Households": {"tables": ("workplaces", "households"), "kinds": ("workplaces", "hhd"),
+                            "amount_column": "hhd per workplace",
+                            "parent_columns": ["Gitter_ID_100m", "Cluster Nr."]}}
+
+class LazyDataset:
+
+    """
+    This class contains a lazy view of a dwelling or household data set (see above).
+
+    Parameters
+    ----------
+    data_set: str
+        Data set ("Houses" or "Households").
+
+    amount_points: int
+        Number of points of the complete data set (residential addresses for "Houses" and
+        workplaces for "Households").
+
+    city_name: str
+        Name of the municipality. The title of the JSON files must be "[city_name]_[kind].json".
+
+    param_path: str, optional
+        Sub-directory with the JSON files containing the GMM parameters.
+        The default is "data/GMM_parameters".
+
+    seed_value: int, optional
+        Seed of the generation.
+        The default is 10.
+
+    schema: str, optional
+        Schema of the columns ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    batch_size: int, optional
+        Number of IDs of points generated at once.
+        The default is 100000.
+    """
+
+    def __init__(self, data_set: str, amount_points: int, city_name: str, param_path: str = "data/GMM_parameters",
+                 seed_value: int = 10, schema: str = "standard", batch_size: int = 100000):
+
+        if data_set not in DATA_SETS:
+            raise Exception("The data set " + str(data_set) + " does not exist. Use one of: " + ", ".join(DATA_SETS) + ".")
+        if batch_size is None or batch_size <= 0:
+            raise Exception("The size of the batches must be a positive integer.")
+        check_schema(schema)
+
+        self.data_set = data_set
+        self.amount_points = amount_points
+        self.schema = schema
+        self.batch_size = batch_size
+
+        # Load the (cached) parameters of the points and of the elements
+        kind_points, kind_elements = DATA_SETS[data_set]["kinds"]
+        self.parameters_points = load_gmm_parameters(get_path_to_folder(param_path), city_name, kind_points)
+        self.parameters_elements = load_gmm_parameters(get_path_to_folder(param_path), city_name, kind_elements)
+
+        table_points, table_elements = DATA_SETS[data_set]["tables"]
+        self.rng_points = PhiloxGenerator(seed_value, table_points)
+        self.rng_elements = PhiloxGenerator(seed_value).for_table(table_elements)
+        self.selector = NucleusSelector(self.parameters_points.probabilities)
+
+        # Filters of the view
+        self.id_range = (0, amount_points)
+        self.clusters = None
+        self.grid_cells = None
+
+    def filter(self, ids: tuple = None, clusters: list = None, grid_cells: list = None):
+
+        """
+        This function returns a view with the rows of this view that satisfy the selected
+        filters. The filters of this view are kept.
+
+        Parameters
+        ----------
+        ids: tuple, optional
+            Range (start, stop) of the IDs of the points (stop is not included).
+            The default is None.
+
+        clusters: list, optional
+            Clusters of the points ("Cluster Nr.").
+            The default is None.
+
+        grid_cells: list, optional
+            Grid cells of the points ("Gitter_ID_100m", e.g., "100mN900E1900").
+            The default is None.
+
+        Returns
+        -------
+        view : LazyDataset
+            The filtered view.
+        """
+
+        view = copy.copy(self)
+
+        if ids is not None:
+            view.id_range = (max(self.id_range[0], ids[0]), min(self.id_range[1], ids[1]))
+        if clusters is not None:
+            view.clusters = set(clusters) if self.clusters is None else self.clusters & set(clusters)
+        if grid_cells is not None:
+            view.grid_cells = set(grid_cells) if self.grid_cells is None else self.grid_cells & set(grid_cells)
+
+        return view
+
+    def iter_points(self):
+
+        """
+        This function generates the points of the view batch by batch.
+
+        Returns
+        -------
+        batches : generator
+            Dataframes of the points of each batch of IDs (batches without points are skipped).
+        """
+
+        num_features = self.parameters_points.num_characteristics
+
+        for first_id in range(self.id_range[0], self.id_range[1], self.batch_size):
+
+            # Select the nucleus of each point and keep the points of the selected clusters
+            ids = np.arange(first_id, min(first_id + self.batch_size, self.id_range[1]))
+            nuclei_selected = self.selector.select(self.rng_points.uniform(ids))
+            if self.clusters is not None:
+                kept = np.isin(nuclei_selected, list(self.clusters))
+                ids, nuclei_selected = ids[kept], nuclei_selected[kept]
+            if ids.size == 0:
+                continue
+
+            # Sample the kept points (see gmm_address and gmm_workplace)
+            z = self.rng_points.normal(ids, num_features, first_block=1)
+            values = sample_nuclei_points(nuclei_selected, self.parameters_points.cholesky, self.parameters_points.means, "philox", z=z)
+            df = build_point_dataframe(values, nuclei_selected, self.parameters_points.features, schema=self.schema, ids=ids)
+
+            # Keep the points in the selected grid cells
+            if self.grid_cells is not None:
+                df = df[df["Gitter_ID_100m"].isin(self.grid_cells)].reset_index(drop=True)
+                df["Gitter_ID_100m"] = df["Gitter_ID_100m"].cat.remove_unused_categories()
+            if df.shape[0] > 0:
+                yield df
+
+    def iter_batches(self):
+
+        """
+        This function generates the dwellings or households of the view batch by batch.
+
+        Returns
+        -------
+        batches : generator
+            Dataframes of the dwellings or households of each batch of points.
+        """
+
+        for df_points in self.iter_points():
+            yield self._expand_points(df_points)
+
+    def _expand_points(self, df_points):
+
+        # Expand points into their dwellings or households (see gmm_dwelling and gmm_hhd)
+        return expand_points(df_points, DATA_SETS[self.data_set]["amount_column"], self.parameters_elements.cholesky,
+                             self.parameters_elements.means, self.parameters_elements.features,
+                             DATA_SETS[self.data_set]["parent_columns"], "philox", self.rng_elements, self.schema)
+
+    def _get_empty_points(self):
+
+        # Dataframe of points without rows, with the columns and types of the points of the view
+        num_features = self.parameters_points.num_characteristics
+        return build_point_dataframe(np.empty((0, num_features)), np.empty(0, dtype=np.int64), self.parameters_points.features,
+                                     schema=self.schema, ids=np.empty(0, dtype=np.int64))
+
+    def to_dataframe(self, points: bool = False):
+
+        """
+        This function generates all the rows of the view.
+
+        Parameters
+        ----------
+        points: bool, optional
+            Whether to return the points instead of the dwellings or households.
+            The default is False.
+
+        Returns
+        -------
+        df : dataframe
+            The rows of the view. The grid cells remain categorical with the union of the
+            categories of the batches (see concat_shards), and a view without rows gives a
+            dataframe with the columns of the view and no rows.
+        """
+
+        batches = list(self.iter_points() if points else self.iter_batches())
+        if not batches:
+            df_points = self._get_empty_points()
+            batches = [df_points if points else self._expand_points(df_points)]
+
+        return concat_shards(batches)
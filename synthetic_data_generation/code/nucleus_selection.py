@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the component that assigns the points of a GMM (residential
+addresses or workplaces) to the nuclei of the urban model.
+
+The cumulative distribution of the probabilities of the nuclei (or the alias table of
+these probabilities) is computed once, and all the points are assigned at once.
+"""
+
+import numpy as np
+
+SELECTION_METHODS = ("searchsorted", "alias")
+
+class NucleusSelector:
+
+    """
+    This class assigns uniform random numbers in [0, 1) to the nuclei of a GMM.
+
+    With the method "searchsorted", the number u is assigned to the first nucleus i
+    such that u <= w_1 + ... + w_i, i.e., the assignment is the same as the one of
+    the original linear scan of the cumulative probabilities (and, therefore, it
+    reproduces the legacy data sets).
+    With the method "alias", Walker's alias table is used, so the cost of the
+    assignment does not depend on the number of nuclei. This is useful for models
+    with many nuclei, but the assignment of a given number u is different from the
+    one of the method "searchsorted".
+
+    Parameters
+    ----------
+    probabilities: list
+        List containing the probability of a point to belong to each nucleus.
+
+    method: str, optional
+        Selection method ("searchsorted" or "alias").
+        The default is "searchsorted".
+    """
+
+    def __init__(self, probabilities, method: str = "searchsorted"):
+
+        if method not in SELECTION_METHODS:
+            raise Exception("The selection method " + str(method) + " does not exist. Use one of: " + ", ".join(SELECTION_METHODS) + ".")
+
+        # Check probabilities
+        w = np.asarray(probabilities, dtype=float)
+        if w.ndim != 1 or w.size == 0:
+            raise Exception("The list of probabilities of the nuclei must be a non-empty list of numbers.")
+        if np.any(w < 0):
+            raise Exception("The probabilities of the nuclei must be non-negative.")
+        if not np.isclose(w.sum(), 1.0, rtol=0, atol=1e-6):
+            raise Exception("The probabilities of the nuclei must sum to 1, but they sum to " + str(w.sum()) + ".")
+
+        self.method = method
+        self.num_nucleus = w.size
+
+        # Get cumulative distribution (accumulated sequentially as in the original linear scan)
+        self.cumulative_probabilities = np.cumsum(w)
+
+        if method == "alias":
+            self.alias_probabilities, self.alias = get_alias_table(w)
+
+    def select(self, uniforms, return_counts: bool = False):
+
+        """
+        This function assigns each uniform random number to a nucleus.
+
+        Parameters
+        ----------
+        uniforms: array_like
+            Uniform random numbers in [0, 1).
+
+        return_counts: bool, optional
+            If True, the amount of points assigned to each nucleus is also returned.
+            The default is False.
+
+        Returns
+        -------
+        nuclei_selected : numpy.ndarray
+            Nucleus assigned to each uniform random number.
+
+        counts : numpy.ndarray
+            Amount of points assigned to each nucleus (only if return_counts is True).
+        """
+
+        uniforms = np.asarray(uniforms, dtype=float)
+
+        if self.method == "searchsorted":
+
+            # Get first nucleus whose cumulative probability is not smaller than the number
+            nuclei_selected = np.searchsorted(self.cumulative_probabilities, uniforms, side="left")
+
+            # A sum of probabilities slightly smaller than 1 must not lead to a nonexistent nucleus
+            nuclei_selected = np.minimum(nuclei_selected, self.num_nucleus - 1)
+
+        else:
+
+            # Use the integer part of u * N to select a column of the alias table and the
+            # fractional part to decide between the column and its alias
+            scaled = uniforms * self.num_nucleus
+            column = np.minimum(scaled.astype(np.int64), self.num_nucleus - 1)
+            accept = (scaled - column) < self.alias_probabilities[column]
+            nuclei_selected = np.where(accept, column, self.alias[column])
+
+        nuclei_selected = nuclei_selected.astype(np.int64)
+
+        if return_counts:
+            counts = np.bincount(nuclei_selected, minlength=self.num_nucleus)
+            return nuclei_selected, counts
+
+        return nuclei_selected
+
+def get_alias_table(probabilities):
+
+    """
+    This function builds the alias table of a discrete distribution with Vose's method.
+
+    Parameters
+    ----------
+    probabilities: numpy.ndarray
+        Probabilities of the discrete distribution.
+
+    Returns
+    -------
+    alias_probabilities : numpy.ndarray
+        Probability of keeping each column of the table.
+
+    alias : numpy.ndarray
+        Alias of each column of the table.
+    """
+
+    # Get input
+    num_nucleus = probabilities.size
+    scaled = probabilities * num_nucleus / probabilities.sum()
+    alias_probabilities = np.ones(num_nucleus)
+    alias = np.arange(num_nucleus, dtype=np.int64)
+
+    # Split columns into the ones with too little and too much probability
+    small = [i for i in range(num_nucleus) if scaled[i] < 1.0]
+    large = [i for i in range(num_nucleus) if scaled[i] >= 1.0]
+
+    # Fill each small column with probability of a large one
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        alias_probabilities[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+
+    # The remaining columns are kept with probability 1 (up to rounding errors)
+    for i in small + large:
+        alias_probabilities[i] = 1.0
+
+    return alias_probabilities, alias
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the options of the generation that the command-line interface needs
+before the generation is imported (the engines, the file formats and the schemas). It must
+not import numpy, pandas or the modules of the generation.
+"""
+
+# Sampling engines (see gmm_sampling.py)
+ENGINES = ("batched", "legacy", "philox")
+
+# Supported formats and the extensions of their files (see dataset_io.py)
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# Schemas of the columns (see schema.py)
+SCHEMAS = ("standard", "compact")
+
+# Kinds of parameter files and whether they contain the probabilities of the nuclei (see gmm_parameters.py)
+PARAMETER_KINDS = {"addresses": True, "workplaces": True, "houses": False, "hhd": False}
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the counter-based random number generator of the "philox" sampling
+engine.
+
+With the other engines, the random draws of a row depend on all the draws made before it
+(the state of np.random or of a numpy.random.Generator), so changing the order of the loops,
+the chunks or the shards changes every value. With the "philox" engine, the draws of each row
+are computed by the Philox4x32-10 function (Salmon et al., "Parallel random numbers: as easy as
+1, 2, 3", 2011) of a counter and a key:
+    * the key is (seed, table), where the table is the data set of the row (addresses,
+      dwellings, workplaces or households);
+    * the counter is (ID, index of the element in its point, index of the block), where ID is
+      the ID of the row (of its point, for dwellings and households).
+Each block gives four 32-bit integers, i.e., two numbers of the uniform distribution on [0, 1)
+or two numbers of the standard Gaussian distribution (with the Box-Muller transform). The
+first block of a point gives the number used to select its nucleus, and the next ones give its
+Gaussian vector; the blocks of an element give its Gaussian vector.
+
+Therefore, the rows with the same IDs are the same whether they are generated at once, in
+chunks, in shards, by growing a data set or alone, and any range of IDs can be generated
+independently of the others. The implementation is vectorized with numpy over the rows.
+"""
+
+import numpy as np
+
+# Constants of Philox4x32-10
+PHILOX_M0 = np.uint64(0xD2511F53)
+PHILOX_M1 = np.uint64(0xCD9E8D57)
+PHILOX_W0 = np.uint64(0x9E3779B9)
+PHILOX_W1 = np.uint64(0xBB67AE85)
+PHILOX_ROUNDS = 10
+
+MASK_32 = np.uint64(0xFFFFFFFF)
+
+# Codes of the tables in the keys
+TABLES = {"addresses": 0, "dwellings": 1, "workplaces": 2, "households": 3}
+
+def philox4x32(counter, key):
+
+    """
+    This function computes the Philox4x32-10 function of several counters.
+
+    Parameters
+    ----------
+    counter: list
+        Four arrays (or integers) with the 32-bit words of the counters.
+
+    key: list
+        Two integers with the 32-bit words of the key.
+
+    Returns
+    -------
+    words : list
+        Four arrays with the 32-bit words of the results (as numpy.uint64).
+    """
+
+    c0, c1, c2, c3 = [np.asarray(word, dtype=np.uint64) & MASK_32 for word in counter]
+    k0, k1 = np.uint64(key[0]) & MASK_32, np.uint64(key[1]) & MASK_32
+
+    for i in range(PHILOX_ROUNDS):
+
+        # Bump the key between the rounds
+        if i > 0:
+            k0 = (k0 + PHILOX_W0) & MASK_32
+            k1 = (k1 + PHILOX_W1) & MASK_32
+
+        # The products of two 32-bit words fit into 64 bits
+        product0 = PHILOX_M0 * c0
+        product1 = PHILOX_M1 * c2
+        c0, c1, c2, c3 = ((product1 >> np.uint64(32)) ^ c1 ^ k0, product1 & MASK_32,
+                          (product0 >> np.uint64(32)) ^ c3 ^ k1, product0 & MASK_32)
+
+    return [c0, c1, c2, c3]
+
+def to_uniform(high, low):
+
+    """
+    This function converts two 32-bit words into numbers of the uniform distribution on [0, 1)
+    with 53 random bits, as numpy.random.Generator.random.
+
+    Parameters
+    ----------
+    high: numpy.ndarray
+        High 32-bit words.
+
+    low: numpy.ndarray
+        Low 32-bit words.
+
+    Returns
+    -------
+    uniform : numpy.ndarray
+        Numbers of the uniform distribution.
+    """
+
+    return (((high << np.uint64(32)) | low) >> np.uint64(11)).astype(np.float64) * (1.0 / 9007199254740992.0)
+
+class PhiloxGenerator:
+
+    """
+    This class contains the counter-based random number generator of a seed (see above).
+
+    Parameters
+    ----------
+    seed: int
+        Seed of the generation (it must fit into 32 bits, as the seeds of np.random.seed).
+
+    table: str, optional
+        Table of the rows ("addresses", "dwellings", "workplaces" or "households"). It can also
+        be selected later with for_table.
+        The default is None.
+    """
+
+    def __init__(self, seed: int, table: str = None):
+
+        if seed < 0 or seed >= 2**32:
+            raise Exception("The seed of the philox engine must be between 0 and 2**32 - 1, but it is " + str(seed) + ".")
+        if table is not None and table not in TABLES:
+            raise Exception("The table " + str(table) + " does not exist. Use one of: " + ", ".join(TABLES) + ".")
+
+        self.seed = int(seed)
+        self.table = table
+
+    def for_table(self, table: str):
+
+        """
+        This function returns the generator of the same seed for the selected table.
+
+        Parameters
+        ----------
+        table: str
+            Table of the rows.
+
+        Returns
+        -------
+        generator : PhiloxGenerator
+            The generator of the table.
+        """
+
+        return PhiloxGenerator(self.seed, table)
+
+    def get_blocks(self, ids, sub_ids, block: int):
+
+        """
+        This function computes one block of four 32-bit words for each row.
+
+        Parameters
+        ----------
+        ids: numpy.ndarray
+            ID of each row (of its point, for elements).
+
+        sub_ids: numpy.ndarray or int
+            Index of each element in its point (0 for points).
+
+        block: int
+            Index of the block.
+
+        Returns
+        -------
+        words : list
+            Four arrays with the 32-bit words of each row.
+        """
+
+        if self.table is None:
+            raise Exception("The table of the philox generator must be selected with for_table.")
+
+        ids = np.asarray(ids, dtype=np.int64).astype(np.uint64)
+        return philox4x32([ids & MASK_32, ids >> np.uint64(32), sub_ids, block], [self.seed, TABLES[self.table]])
+
+    def uniform(self, ids, sub_ids=0, block: int = 0):
+
+        """
+        This function draws one number of the uniform distribution on [0, 1) for each row.
+
+        Parameters
+        ----------
+        ids: numpy.ndarray
+            ID of each row.
+
+        sub_ids: numpy.ndarray or int, optional
+            Index of each element in its point.
+            The default is 0.
+
+        block: int, optional
+            Index of the block.
+            The default is 0.
+
+        Returns
+        -------
+        uniform : numpy.ndarray
+            Number of each row.
+        """
+
+        words = self.get_blocks(ids, sub_ids, block)
+
+        return to_uniform(words[0], words[1])
+
+    def normal(self, ids, size: int, sub_ids=0, first_block: int = 0):
+
+        """
+        This function draws a vector of the standard Gaussian distribution for each row.
+
+        Parameters
+        ----------
+        ids: numpy.ndarray
+            ID of each row.
+
+        size: int
+            Size of the vectors.
+
+        sub_ids: numpy.ndarray or int, optional
+            Index of each element in its point.
+            The default is 0.
+
+        first_block: int, optional
+            Index of the first block (each block gives two numbers).
+            The default is 0.
+
+        Returns
+        -------
+        z : numpy.ndarray
+            Matrix where row i contains the vector of row i.
+        """
+
+        ids = np.asarray(ids)
+        z = np.empty((ids.shape[0], 2 * ((size + 1) // 2)))
+
+        for j in range(z.shape[1] // 2):
+
+            # Box-Muller transform of two uniform numbers (1 - u is in (0, 1])
+            words = self.get_blocks(ids, sub_ids, first_block + j)
+            radius = np.sqrt(-2.0 * np.log(1.0 - to_uniform(words[0], words[1])))
+            angle = 2.0 * np.pi * to_uniform(words[2], words[3])
+            z[:, 2*j] = radius * np.cos(angle)
+            z[:, 2*j + 1] = radius * np.sin(angle)
+
+        return z[:, :size]
+
+def get_philox_generator(engine: str, seed_value: int = 10):
+
+    """
+    This function returns the counter-based generator of the "philox" engine, or None for the
+    other engines (which use np.random).
+
+    Parameters
+    ----------
+    engine: str
+        Sampling engine.
+
+    seed_value: int, optional
+        Seed of the generation.
+        The default is 10.
+
+    Returns
+    -------
+    generator : PhiloxGenerator
+        The generator (None if the engine is not "philox").
+    """
+
+    return PhiloxGenerator(seed_value) if engine == "philox" else None
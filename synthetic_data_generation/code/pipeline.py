@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the complete procedure to generate the final synthetic dwelling and
+household data sets of a municipality: the generation of the initial data sets
+(create_gmm_data_hhd.py and create_gmm_data_dwe.py) followed by their reduction to the
+selected number of dwellings and households (create_final_datasets_from_initial_ones.py).
+
+The initial data sets are passed to the reduction as dataframes, so writing them is
+optional and they are not read back from files (except for the cases described in
+generate_city).
+
+In the concurrent mode, the dwelling branch (addresses and dwellings) and the household
+branch (workplaces and households) run in separate processes, each one from the generation
+of its initial data set to the saving of its final data set. Each branch seeds its own random
+state, and each reduction uses its own random stream (see get_reduction_generators), so both
+modes generate the same data sets and the branches do not wait for each other. With the
+legacy engine, both reductions share the global state of np.random, so the reduction of the
+household data set waits for the initial amount of dwellings and replays the random draws of
+the reduction of the dwelling data set (see seed_reduction).
+
+The function generate_exact_city generates the final data sets directly with the selected
+numbers of dwellings and households (see target_size.py), without initial data sets.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+from code.create_gmm_data_hhd import create_initial_hhd_data, create_exact_hhd_data
+from code.create_gmm_data_dwe import create_initial_dwe_data, create_exact_dwe_data
+from code.create_final_datasets_from_initial_ones import create_final_data, create_final_data_set, reduce_initial_data, \
+    reduce_and_save_data_set, save_final_data
+from code.dataset_io import get_initial_df_name, get_final_df_name, count_dataset_rows
+from code.get_files import get_path_to_folder
+from code.instrumentation import trace_stage, get_instrumentation_settings, set_instrumentation_settings
+
+def generate_city(city_name: str,
+                  amount_addresses: int,
+                  proportion_workplaces: float,
+                  amount_dwe: int,
+                  amount_hhd: int,
+                  param_path: str = "data/GMM_parameters",
+                  initial_data_path: str = "data/datasets/initial",
+                  engine: str = "batched",
+                  output_format: str = "csv",
+                  save_initial: bool = False,
+                  chunk_size: int = None,
+                  concurrent: bool = False,
+                  num_shards: int = None,
+                  schema: str = "standard",
+                  use_cache: bool = True,
+                  seed_value: int = 10):
+
+    """
+    This function generates the final dwelling and household data sets of a municipality
+    and saves them at the sub-directory "data/datasets/final".
+
+    With the legacy engine, the initial data sets are always saved and the reduction reads
+    them back from their files, as in the original implementation. This matters for CSV
+    files, since the values parsed from them may differ from the generated ones in the last
+    digit, and it makes the final data sets identical to the original ones. The same happens
+    when the initial data sets are generated in chunks, since they are never held in memory.
+
+    Parameters
+    ----------
+    city_name: str
+        Name of the municipality. The parameter files must be "[city_name]_[kind].json".
+
+    amount_addresses: int
+        Amount of residential addresses in the initial data set.
+
+    proportion_workplaces: float
+        Proportion of the number of residential addresses that corresponds to the number of workplaces.
+
+    amount_dwe: int
+        Number of dwellings in the final dwelling data set.
+
+    amount_hhd: int
+        Number of households in the final household data set.
+
+    param_path: str, optional
+        Sub-directory with the JSON files containing the GMM parameters.
+        The default is "data/GMM_parameters".
+
+    initial_data_path: str, optional
+        Sub-directory to save the initial data sets.
+        The default is "data/datasets/initial".
+
+    engine: str, optional
+        Sampling engine ("batched", "legacy" or "philox").
+        The default is "batched".
+
+    output_format: str, optional
+        Format of the files of the data sets ("csv", "parquet" or "feather").
+        The default is "csv".
+
+    save_initial: bool, optional
+        Whether to save the initial data sets.
+        The default is False.
+
+    chunk_size: int, optional
+        If given, the initial data sets are generated in chunks of this many residential
+        addresses (or workplaces) and saved chunk by chunk.
+        The default is None.
+
+    concurrent: bool, optional
+        Whether to run the dwelling and household branches in separate processes.
+        The default is False.
+
+    num_shards: int, optional
+        If given, the residential addresses and the workplaces are split into this many shards, 
+        which are generated in a pool of processes (see sharding.py). It cannot be combined 
+        with the concurrent mode.
+        The default is None.
+
+    schema: str, optional
+        Schema of the columns of the data sets ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    use_cache: bool, optional
+        Whether to use the saved initial data sets if they were generated with the same inputs 
+        (see initial_cache.py).
+        The default is True.
+
+    seed_value: int, optional
+        Seed of the random draws (it is also part of the names of the files).
+        The default is 10.
+
+    Returns
+    -------
+    df_dwe : dataframe
+        Final dwelling data set (None if the initial data sets are read from their files or 
+        if concurrent is True).
+
+    df_hhd : dataframe
+        Final household data set (None if the initial data sets are read from their files or 
+        if concurrent is True).
+    """
+
+    # Get names of the files of the final data sets
+    final_dwe_df_name = get_final_df_name("Houses", city_name, amount_dwe, amount_hhd, seed_value, output_format)
+    final_hhd_df_name = get_final_df_name("Households", city_name, amount_dwe, amount_hhd, seed_value, output_format)
+
+    if concurrent and num_shards is not None:
+        raise Exception("The concurrent mode cannot be combined with the generation in shards.")
+
+    if concurrent:
+        return _generate_city_concurrently(city_name, amount_addresses, proportion_workplaces, amount_dwe, amount_hhd,
+                                           param_path, initial_data_path, engine, output_format, save_initial,
+                                           chunk_size, schema, use_cache, seed_value, final_dwe_df_name, final_hhd_df_name)
+
+    # Reproduce the original procedure, which reads the initial data sets from their files
+    if engine == "legacy" or chunk_size is not None:
+
+        for create_initial_data in [create_initial_hhd_data, create_initial_dwe_data]:
+            with trace_stage(create_initial_data.__name__):
+                create_initial_data(amount_addresses = amount_addresses,
+                                    proportion_workplaces = proportion_workplaces,
+                                    city_name = city_name,
+                                    param_path = param_path,
+                                    data_path = initial_data_path,
+                                    engine = engine,
+                                    chunk_size = chunk_size,
+                                    num_shards = num_shards,
+                                    schema = schema,
+                                    output_format = output_format,
+                                    seed_value = seed_value,
+                                    use_cache = use_cache)
+
+        with trace_stage("create_final_data"):
+            create_final_data(initial_dwe_df_name = get_initial_df_name("Houses", city_name, amount_addresses, proportion_workplaces, seed_value, output_format),
+                              initial_hhd_df_name = get_initial_df_name("Households", city_name, amount_addresses, proportion_workplaces, seed_value, output_format),
+                              amount_dwe = amount_dwe,
+                              amount_hhd = amount_hhd,
+                              final_dwe_df_name = final_dwe_df_name,
+                              final_hhd_df_name = final_hhd_df_name,
+                              engine = engine,
+                              seed_value = seed_value)
+
+        return None, None
+
+    # Generate initial household data set
+    with trace_stage("create_initial_hhd_data"):
+        df_workplace, df_hhd = create_initial_hhd_data(amount_addresses = amount_addresses,
+                                                       proportion_workplaces = proportion_workplaces,
+                                                       city_name = city_name,
+                                                       param_path = param_path,
+                                                       data_path = initial_data_path,
+                                                       engine = engine,
+                                                       output_format = output_format,
+                                                       save = save_initial,
+                                                       num_shards = num_shards,
+                                                       schema = schema,
+                                                       seed_value = seed_value,
+                                                       use_cache = use_cache)
+    del df_workplace
+
+    # Generate initial dwelling data set
+    with trace_stage("create_initial_dwe_data"):
+        df_addr, df_dwe = create_initial_dwe_data(amount_addresses = amount_addresses,
+                                                  proportion_workplaces = proportion_workplaces,
+                                                  city_name = city_name,
+                                                  param_path = param_path,
+                                                  data_path = initial_data_path,
+                                                  engine = engine,
+                                                  output_format = output_format,
+                                                  save = save_initial,
+                                                  num_shards = num_shards,
+                                                  schema = schema,
+                                                  seed_value = seed_value,
+                                                  use_cache = use_cache)
+    del df_addr
+
+    # Generate final data sets
+    with trace_stage("reduce_initial_data"):
+        df_dwe, df_hhd = reduce_initial_data(df_dwe, df_hhd, amount_dwe, amount_hhd, engine, seed_value)
+
+    # Save final data sets
+    with trace_stage("save_final_data"):
+        path_to_new_file_dwe = save_final_data(df_dwe, final_dwe_df_name)
+        print("\nThe new dwelling data set was saved at", path_to_new_file_dwe)
+
+        path_to_new_file_hhd = save_final_data(df_hhd, final_hhd_df_name)
+        print("\nThe new household data set was saved at", path_to_new_file_hhd)
+
+    return df_dwe, df_hhd
+
+def generate_exact_city(city_name: str,
+                        amount_dwe: int,
+                        amount_hhd: int,
+                        param_path: str = "data/GMM_parameters",
+                        engine: str = "batched",
+                        output_format: str = "csv",
+                        save_points: bool = False,
+                        schema: str = "standard",
+                        seed_value: int = 10):
+
+    """
+    This function generates the final dwelling and household data sets of a municipality with 
+    exactly the selected numbers of dwellings and households and saves them at the sub-directory 
+    "data/datasets/final". The numbers of residential addresses and workplaces follow from 
+    these numbers, and no row is removed afterwards. The names of the files are tagged with 
+    "exact" (e.g., "Houses_[city_name][amount_dwe]([amount_hhd]hhd,exact)seed=10.csv"), so they 
+    do not overwrite the final data sets of generate_city.
+
+    Parameters
+    ----------
+    city_name: str
+        Name of the municipality. The parameter files must be "[city_name]_[kind].json".
+
+    amount_dwe: int
+        Number of dwellings in the final dwelling data set.
+
+    amount_hhd: int
+        Number of households in the final household data set.
+
+    param_path: str, optional
+        Sub-directory with the JSON files containing the GMM parameters.
+        The default is "data/GMM_parameters".
+
+    engine: str, optional
+        Sampling engine ("batched", "legacy" or "philox").
+        The default is "batched".
+
+    output_format: str, optional
+        Format of the files of the data sets ("csv", "parquet" or "feather").
+        The default is "csv".
+
+    save_points: bool, optional
+        Whether to also save the data sets of residential addresses and workplaces (with the 
+        names of the final data sets, e.g., "Addresses_[city_name][amount_dwe]([amount_hhd]hhd,exact)seed=10.csv").
+        The default is False.
+
+    schema: str, optional
+        Schema of the columns of the data sets ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    seed_value: int, optional
+        Seed of the random draws (it is also part of the names of the files).
+        The default is 10.
+
+    Returns
+    -------
+    df_dwe : dataframe
+        Final dwelling data set.
+
+    df_hhd : dataframe
+        Final household data set.
+    """
+
+    # Generate household data set
+    with trace_stage("create_exact_hhd_data"):
+        df_workplace, df_hhd = create_exact_hhd_data(amount_hhd, param_path, city_name, engine, schema, seed_value)
+
+    # Generate dwelling data set
+    with trace_stage("create_exact_dwe_data"):
+        df_addr, df_dwe = create_exact_dwe_data(amount_dwe, param_path, city_name, engine, schema, seed_value)
+
+    print("\nThe dwelling data set has", df_dwe.shape[0], "dwellings in", df_addr.shape[0], "residential addresses.")
+    print("\nThe household data set has", df_hhd.shape[0], "households in", df_workplace.shape[0], "workplaces.")
+
+    # Save data sets
+    with trace_stage("save_final_data"):
+        data_sets = [("Houses", "dwelling", df_dwe), ("Households", "household", df_hhd)]
+        if save_points:
+            data_sets += [("Addresses", "residential address", df_addr), ("Workplaces", "workplace", df_workplace)]
+
+        for data_set, element_name, df in data_sets:
+            path_to_new_file = save_final_data(df, get_final_df_name(data_set, city_name, amount_dwe, amount_hhd, seed_value, output_format,
+                                                                         exact=True))
+            print("\nThe new " + element_name + " data set was saved at", path_to_new_file)
+
+    return df_dwe, df_hhd
+
+def _run_branch(create_initial_data, arguments: dict, from_files: bool, initial_df_name: str, amount: int,
+                final_df_name: str, element_name: str, amounts_dwe, amount_dwe: int = None):
+
+    # Generate the initial data set of the branch (the household branch must not wait for
+    # a dwelling branch that failed)
+    try:
+        df_points, df_elements = create_initial_data(**arguments)
+        del df_points
+
+        # Get initial data set (or its amount of rows, if it is read from its file)
+        if from_files:
+            initial_amount = count_dataset_rows(os.path.join(get_path_to_folder(arguments["data_path"]), initial_df_name))
+        else:
+            initial_amount = df_elements.shape[0]
+    except BaseException:
+        if amounts_dwe is not None and amount_dwe is None:
+            amounts_dwe.put(None)
+        raise
+
+    # With the legacy engine, the dwelling branch sends its initial amount of dwellings to the
+    # household branch, which replays the reduction of the dwelling data set before reducing
+    # the household data set (the other engines reduce each data set with its own stream)
+    previous_reductions = []
+    if amounts_dwe is not None and amount_dwe is None:
+        amounts_dwe.put(initial_amount)
+    elif amounts_dwe is not None:
+        initial_amount_dwe = amounts_dwe.get()
+        if initial_amount_dwe is None:
+            raise Exception("The dwelling data set could not be generated.")
+        previous_reductions = [(initial_amount_dwe, amount_dwe)]
+
+    # Generate and save final data set
+    if from_files:
+        return create_final_data_set(initial_df_name, amount, final_df_name, element_name, arguments["engine"], previous_reductions,
+                                     arguments["seed_value"])
+
+    return reduce_and_save_data_set(df_elements, amount, final_df_name, element_name, arguments["engine"], previous_reductions,
+                                    arguments["seed_value"])
+
+def _generate_city_concurrently(city_name, amount_addresses, proportion_workplaces, amount_dwe, amount_hhd,
+                                param_path, initial_data_path, engine, output_format, save_initial,
+                                chunk_size, schema, use_cache, seed_value, final_dwe_df_name, final_hhd_df_name):
+
+    # Get arguments of the generation of the initial data sets
+    from_files = engine == "legacy" or chunk_size is not None
+    arguments = {"amount_addresses": amount_addresses,
+                 "proportion_workplaces": proportion_workplaces,
+                 "city_name": city_name,
+                 "param_path": param_path,
+                 "data_path": initial_data_path,
+                 "engine": engine,
+                 "output_format": output_format,
+                 "schema": schema,
+                 "seed_value": seed_value,
+                 "use_cache": use_cache}
+    if from_files:
+        arguments["chunk_size"] = chunk_size
+    else:
+        arguments["save"] = save_initial
+
+    initial_dwe_df_name = get_initial_df_name("Houses", city_name, amount_addresses, proportion_workplaces, seed_value, output_format)
+    initial_hhd_df_name = get_initial_df_name("Households", city_name, amount_addresses, proportion_workplaces, seed_value, output_format)
+
+    # Run both branches, which only exchange the initial amount of dwellings with the legacy
+    # engine (the processes get the settings of the instrumentation)
+    with trace_stage("concurrent branches"), Manager() as manager, \
+         ProcessPoolExecutor(max_workers=2, initializer=set_instrumentation_settings,
+                             initargs=(get_instrumentation_settings(),)) as executor:
+
+        amounts_dwe = manager.Queue() if engine == "legacy" else None
+        future_dwe = executor.submit(_run_branch, create_initial_dwe_data, arguments, from_files, initial_dwe_df_name,
+                                     amount_dwe, final_dwe_df_name, "dwelling", amounts_dwe)
+        future_hhd = executor.submit(_run_branch, create_initial_hhd_data, arguments, from_files, initial_hhd_df_name,
+                                     amount_hhd, final_hhd_df_name, "household", amounts_dwe, amount_dwe)
+
+        # Raise the errors of the dwelling branch first, since the household branch may wait for it
+        future_dwe.result()
+        future_hhd.result()
+
+    return None, None
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the registry of the scenarios of the thesis, i.e., the synthetic data
+sets generated with the parameters at "data/GMM_parameters_reproduction", and the batch
+runner that generates several scenarios in one run.
+
+Each scenario is named after the sub-directory of its parameters,
+"[amount_dwe]_dwe_[amount_hhd]_hhd", and contains the number of residential addresses and
+the proportion of workplaces of its initial data sets.
+
+The batch runner loads the parameters of all the selected scenarios once and generates the
+scenarios in a pool of processes, which inherit the loaded parameters. Scenarios whose
+initial data sets have the same file names (e.g., "10000_dwe_9000_hhd" and
+"10000_dwe_9700_hhd") are generated one after another in the same process, so their files
+are never written at the same time.
+"""
+
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+# Sub-directory of the parameters of the scenarios
+SCENARIOS_PARAM_PATH = "data/GMM_parameters_reproduction"
+
+@dataclass(frozen=True)
+class Scenario:
+
+    """
+    This class contains a scenario of the thesis.
+
+    Attributes
+    ----------
+    amount_dwe: int
+        Number of dwellings of the final dwelling data set.
+
+    amount_hhd: int
+        Number of households of the final household data set.
+
+    amount_addresses: int
+        Number of residential addresses of the initial data set.
+
+    proportion_workplaces: float
+        Proportion of the number of residential addresses that corresponds to the number of workplaces.
+
+    city_name: str
+        Name of the municipality in the names of the parameter files.
+    """
+
+    amount_dwe: int
+    amount_hhd: int
+    amount_addresses: int
+    proportion_workplaces: float
+    city_name: str = "city"
+
+    @property
+    def name(self):
+        return str(self.amount_dwe) + "_dwe_" + str(self.amount_hhd) + "_hhd"
+
+    @property
+    def param_path(self):
+        return SCENARIOS_PARAM_PATH + "/" + self.name
+
+# Scenarios of the thesis, in the order of the thesis
+SCENARIOS = {scenario.name: scenario for scenario in [Scenario(10000, 7000, 3450, 0.2),
+                                                      Scenario(10000, 8000, 3450, 0.25),
+                                                      Scenario(10000, 9000, 3450, 0.3),
+                                                      Scenario(10000, 9700, 3450, 0.3),
+                                                      Scenario(15000, 14500, 5175, 0.3),
+                                                      Scenario(25000, 24250, 10000, 0.3),
+                                                      Scenario(50000, 48500, 17250, 0.3),
+                                                      Scenario(100000, 97000, 34500, 0.3)]}
+
+def get_scenario(amount_dwe: int, amount_hhd: int):
+
+    """
+    This function returns the scenario of the thesis with the selected numbers of dwellings
+    and households.
+
+    Parameters
+    ----------
+    amount_dwe: int
+        Number of dwellings of the final dwelling data set.
+
+    amount_hhd: int
+        Number of households of the final household data set.
+
+    Returns
+    -------
+    scenario : Scenario
+        The scenario.
+    """
+
+    return get_scenario_by_name(str(amount_dwe) + "_dwe_" + str(amount_hhd) + "_hhd")
+
+def get_scenario_by_name(name: str):
+
+    """
+    This function returns the scenario of the thesis with the selected name.
+
+    Parameters
+    ----------
+    name: str
+        Name of the scenario ("[amount_dwe]_dwe_[amount_hhd]_hhd").
+
+    Returns
+    -------
+    scenario : Scenario
+        The scenario.
+    """
+
+    if name not in SCENARIOS:
+        raise Exception("The scenario " + str(name) + " does not exist. Use one of: " + ", ".join(SCENARIOS) + ".")
+
+    return SCENARIOS[name]
+
+def generate_scenarios(scenarios: list,
+                       engine: str = "legacy",
+                       output_format: str = "csv",
+                       initial_data_path: str = "data/datasets/initial",
+                       max_workers: int = None,
+                       use_cache: bool = True):
+
+    """
+    This function generates the final data sets of several scenarios and saves them at the
+    sub-directory "data/datasets/final".
+
+    Parameters
+    ----------
+    scenarios: list
+        Scenarios (see SCENARIOS).
+
+    engine: str, optional
+        Sampling engine ("legacy" reproduces the data sets of the thesis).
+        The default is "legacy".
+
+    output_format: str, optional
+        Format of the files of the data sets ("csv", "parquet" or "feather").
+        The default is "csv".
+
+    initial_data_path: str, optional
+        Sub-directory where the initial data sets are saved (with the legacy engine).
+        The default is "data/datasets/initial".
+
+    max_workers: int, optional
+        Maximum number of processes. If 1, the scenarios are generated in the current
+        process, and if None, the number of CPUs is used.
+        The default is None.
+
+    use_cache: bool, optional
+        Whether to use the saved initial data sets if they were generated with the same inputs 
+        (see initial_cache.py).
+        The default is True.
+
+    Returns
+    -------
+    None.
+    """
+
+    # Imported here, so the registry can be read without importing the generation
+    from code.get_files import get_path_to_folder
+    from code.gmm_parameters import load_gmm_parameters, PARAMETER_KINDS
+    from code.instrumentation import trace_stage, get_instrumentation_settings, set_instrumentation_settings
+
+    # Load the parameters once (the processes of the pool inherit or read the cached parameters)
+    with trace_stage("parameter load"):
+        for scenario in scenarios:
+            for kind in PARAMETER_KINDS:
+                load_gmm_parameters(get_path_to_folder(scenario.param_path), scenario.city_name, kind)
+
+    # Group the scenarios by the names of the files of their initial data sets
+    groups = {}
+    for scenario in scenarios:
+        key = (scenario.city_name, scenario.amount_addresses, scenario.proportion_workplaces)
+        groups.setdefault(key, []).append(scenario)
+    groups = list(groups.values())
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(groups)))
+
+    # Generate the scenarios
+    with trace_stage("generate_scenarios", num_scenarios=len(scenarios)):
+        if max_workers == 1:
+            for group in groups:
+                _generate_scenario_group(group, engine, output_format, initial_data_path, use_cache)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=set_instrumentation_settings,
+                                     initargs=(get_instrumentation_settings(),)) as executor:
+                futures = [executor.submit(_generate_scenario_group, group, engine, output_format, initial_data_path, use_cache)
+                           for group in groups]
+                for future in futures:
+                    future.result()
+
+def _generate_scenario_group(group: list, engine: str, output_format: str, initial_data_path: str, use_cache: bool):
+
+    from code.pipeline import generate_city
+
+    # Generate the scenarios of the group one after another
+    for scenario in group:
+        print("\nScenario", scenario.name)
+        generate_city(city_name = scenario.city_name,
+                      amount_addresses = scenario.amount_addresses,
+                      proportion_workplaces = scenario.proportion_workplaces,
+                      amount_dwe = scenario.amount_dwe,
+                      amount_hhd = scenario.amount_hhd,
+                      param_path = scenario.param_path,
+                      initial_data_path = initial_data_path,
+                      engine = engine,
+                      output_format = output_format,
+                      use_cache = use_cache)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the schemas of the columns of the generated data sets (Addresses,
+Houses, Workplaces and Households). The types are applied when the dataframes are built.
+
+Two schemas are available:
+    * "standard": the columns of the original data sets with the smallest integer types
+      that hold their values, i.e., the files written as CSV are the same as with the
+      original implementation;
+    * "compact": as "standard", but the coordinates X and Y are stored as 32-bit floats
+      and the IDs of the dwellings and households ("[point ID]_[index of element in this
+      point]") are split into the integer columns "parent_ID" and "child_index".
+
+Columns of the data sets of points (residential addresses or workplaces):
+    ID (int64, or int32 in "compact"), X and Y (float64, or float32 in "compact"), amount
+    of elements per point (int32), Cluster Nr. (int16), Gitter_ID_100m (category),
+    coord_x_grid and coord_y_grid (int32).
+
+Columns of the data sets of elements (dwellings or households):
+    ID (str), or parent_ID (int32) and child_index (int32) in "compact", X and Y (as in
+    the points), cost or income (float64), capacity or size (int32) and the remaining
+    columns of the points (with their types).
+"""
+
+import numpy as np
+from code.options import SCHEMAS
+
+# Types of the columns of the data sets
+CLUSTER_TYPE = np.int16
+COUNT_TYPE = np.int32
+GRID_TYPE = np.int32
+ID_TYPES = {"standard": np.int64, "compact": np.int32}
+COORDINATE_TYPES = {"standard": np.float64, "compact": np.float32}
+
+def check_schema(schema: str):
+
+    """
+    This function checks if the selected schema exists.
+
+    Parameters
+    ----------
+    schema: str
+        Name of the schema.
+
+    Returns
+    -------
+    None.
+    """
+
+    if schema not in SCHEMAS:
+        raise Exception("The schema " + str(schema) + " does not exist. Use one of: " + ", ".join(SCHEMAS) + ".")
+
+def to_integer_type(values, dtype, column: str):
+
+    """
+    This function converts the values of an integer column to the type of the schema and
+    checks that they fit into this type.
+
+    Parameters
+    ----------
+    values: numpy.ndarray
+        Values of the column.
+
+    dtype: numpy.dtype
+        Integer type of the column.
+
+    column: str
+        Name of the column (used in the error message).
+
+    Returns
+    -------
+    values : numpy.ndarray
+        Values of the column with the selected type.
+    """
+
+    info = np.iinfo(dtype)
+    if values.size > 0 and (values.min() < info.min or values.max() > info.max):
+        raise Exception("The values of the column " + str(column) + " do not fit into the type " + np.dtype(dtype).name + ".")
+
+    return values.astype(dtype, copy=False)
+
+def to_coordinate_type(values, schema: str):
+
+    """
+    This function converts coordinates to the type of the schema.
+
+    Parameters
+    ----------
+    values: numpy.ndarray
+        Coordinates.
+
+    schema: str
+        Name of the schema ("standard" or "compact").
+
+    Returns
+    -------
+    values : numpy.ndarray
+        Coordinates with the selected type.
+    """
+
+    return values.astype(COORDINATE_TYPES[schema], copy=False)
@@ -0,0 +1,497 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains a long-lived local generation service, so small jobs do not pay for the
+start of Python, the import of numpy and pandas and the parsing of the parameter files.
+
+The service listens to HTTP requests on localhost and runs the jobs in a pool of processes.
+The parameters of the selected municipalities are loaded (and their covariance matrices
+factorized) before the pool is created, so the processes inherit them, and every job loads
+its parameters with load_gmm_parameters, which keeps them in memory for the next jobs.
+
+Endpoints:
+    * GET /health: the state of the service, i.e., the number of processes and the loaded
+      parameter files;
+    * POST /jobs: a JSON object with one job, or {"jobs": [...]} with several jobs. The response
+      is streamed as newline-delimited JSON: one "queued" event per job, then one "finished"
+      event (with the paths of the written files, the total time and the time of each stage,
+      see instrumentation.py) or "failed" event (with the error) per job, as the jobs end.
+
+Each job is a JSON object with a "kind" and the arguments of its function:
+    * "generate": generate_city (city_name, amount_addresses, proportion_workplaces,
+      amount_dwe, amount_hhd and, optionally, engine, output_format, schema, save_initial,
+      seed_value and use_cache);
+    * "initial_dwe" and "initial_hhd": create_initial_dwe_data and create_initial_hhd_data
+      (city_name, amount_addresses, proportion_workplaces and, optionally, engine,
+      output_format, schema, seed_value and use_cache). The data sets are saved at
+      "data/datasets/initial";
+    * "final": create_final_data (city_name, amount_addresses, proportion_workplaces,
+      amount_dwe, amount_hhd and, optionally, engine, output_format and seed_value), which
+      reduces the initial data sets of the seed saved at "data/datasets/initial".
+All jobs also accept param_path (the default is "data/GMM_parameters"). The arguments are
+checked before the jobs are queued: the amounts must be positive integers, the proportion of
+workplaces must be between 0 and 1, and the seed must be an integer between 0 and 2**32 - 1.
+
+Jobs that use files with the same names run in the order they were received: a job waits
+for the jobs received before it that write the files it reads or writes (e.g., a "final" job
+waits for the "initial_dwe" and "initial_hhd" jobs of its initial data sets), and a job that
+writes a file also waits for the jobs received before it that read this file. If a job fails,
+the jobs that read the files it writes fail with its error.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import json
+import time
+import os
+
+from code.options import ENGINES, OUTPUT_FORMATS, SCHEMAS, PARAMETER_KINDS
+from code.instrumentation import start_instrumentation, finish_instrumentation
+
+JOB_KINDS = ("generate", "initial_dwe", "initial_hhd", "final")
+
+# Arguments of each kind of job (required and optional with their defaults)
+JOB_ARGUMENTS = {"generate": (["city_name", "amount_addresses", "proportion_workplaces", "amount_dwe", "amount_hhd"],
+                              {"engine": "batched", "output_format": "csv", "schema": "standard", "save_initial": False,
+                               "seed_value": 10, "use_cache": True}),
+                 "initial_dwe": (["city_name", "amount_addresses", "proportion_workplaces"],
+                                 {"engine": "batched", "output_format": "csv", "schema": "standard", "seed_value": 10,
+                                  "use_cache": True}),
+                 "initial_hhd": (["city_name", "amount_addresses", "proportion_workplaces"],
+                                 {"engine": "batched", "output_format": "csv", "schema": "standard", "seed_value": 10,
+                                  "use_cache": True}),
+                 "final": (["city_name", "amount_addresses", "proportion_workplaces", "amount_dwe", "amount_hhd"],
+                           {"engine": "batched", "output_format": "csv", "seed_value": 10})}
+
+# Arguments that are amounts of rows and flags of the jobs
+JOB_AMOUNTS = ("amount_addresses", "amount_dwe", "amount_hhd")
+JOB_FLAGS = ("save_initial", "use_cache")
+
+PARAM_PATH = "data/GMM_parameters"
+INITIAL_DATA_PATH = "data/datasets/initial"
+FINAL_DATA_PATH = "data/datasets/final"
+
+def get_job(request: dict):
+
+    """
+    This function checks a job received by the service and completes its optional arguments.
+
+    Parameters
+    ----------
+    request: dict
+        Job with its kind and its arguments.
+
+    Returns
+    -------
+    job : dict
+        Job with all its arguments.
+    """
+
+    if not isinstance(request, dict) or request.get("kind") not in JOB_KINDS:
+        raise Exception("Each job must be a JSON object with a kind in: " + ", ".join(JOB_KINDS) + ".")
+
+    required, optional = JOB_ARGUMENTS[request["kind"]]
+    unknown = set(request) - set(required) - set(optional) - {"kind", "param_path"}
+    if unknown:
+        raise Exception("Unknown arguments of a " + request["kind"] + " job: " + ", ".join(sorted(unknown)) + ".")
+    missing = [name for name in required if name not in request]
+    if missing:
+        raise Exception("Missing arguments of a " + request["kind"] + " job: " + ", ".join(missing) + ".")
+
+    job = dict(optional, param_path=PARAM_PATH)
+    job.update(request)
+
+    if job["engine"] not in ENGINES:
+        raise Exception("The engine " + str(job["engine"]) + " does not exist. Use one of: " + ", ".join(ENGINES) + ".")
+    if job["output_format"] not in OUTPUT_FORMATS:
+        raise Exception("The format " + str(job["output_format"]) + " is not supported. Use one of: " + ", ".join(OUTPUT_FORMATS) + ".")
+    if job.get("schema", "standard") not in SCHEMAS:
+        raise Exception("The schema " + str(job["schema"]) + " does not exist. Use one of: " + ", ".join(SCHEMAS) + ".")
+
+    # Check the values of the arguments (bool is a subclass of int, but not a valid amount)
+    if not isinstance(job["city_name"], str) or not isinstance(job["param_path"], str):
+        raise Exception("city_name and param_path must be strings.")
+    for name in JOB_AMOUNTS:
+        if name in job and (isinstance(job[name], bool) or not isinstance(job[name], int) or job[name] <= 0):
+            raise Exception(name + " must be a positive integer, but it is " + json.dumps(job[name]) + ".")
+    if isinstance(job["proportion_workplaces"], bool) or not isinstance(job["proportion_workplaces"], (int, float)) \
+            or not 0 <= job["proportion_workplaces"] <= 1:
+        raise Exception("proportion_workplaces must be a number between 0 and 1, but it is " + json.dumps(job["proportion_workplaces"]) + ".")
+    if isinstance(job["seed_value"], bool) or not isinstance(job["seed_value"], int) or not 0 <= job["seed_value"] < 2**32:
+        raise Exception("seed_value must be an integer between 0 and 2**32 - 1, but it is " + json.dumps(job["seed_value"]) + ".")
+    for name in JOB_FLAGS:
+        if name in job and not isinstance(job[name], bool):
+            raise Exception(name + " must be true or false, but it is " + json.dumps(job[name]) + ".")
+
+    return job
+
+def get_job_paths(job: dict, initial_data_sets: list, final_data_sets: list = ()):
+
+    """
+    This function returns the paths to initial and final data sets of a job.
+
+    Parameters
+    ----------
+    job: dict
+        Job with all its arguments (see get_job).
+
+    initial_data_sets: list
+        Initial data sets (e.g., "Addresses" or "Houses") saved at "data/datasets/initial".
+
+    final_data_sets: list, optional
+        Final data sets (e.g., "Houses") saved at "data/datasets/final".
+        The default is ().
+
+    Returns
+    -------
+    paths : list
+        Full paths to the files.
+    """
+
+    from code.dataset_io import get_initial_df_name, get_final_df_name
+    from code.get_files import get_path_to_folder
+
+    paths = [os.path.join(get_path_to_folder(INITIAL_DATA_PATH),
+                          get_initial_df_name(data_set, job["city_name"], job["amount_addresses"], job["proportion_workplaces"],
+                                              job["seed_value"], job["output_format"]))
+             for data_set in initial_data_sets]
+    paths += [os.path.join(get_path_to_folder(FINAL_DATA_PATH),
+                           get_final_df_name(data_set, job["city_name"], job["amount_dwe"], job["amount_hhd"], job["seed_value"],
+                                             job["output_format"]))
+              for data_set in final_data_sets]
+
+    return paths
+
+def get_job_files(job: dict):
+
+    """
+    This function returns the paths to the files read and written by a job. The initial data
+    sets of a "generate" job are written even if they are not saved, since the job may store
+    them in the cache (see initial_cache.py).
+
+    Parameters
+    ----------
+    job: dict
+        Job with all its arguments (see get_job).
+
+    Returns
+    -------
+    read_paths : list
+        Full paths to the files read by the job.
+
+    write_paths : list
+        Full paths to the files written by the job.
+    """
+
+    read = {"initial_dwe": [], "initial_hhd": [], "generate": [], "final": ["Houses", "Households"]}[job["kind"]]
+    written = {"initial_dwe": ["Addresses", "Houses"], "initial_hhd": ["Workplaces", "Households"],
+               "generate": ["Addresses", "Houses", "Workplaces", "Households"], "final": []}[job["kind"]]
+    final = ["Houses", "Households"] if job["kind"] in ("generate", "final") else []
+
+    return get_job_paths(job, read), get_job_paths(job, written, final)
+
+def run_job(job: dict):
+
+    """
+    This function runs a job in a process of the pool of the service.
+
+    Parameters
+    ----------
+    job: dict
+        Job with all its arguments (see get_job).
+
+    Returns
+    -------
+    result : dict
+        Paths to the written files, total time in seconds and time of each stage.
+    """
+
+    from code.pipeline import generate_city
+    from code.create_gmm_data_dwe import create_initial_dwe_data
+    from code.create_gmm_data_hhd import create_initial_hhd_data
+    from code.create_final_datasets_from_initial_ones import create_final_data
+
+    start = time.perf_counter()
+    start_instrumentation(print_data=False)
+
+    try:
+        if job["kind"] == "generate":
+            generate_city(city_name = job["city_name"],
+                          amount_addresses = job["amount_addresses"],
+                          proportion_workplaces = job["proportion_workplaces"],
+                          amount_dwe = job["amount_dwe"],
+                          amount_hhd = job["amount_hhd"],
+                          param_path = job["param_path"],
+                          initial_data_path = INITIAL_DATA_PATH,
+                          engine = job["engine"],
+                          output_format = job["output_format"],
+                          save_initial = job["save_initial"],
+                          schema = job["schema"],
+                          use_cache = job["use_cache"],
+                          seed_value = job["seed_value"])
+
+            # The initial data sets are only saved with the legacy engine or save_initial
+            initial = ["Addresses", "Houses", "Workplaces", "Households"] if job["engine"] == "legacy" or job["save_initial"] else []
+            files = get_job_paths(job, initial, ["Houses", "Households"])
+
+        elif job["kind"] in ("initial_dwe", "initial_hhd"):
+            create_initial_data = create_initial_dwe_data if job["kind"] == "initial_dwe" else create_initial_hhd_data
+            create_initial_data(amount_addresses = job["amount_addresses"],
+                                proportion_workplaces = job["proportion_workplaces"],
+                                param_path = job["param_path"],
+                                city_name = job["city_name"],
+                                data_path = INITIAL_DATA_PATH,
+                                engine = job["engine"],
+                                output_format = job["output_format"],
+                                schema = job["schema"],
+                                seed_value = job["seed_value"],
+                                use_cache = job["use_cache"])
+            files = get_job_files(job)[1]
+
+        else:
+            (initial_dwe_path, initial_hhd_path), (final_dwe_path, final_hhd_path) = get_job_files(job)
+            files = list(create_final_data(initial_dwe_df_name = os.path.basename(initial_dwe_path),
+                                           initial_hhd_df_name = os.path.basename(initial_hhd_path),
+                                           amount_dwe = job["amount_dwe"],
+                                           amount_hhd = job["amount_hhd"],
+                                           final_dwe_df_name = os.path.basename(final_dwe_path),
+                                           final_hhd_df_name = os.path.basename(final_hhd_path),
+                                           engine = job["engine"],
+                                           seed_value = job["seed_value"]))
+    finally:
+        records = finish_instrumentation()
+
+    # A job that ends without one of its files is failed
+    missing = [path for path in files if not os.path.exists(path)]
+    if missing:
+        raise Exception("The job did not write the files: " + ", ".join(missing) + ".")
+
+    return {"files": files,
+            "seconds": round(time.perf_counter() - start, 6),
+            "stages": [{"stage": record["path"], "seconds": round(record["seconds"], 6), "rows": record["rows"]} for record in records]}
+
+def load_parameters(param_path: str, city_names: list):
+
+    """
+    This function loads the parameters of the selected municipalities, which keeps them
+    (parsed and with their factorized covariance matrices) in the memory of the process.
+
+    Parameters
+    ----------
+    param_path: str
+        Sub-directory with the JSON files containing the GMM parameters.
+
+    city_names: list
+        Names of the municipalities.
+
+    Returns
+    -------
+    None.
+    """
+
+    from code.gmm_parameters import load_gmm_parameters
+    from code.get_files import get_path_to_folder
+
+    # Import the generation, so the jobs do not import it
+    import code.pipeline
+
+    for city_name in city_names:
+        for kind in PARAMETER_KINDS:
+            load_gmm_parameters(get_path_to_folder(param_path), city_name, kind)
+
+class GenerationService(ThreadingHTTPServer):
+
+    """
+    This class contains the HTTP server of the generation service and its pool of processes.
+
+    Attributes
+    ----------
+    executor: concurrent.futures.ProcessPoolExecutor
+        Pool of processes that run the jobs.
+
+    city_names: list
+        Names of the municipalities whose parameters were loaded at the start.
+
+    max_workers: int
+        Number of processes.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 8765, city_names: list = (), param_path: str = PARAM_PATH, max_workers: int = None):
+
+        super().__init__(("127.0.0.1", port), ServiceRequestHandler)
+
+        # Load the parameters before the pool is created, so the processes inherit them
+        load_parameters(param_path, city_names)
+
+        self.city_names = list(city_names)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=load_parameters,
+                                            initargs=(param_path, self.city_names))
+
+        # Last jobs writing each file and jobs reading each file after them
+        self._file_writers = {}
+        self._file_readers = {}
+        self._file_locks_lock = threading.Lock()
+
+    def submit(self, job: dict):
+
+        """
+        This function queues a job in the pool of processes. The job waits for the jobs
+        received before it that write the files it reads or writes, and for the jobs received
+        before it that read the files it writes. If a job writing a file it reads fails, the
+        job fails with the same error.
+
+        Parameters
+        ----------
+        job: dict
+            Job with all its arguments (see get_job).
+
+        Returns
+        -------
+        future : concurrent.futures.Future
+            Future of the result of run_job.
+        """
+
+        # Get the futures of the previous jobs using the same files and register this job
+        future = Future()
+        read_paths, write_paths = get_job_files(job)
+        with self._file_locks_lock:
+            dependencies = {self._file_writers[path] for path in read_paths if path in self._file_writers}
+            previous = {self._file_writers[path] for path in write_paths if path in self._file_writers}
+            for path in write_paths:
+                previous.update(self._file_readers.pop(path, []))
+                self._file_writers[path] = future
+            for path in read_paths:
+                self._file_readers.setdefault(path, []).append(future)
+
+        def run_after_previous():
+            for previous_future in previous | dependencies:
+                try:
+                    previous_future.result()
+                except Exception as error:
+                    if previous_future in dependencies and not future.done():
+                        future.set_exception(Exception("A job writing the files of this job failed: " + str(error)))
+            if future.done():
+                return
+            try:
+                future.set_result(self.executor.submit(run_job, job).result())
+            except Exception as error:
+                future.set_exception(error)
+
+        threading.Thread(target=run_after_previous, daemon=True).start()
+
+        return future
+
+    def server_close(self):
+
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+
+    """
+    This class handles the HTTP requests of the generation service (see the endpoints above).
+    """
+
+    def do_GET(self):
+
+        if self.path != "/health":
+            self.send_error(404, "Use GET /health or POST /jobs.")
+            return
+
+        from code.gmm_parameters import _parameters_cache
+        self.send_json(200, {"status": "ok", "workers": self.server.max_workers, "cities": self.server.city_names,
+                             "parameters": len(_parameters_cache)})
+
+    def do_POST(self):
+
+        if self.path != "/jobs":
+            self.send_error(404, "Use GET /health or POST /jobs.")
+            return
+
+        # Read and check the jobs
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            jobs = [get_job(job) for job in (request["jobs"] if isinstance(request, dict) and "jobs" in request else [request])]
+        except Exception as error:
+            self.send_json(400, {"event": "failed", "error": str(error)})
+            return
+
+        # Stream the events of the jobs as newline-delimited JSON
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        futures = {}
+        for number, job in enumerate(jobs):
+            futures[self.server.submit(job)] = number
+            self.write_event({"event": "queued", "job": number, "kind": job["kind"]})
+
+        for future in as_completed(futures):
+            try:
+                self.write_event(dict({"event": "finished", "job": futures[future]}, **future.result()))
+            except Exception as error:
+                self.write_event({"event": "failed", "job": futures[future], "error": str(error)})
+
+        self.close_connection = True
+
+    def write_event(self, event: dict):
+
+        self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def send_json(self, status: int, content: dict):
+
+        body = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+
+        # Messages of the requests are only shown with the logger of the instrumentation
+        import logging
+        logging.getLogger("synthetic_data_generation").info("%s " + format, self.address_string(), *args)
+
+def serve(port: int = 8765, city_names: list = (), param_path: str = PARAM_PATH, max_workers: int = None):
+
+    """
+    This function starts the generation service and serves requests until it is interrupted.
+
+    Parameters
+    ----------
+    port: int, optional
+        Port on localhost.
+        The default is 8765.
+
+    city_names: list, optional
+        Names of the municipalities whose parameters are loaded at the start.
+        The default is ().
+
+    param_path: str, optional
+        Sub-directory with the JSON files containing the GMM parameters.
+        The default is "data/GMM_parameters".
+
+    max_workers: int, optional
+        Number of processes of the pool. If None, the number of CPUs is used.
+        The default is None.
+
+    Returns
+    -------
+    None.
+    """
+
+    server = GenerationService(port, city_names, param_path, max_workers)
+    print("The generation service is listening at http://127.0.0.1:" + str(server.server_address[1]))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
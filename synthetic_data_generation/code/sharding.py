@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the sharded mode of the generation of the initial data sets.
+
+The points of the GMM (residential addresses or workplaces) are split into shards of
+consecutive IDs, and each shard and its elements (dwellings or households) are generated
+in a separate process. Each shard draws its random numbers from its own generator
+(numpy.random.Generator), spawned from a single numpy.random.SeedSequence, so the data
+sets only depend on the seed and on the number of shards. Since the ID of the first point
+of each shard is the number of points of the previous shards, the merged data sets have
+the same IDs as data sets generated at once.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+import os
+from concurrent.futures import ProcessPoolExecutor
+from code.instrumentation import trace_stage, get_instrumentation_settings, set_instrumentation_settings
+
+def get_shard_sizes(amount_points: int, num_shards: int):
+
+    """
+    This function splits the points of a data set into shards of (almost) equal size.
+
+    Parameters
+    ----------
+    amount_points: int
+        Number of points (residential addresses or workplaces) to be generated.
+
+    num_shards: int
+        Number of shards.
+
+    Returns
+    -------
+    sizes : numpy.ndarray
+        Number of points of each shard.
+
+    first_ids : numpy.ndarray
+        ID of the first point of each shard.
+    """
+
+    if num_shards is None or num_shards <= 0:
+        raise Exception("The number of shards must be a positive integer.")
+
+    # The first shards get one more point than the last ones
+    sizes = np.full(num_shards, amount_points // num_shards, dtype=np.int64)
+    sizes[:amount_points % num_shards] += 1
+    first_ids = np.cumsum(sizes) - sizes
+
+    return sizes, first_ids
+
+def generate_sharded_data(amount_points: int, num_shards: int, generate_shard, seed_value: int = 10,
+                          max_workers: int = None):
+
+    """
+    This function generates the data set of points and the data set of their elements
+    shard by shard in a pool of processes and merges the shards.
+
+    Parameters
+    ----------
+    amount_points: int
+        Number of points (residential addresses or workplaces) to be generated.
+
+    num_shards: int
+        Number of shards.
+
+    generate_shard: function
+        Function that takes the number of points of a shard, the ID of its first point and
+        a random number generator and returns the dataframes of the points of the shard and
+        of their elements. It must be picklable (e.g., a functools.partial of a function of
+        a module).
+
+    seed_value: int, optional
+        Seed of the SeedSequence from which the generators of the shards are spawned.
+        The default is 10.
+
+    max_workers: int, optional
+        Maximum number of processes. If None, the number of CPUs is used.
+        The default is None.
+
+    Returns
+    -------
+    df_points : dataframe
+        The generated data set of points.
+
+    df_elements : dataframe
+        The generated data set of elements.
+    """
+
+    sizes, first_ids = get_shard_sizes(amount_points, num_shards)
+
+    # Get one independent stream of random numbers per shard
+    seed_sequences = np.random.SeedSequence(seed_value).spawn(num_shards)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, num_shards))
+
+    # Generate the shards (the processes get the settings of the instrumentation)
+    with trace_stage("shards", rows=amount_points, num_shards=num_shards), \
+         ProcessPoolExecutor(max_workers=max_workers, initializer=set_instrumentation_settings,
+                             initargs=(get_instrumentation_settings(),)) as executor:
+        futures = [executor.submit(_generate_shard, generate_shard, int(sizes[i]), int(first_ids[i]), seed_sequences[i])
+                   for i in range(num_shards)]
+        shards = [future.result() for future in futures]
+
+    # Merge the shards in the order of their IDs
+    with trace_stage("merge", rows=amount_points):
+        df_points = concat_shards([shard[0] for shard in shards])
+        df_elements = concat_shards([shard[1] for shard in shards])
+
+    return df_points, df_elements
+
+def concat_shards(list_df: list):
+
+    """
+    This function concatenates the dataframes of the shards of a data set. The categorical 
+    columns (e.g., the grid cell labels) get the union of the categories of the shards, so 
+    they remain categorical.
+
+    Parameters
+    ----------
+    list_df: list
+        Dataframes of the shards, in the order of their IDs.
+
+    Returns
+    -------
+    df : dataframe
+        The merged data set.
+    """
+
+    list_df = list(list_df)
+
+    # Use the same categories in all the shards
+    for column in list_df[0].columns:
+        if isinstance(list_df[0][column].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([df[column] for df in list_df]).categories
+            list_df = [df.assign(**{column: df[column].cat.set_categories(categories)}) for df in list_df]
+
+    return pd.concat(list_df, ignore_index=True)
+
+def _generate_shard(generate_shard, size: int, first_id: int, seed_sequence):
+
+    # Generate a shard with its own random number generator
+    return generate_shard(size, first_id, np.random.default_rng(seed_sequence))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the streaming mode of the generation of the initial data sets.
+
+The points of the GMM (residential addresses or workplaces) are generated in chunks of 
+fixed size, and each chunk is immediately expanded into its elements (dwellings or 
+households). Both chunks are appended to the output files before the next chunk is 
+generated, so the memory needed does not depend on the size of the data sets.
+"""
+
+from code.dataset_io import DatasetWriter
+from code.instrumentation import trace_stage
+
+def stream_gmm_data(amount_points: int, chunk_size: int, generate_points, generate_elements,
+                    path_points: str, path_elements: str):
+
+    """
+    This function generates the data set of points and the data set of their elements chunk 
+    by chunk and appends the chunks to their files.
+
+    Parameters
+    ----------
+    amount_points: int
+        Number of points (residential addresses or workplaces) to be generated.
+
+    chunk_size: int
+        Maximum number of points generated at once.
+
+    generate_points: function
+        Function that takes the number of points of a chunk and the ID of its first point and 
+        returns the dataframe of points of the chunk.
+
+    generate_elements: function
+        Function that takes a dataframe of points and returns the dataframe of their elements.
+
+    path_points: str
+        Path to the file of the data set of points (its extension defines the format).
+
+    path_elements: str
+        Path to the file of the data set of elements (its extension defines the format).
+
+    Returns
+    -------
+    amount_elements : int
+        Number of elements (dwellings or households) generated.
+    """
+
+    if chunk_size is None or chunk_size <= 0:
+        raise Exception("The size of the chunks must be a positive integer.")
+
+    amount_elements = 0
+    writer_points = DatasetWriter(path_points)
+    writer_elements = DatasetWriter(path_elements)
+
+    # A data set without points still gets a file with its header
+    first_ids = list(range(0, amount_points, chunk_size)) or [0]
+
+    try:
+        for first_id in first_ids:
+
+            with trace_stage("chunk", rows=min(chunk_size, amount_points - first_id), first_id=first_id):
+
+                # Generate the chunk of points and its elements
+                df_points = generate_points(min(chunk_size, amount_points - first_id), first_id)
+                df_elements = generate_elements(df_points)
+                amount_elements += df_elements.shape[0]
+
+                # Append the chunks to the files
+                writer_points.write(df_points)
+                writer_elements.write(df_elements)
+
+            # Free the chunks before generating the next ones
+            del df_points, df_elements
+
+    finally:
+        writer_points.close()
+        writer_elements.close()
+
+    return amount_elements
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the generation of the final data sets of many configurations of a
+municipality (parameter sweep), e.g., a grid of numbers of residential addresses,
+proportions of workplaces, numbers of dwellings and households and seeds.
+
+The configurations share their upstream stages:
+    * the initial dwelling data set only depends on the number of residential addresses
+      and on the seed, so it is generated once for all the configurations with these
+      values (e.g., with different proportions of workplaces), and it is reduced once
+      for each of their numbers of dwellings;
+    * the initial household data set only depends on the number of workplaces and on the
+      seed, so it is generated once for all the configurations with these values, and it is
+      reduced once for each of their numbers of households (the reductions of both data sets
+      use independent random streams, see get_reduction_generators).
+
+The initial dwelling and household data sets are generated in one pool of processes. The
+parameters are loaded once before the pool is started, and the processes inherit or read the
+cached parameters (see gmm_parameters.py). Each final data set is generated with the same
+random draws as with generate_city. The data sets are generated in memory, so the legacy
+engine, whose final data sets are reduced from the CSV files of the initial ones, cannot be
+used.
+
+The final data sets are saved in an output directory:
+    [output_path]/dwellings/[city_name][amount_addresses]addr_seed=[seed]/
+        Houses_[city_name][amount_dwe]seed=[seed].csv
+    [output_path]/households/[city_name][amount_workplace]workplaces_seed=[seed]/
+        Households_[city_name][amount_hhd]seed=[seed].csv
+    [output_path]/manifest.json
+The manifest contains the settings of the sweep and, for each configuration, the paths
+(relative to the output directory) of its final data sets and the numbers of rows of its
+initial data sets.
+"""
+
+import itertools
+import json
+import time
+import os
+from concurrent.futures import ProcessPoolExecutor
+from code.create_gmm_data_dwe import create_initial_dwe_data
+from code.create_gmm_data_hhd import create_initial_hhd_data
+from code.create_final_datasets_from_initial_ones import seed_reduction, reduce_data_set
+from code.get_files import get_path_to_folder
+from code.gmm_parameters import load_gmm_parameters, PARAMETER_KINDS
+from code.dataset_io import get_file_extension, check_output_format, write_dataset
+from code.instrumentation import trace_stage, get_instrumentation_settings, set_instrumentation_settings
+
+# Name of the manifest of a sweep
+MANIFEST_NAME = "manifest.json"
+
+def get_sweep_grid(amounts_addresses: list, proportions_workplaces: list, amounts_dwe: list, amounts_hhd: list,
+                   seeds: list = (10,)):
+
+    """
+    This function returns the configurations of a grid, i.e., all the combinations of the
+    selected values.
+
+    Parameters
+    ----------
+    amounts_addresses: list
+        Numbers of residential addresses of the initial data sets.
+
+    proportions_workplaces: list
+        Proportions of the number of residential addresses that correspond to the number of workplaces.
+
+    amounts_dwe: list
+        Numbers of dwellings of the final dwelling data sets.
+
+    amounts_hhd: list
+        Numbers of households of the final household data sets.
+
+    seeds: list, optional
+        Seeds of the random draws.
+        The default is (10,).
+
+    Returns
+    -------
+    configurations : list
+        Configurations (dictionaries with the keys "amount_addresses", "proportion_workplaces",
+        "amount_dwe", "amount_hhd" and "seed").
+    """
+
+    return [{"amount_addresses": amount_addresses,
+             "proportion_workplaces": proportion_workplaces,
+             "amount_dwe": amount_dwe,
+             "amount_hhd": amount_hhd,
+             "seed": seed}
+            for amount_addresses, proportion_workplaces, amount_dwe, amount_hhd, seed
+            in itertools.product(amounts_addresses, proportions_workplaces, amounts_dwe, amounts_hhd, seeds)]
+
+def generate_sweep(configurations: list,
+                   city_name: str,
+                   param_path: str = "data/GMM_parameters",
+                   output_path: str = "data/datasets/sweep",
+                   engine: str = "batched",
+                   output_format: str = "csv",
+                   schema: str = "standard",
+                   max_workers: int = None):
+
+    """
+    This function generates and saves the final dwelling and household data sets of several
+    configurations of a municipality and writes the manifest of the sweep.
+
+    Parameters
+    ----------
+    configurations: list
+        Configurations (see get_sweep_grid).
+
+    city_name: str
+        Name of the municipality. The parameter files must be "[city_name]_[kind].json".
+
+    param_path: str, optional
+        Sub-directory with the JSON files containing the GMM parameters.
+        The default is "data/GMM_parameters".
+
+    output_path: str, optional
+        Sub-directory where the data sets and the manifest are saved.
+        The default is "data/datasets/sweep".
+
+    engine: str, optional
+        Sampling engine ("batched" or "philox"). The legacy engine is not supported (see the
+        description of this script).
+        The default is "batched".
+
+    output_format: str, optional
+        Format of the files of the data sets ("csv", "parquet" or "feather").
+        The default is "csv".
+
+    schema: str, optional
+        Schema of the columns of the data sets ("standard" or "compact", see schema.py).
+        The default is "standard".
+
+    max_workers: int, optional
+        Maximum number of processes. If 1, the data sets are generated in the current
+        process, and if None, the number of CPUs is used.
+        The default is None.
+
+    Returns
+    -------
+    manifest : dict
+        Manifest of the sweep.
+    """
+
+    check_output_format(output_format)
+    if engine == "legacy":
+        raise Exception("The sweep generates the initial data sets in memory, so it cannot reproduce the legacy engine, whose "
+                        + "final data sets are reduced from the CSV files of the initial ones. Use generate_city (main.py) instead.")
+    if len(configurations) == 0:
+        raise Exception("The sweep must have at least one configuration.")
+
+    # Load the parameters once (the processes of the pools inherit or read the cached parameters)
+    with trace_stage("parameter load"):
+        for kind in PARAMETER_KINDS:
+            load_gmm_parameters(get_path_to_folder(param_path), city_name, kind)
+
+    # Create the output directory
+    output_path = os.path.join(get_path_to_folder(""), output_path.strip("/"))
+    os.makedirs(output_path, exist_ok=True)
+    settings = {"city_name": city_name, "param_path": param_path, "output_path": output_path,
+                "engine": engine, "output_format": output_format, "schema": schema}
+
+    # Get the distinct initial dwelling and household data sets and their final numbers of rows
+    dwe_groups = {}
+    hhd_groups = {}
+    for configuration in configurations:
+        key = (configuration["amount_addresses"], configuration["seed"])
+        dwe_groups.setdefault(key, set()).add(configuration["amount_dwe"])
+        amount_workplace = get_amount_workplace(configuration["amount_addresses"], configuration["proportion_workplaces"])
+        hhd_groups.setdefault((amount_workplace, configuration["seed"]), set()).add(configuration["amount_hhd"])
+
+    # Generate and reduce the initial data sets
+    with trace_stage("initial data sets", num_initial_dwe=len(dwe_groups), num_initial_hhd=len(hhd_groups)):
+        results = _run_tasks([(_generate_dwe_group, (settings, key[0], key[1], sorted(amounts))) for key, amounts in dwe_groups.items()]
+                             + [(_generate_hhd_group, (settings, key[0], key[1], sorted(amounts))) for key, amounts in hhd_groups.items()],
+                             max_workers)
+    initial_amounts_dwe = dict(zip(dwe_groups, results[:len(dwe_groups)]))
+    initial_amounts_hhd = dict(zip(hhd_groups, results[len(dwe_groups):]))
+
+    # Write the manifest
+    manifest = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "city_name": city_name,
+                "param_path": param_path,
+                "engine": engine,
+                "output_format": output_format,
+                "schema": schema,
+                "num_initial_dwe": len(dwe_groups),
+                "num_initial_hhd": len(hhd_groups),
+                "configurations": []}
+
+    for configuration in configurations:
+        amount_addresses, seed = configuration["amount_addresses"], configuration["seed"]
+        amount_workplace = get_amount_workplace(amount_addresses, configuration["proportion_workplaces"])
+        manifest["configurations"].append(dict(configuration,
+                                                amount_workplace=amount_workplace,
+                                                initial_amount_dwe=initial_amounts_dwe[(amount_addresses, seed)],
+                                                initial_amount_hhd=initial_amounts_hhd[(amount_workplace, seed)],
+                                                dwelling_data_set=_get_dwe_path(settings, amount_addresses, seed,
+                                                                                configuration["amount_dwe"]),
+                                                household_data_set=_get_hhd_path(settings, amount_workplace, seed,
+                                                                                 configuration["amount_hhd"])))
+
+    manifest_path = os.path.join(output_path, MANIFEST_NAME)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print("\nThe manifest of the sweep was saved at", manifest_path)
+
+    return manifest
+
+def get_amount_workplace(amount_addresses: int, proportion_workplaces: float):
+
+    """
+    This function returns the number of workplaces of an initial household data set, as in
+    create_initial_hhd_data.
+
+    Parameters
+    ----------
+    amount_addresses: int
+        Number of residential addresses.
+
+    proportion_workplaces: float
+        Proportion of the number of residential addresses that corresponds to the number of workplaces.
+
+    Returns
+    -------
+    amount_workplace : int
+        Number of workplaces.
+    """
+
+    return int(round(proportion_workplaces * amount_addresses))
+
+def _run_tasks(tasks: list, max_workers: int):
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(tasks)))
+
+    # Run the tasks (pairs of a function and its arguments) in the current process or in a
+    # pool of processes (which get the settings of the instrumentation)
+    if max_workers == 1:
+        return [function(*arguments) for function, arguments in tasks]
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=set_instrumentation_settings,
+                             initargs=(get_instrumentation_settings(),)) as executor:
+        futures = [executor.submit(function, *arguments) for function, arguments in tasks]
+        return [future.result() for future in futures]
+
+def _get_dwe_path(settings: dict, amount_addresses: int, seed: int, amount_dwe: int):
+
+    # Path of a final dwelling data set, relative to the output directory
+    return os.path.join("dwellings", str(settings["city_name"]) + str(amount_addresses) + "addr_seed=" + str(seed),
+                        "Houses_" + str(settings["city_name"]) + str(amount_dwe) + "seed=" + str(seed)
+                        + get_file_extension(settings["output_format"]))
+
+def _get_hhd_path(settings: dict, amount_workplace: int, seed: int, amount_hhd: int):
+
+    # Path of a final household data set, relative to the output directory
+    return os.path.join("households", str(settings["city_name"]) + str(amount_workplace) + "workplaces_seed=" + str(seed),
+                        "Households_" + str(settings["city_name"]) + str(amount_hhd) + "seed=" + str(seed)
+                        + get_file_extension(settings["output_format"]))
+
+def _save_sweep_data(df, settings: dict, path: str, element_name: str):
+
+    path = os.path.join(settings["output_path"], path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_dataset(df, path)
+    print("\nThe new " + element_name + " data set was saved at", path)
+
+def _generate_dwe_group(settings: dict, amount_addresses: int, seed: int, amounts_dwe: list):
+
+    # Generate the initial dwelling data set (the proportion of workplaces is not used)
+    df_addr, df_dwe = create_initial_dwe_data(amount_addresses = amount_addresses,
+                                              proportion_workplaces = 0,
+                                              param_path = settings["param_path"],
+                                              city_name = settings["city_name"],
+                                              engine = settings["engine"],
+                                              save = False,
+                                              schema = settings["schema"],
+                                              seed_value = seed,
+                                              use_cache = False)
+    del df_addr
+
+    # Reduce it to each number of dwellings
+    for amount_dwe in amounts_dwe:
+        rng = seed_reduction(settings["engine"], (), seed, "dwelling")
+        print("\nCreation of final dwelling data set:")
+        df = reduce_data_set(df_dwe, amount_dwe, "dwelling", settings["engine"], rng)
+        _save_sweep_data(df, settings, _get_dwe_path(settings, amount_addresses, seed, amount_dwe), "dwelling")
+
+    return df_dwe.shape[0]
+
+def _generate_hhd_group(settings: dict, amount_workplace: int, seed: int, amounts_hhd: list):
+
+    # Generate the initial household data set (the number of workplaces is the number of
+    # "residential addresses" with the proportion 1)
+    df_workplace, df_hhd = create_initial_hhd_data(amount_addresses = amount_workplace,
+                                                   proportion_workplaces = 1,
+                                                   param_path = settings["param_path"],
+                                                   city_name = settings["city_name"],
+                                                   engine = settings["engine"],
+                                                   save = False,
+                                                   schema = settings["schema"],
+                                                   seed_value = seed,
+                                                   use_cache = False)
+    del df_workplace
+
+    # Reduce it to each number of households
+    for amount_hhd in amounts_hhd:
+        rng = seed_reduction(settings["engine"], (), seed, "household")
+        print("\nCreation of final household data set:")
+        df = reduce_data_set(df_hhd, amount_hhd, "household", settings["engine"], rng)
+        _save_sweep_data(df, settings, _get_hhd_path(settings, amount_workplace, seed, amount_hhd), "household")
+
+    return df_hhd.shape[0]
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+This script contains the generation of data sets with an exact number of elements
+(dwellings or households).
+
+Instead of generating an oversized initial data set and removing randomly selected rows,
+the points of the GMM (residential addresses or workplaces) are generated until the sum of
+their amounts of elements reaches the selected number of elements. The points after the
+first one that reaches it are discarded, and the amount of elements of this last point is
+reduced so that the expansion of the points generates exactly the selected number of
+elements. Therefore, no surplus element is ever generated or written.
+
+The amount of elements of the last point does not follow the GMM: it is the remainder of the
+selected number, which is at most the drawn amount, and the point that reaches the selected
+number is more likely to be one with a large amount. The amounts of the other points and the
+features of all the elements follow the GMM, so the bias is limited to one point.
+"""
+
+import numpy as np
+import math
+from code.sharding import concat_shards
+
+# Relative margin added to the estimated number of points of a batch, so that one batch is
+# usually enough
+POINTS_MARGIN = 0.02
+
+def get_expected_amount(parameters, amount_index: int = 2):
+
+    """
+    This function computes the expected amount of elements associated to a point of a GMM,
+    i.e., the expected value of max(round(X), 1), where X is the feature of the amount of
+    elements of a point (see build_point_dataframe).
+
+    Parameters
+    ----------
+    parameters: GMMParameters
+        Parsed parameters of the points (see gmm_parameters.py).
+
+    amount_index: int, optional
+        Index of the feature of the amount of elements.
+        The default is 2.
+
+    Returns
+    -------
+    expected_amount : float
+        Expected amount of elements of a point.
+    """
+
+    expected_amount = 0.0
+
+    for j in range(parameters.num_nucleus):
+
+        # Get mean and standard deviation of the amount of elements in nucleus j
+        mean = parameters.means[j, amount_index]
+        sd = math.sqrt(float(parameters.cholesky[j, amount_index] @ parameters.cholesky[j, amount_index]))
+        if sd == 0:
+            expected_amount += parameters.probabilities[j] * max(round(mean), 1)
+            continue
+
+        # P(round(X) = k) for k >= 2, and P(round(X) <= 1) for the amount 1
+        cdf = lambda v: 0.5 * (1 + math.erf((v - mean) / (sd * math.sqrt(2))))
+        expected_nucleus = cdf(1.5)
+        for k in range(2, int(math.ceil(mean + 10 * sd)) + 2):
+            expected_nucleus += k * (cdf(k + 0.5) - cdf(k - 0.5))
+
+        expected_amount += parameters.probabilities[j] * expected_nucleus
+
+    return expected_amount
+
+def generate_points_for_elements(amount_elements: int, amount_column: str, generate_points, expected_amount: float):
+
+    """
+    This function generates the points of a GMM (residential addresses or workplaces) whose
+    amounts of elements (dwellings or households) sum up to the selected number of elements.
+
+    Parameters
+    ----------
+    amount_elements: int
+        Number of elements.
+
+    amount_column: str
+        Column of the points with their amount of elements.
+
+    generate_points: function
+        Function that takes a number of points and the ID of the first one and returns the
+        dataframe of the points (e.g., gmm_address).
+
+    expected_amount: float
+        Expected amount of elements of a point (see get_expected_amount), used to choose the
+        number of points generated at once.
+
+    Returns
+    -------
+    df_points : dataframe
+        Data set of points, whose amounts of elements sum up to amount_elements. The amount of
+        elements of its last point is the remainder of amount_elements (see the description of this script), so it is
+        biased.
+    """
+
+    if amount_elements <= 0:
+        raise Exception("The number of elements must be a positive integer.")
+
+    # Generate batches of points until the amounts of elements reach the selected number
+    batches = []
+    total = 0
+    first_id = 0
+    while total < amount_elements:
+        size = int(math.ceil((amount_elements - total) / max(expected_amount, 1.0) * (1 + POINTS_MARGIN))) + 1
+        df_points = generate_points(size, first_id)
+        batches.append(df_points)
+        total += int(df_points[amount_column].sum())
+        first_id += size
+
+    df_points = concat_shards(batches) if len(batches) > 1 else batches[0]
+
+    # Keep the points until the first one that reaches the selected number of elements
+    amounts = df_points[amount_column].to_numpy()
+    cumulative_amounts = np.cumsum(amounts, dtype=np.int64)
+    last = int(np.searchsorted(cumulative_amounts, amount_elements, side="left"))
+    df_points = df_points.iloc[:last + 1].copy()
+
+    # Reduce the amount of elements of the last point
+    df_points.iloc[last, df_points.columns.get_loc(amount_column)] = amount_elements - (cumulative_amounts[last] - amounts[last])
+
+    return df_points
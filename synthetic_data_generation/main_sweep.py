@@ -0,0 +1,61 @@
+# Main script to generate the synthetic data sets of a grid of configurations (parameter sweep)
+
+from code.options import ENGINES, OUTPUT_FORMATS, SCHEMAS
+import argparse
+import logging
+import sys
+
+# The guard is needed by the processes of the sweep
+if __name__ == "__main__":
+
+    print(sys.argv)
+
+    # Read arguments
+    parser = argparse.ArgumentParser(description="Generate synthetic dwelling and household data sets for a grid of configurations.")
+    parser.add_argument("city_name", type=str)
+    parser.add_argument("--addresses", type=int, nargs="+", required=True, dest="amounts_addresses",
+                        help="Numbers of residential addresses of the initial data sets.")
+    parser.add_argument("--proportions", type=float, nargs="+", required=True, dest="proportions_workplaces",
+                        help="Proportions of the number of residential addresses that correspond to the number of workplaces.")
+    parser.add_argument("--dwellings", type=int, nargs="+", required=True, dest="amounts_dwe",
+                        help="Numbers of dwellings of the final data sets.")
+    parser.add_argument("--households", type=int, nargs="+", required=True, dest="amounts_hhd",
+                        help="Numbers of households of the final data sets.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[10], help="Seeds of the random draws.")
+    parser.add_argument("--output", type=str, default="data/datasets/sweep", dest="output_path",
+                        help="Sub-directory of the data sets and of the manifest.")
+    parser.add_argument("--engine", choices=[engine for engine in ENGINES if engine != "legacy"], default="batched",
+                        help="Sampling engine (the legacy engine is not supported, see code/sweep.py).")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", dest="output_format",
+                        help="File format of the data sets (parquet and feather require pyarrow).")
+    parser.add_argument("--schema", choices=SCHEMAS, default="standard")
+    parser.add_argument("--workers", type=int, default=None, help="Maximum number of processes (one per CPU by default).")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Record the time, rows and memory of each stage and write them to this JSON file.")
+    parser.add_argument("--no-print-data", action="store_false", dest="print_data",
+                        help="Do not print the complete data sets.")
+    args = parser.parse_args()
+
+    # The generation is imported after the arguments are read
+    from code.sweep import get_sweep_grid, generate_sweep
+    from code.instrumentation import start_instrumentation, finish_instrumentation
+
+    # Start the instrumentation of the stages
+    if args.trace is not None:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.trace is not None or not args.print_data:
+        start_instrumentation(trace_path=args.trace, print_data=args.print_data)
+
+    # Generate the data sets of all the configurations
+    configurations = get_sweep_grid(args.amounts_addresses, args.proportions_workplaces, args.amounts_dwe,
+                                    args.amounts_hhd, args.seeds)
+    generate_sweep(configurations,
+                   city_name = args.city_name,
+                   param_path = "data/GMM_parameters/",
+                   output_path = args.output_path,
+                   engine = args.engine,
+                   output_format = args.output_format,
+                   schema = args.schema,
+                   max_workers = args.workers)
+
+    finish_instrumentation()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the reading and writing of the data sets (see code/dataset_io.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+import sys
+
+import pandas as pd
+import pytest
+
+from code.dataset_io import write_dataset, read_dataset
+
+@pytest.mark.parametrize("output_format", ["parquet", "feather"])
+def test_columnar_formats_without_pyarrow_raise(tmp_path, monkeypatch, output_format):
+
+    # A module set to None in sys.modules cannot be imported
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    path = str(tmp_path / ("data." + output_format))
+
+    with pytest.raises(Exception, match="pyarrow"):
+        write_dataset(pd.DataFrame({"a": [1, 2]}), path)
+
+    with pytest.raises(Exception, match="pyarrow"):
+        read_dataset(path)
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "feather"])
+def test_data_sets_are_read_as_written(tmp_path, output_format):
+
+    if output_format != "csv":
+        pytest.importorskip("pyarrow")
+
+    df = pd.DataFrame({"ID": [0, 1, 2], "value": [0.1, 1.0 / 3.0, 2.5]})
+    path = str(tmp_path / ("data." + output_format))
+    write_dataset(df, path)
+
+    pd.testing.assert_frame_equal(read_dataset(path, exact_floats=True), df)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the sampling engines of the initial data sets (see code/gmm_sampling.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+import contextlib
+import hashlib
+import io
+import os
+
+import numpy as np
+import pytest
+
+from code.create_gmm_data_dwe import create_initial_dwe_data
+from code.create_gmm_data_hhd import create_initial_hhd_data
+from code.create_final_datasets_from_initial_ones import reduce_initial_data
+from code.dataset_io import write_dataset, read_dataset
+
+# SHA-256 hashes of the data sets of "main.py city 2000 0.3 5000 4000" generated with the
+# original implementation
+ORIGINAL_HASHES = {"Addresses": "f50856037d60ac212bd46114a02eb35e2eaaa87844794e10c88e7266aeb19a13",
+                   "Houses": "de05acc7425abfd6dde3ac081e7feb78436e0afef4f307555bc76447e1f5bd45",
+                   "Workplaces": "4d19e1dc705663e7d354afd928124c22aa5b13499d634bb21c8168ffadc32738",
+                   "Households": "368e8763465d6737a36f35451064bfd029274d8e9aec5ebfc958e9f9e6b3a42f",
+                   "final Houses": "5ab5dd243e3342cd7b3a48890403b04a0dec159b953938e2ecada427c598204b",
+                   "final Households": "5ed014806b97b3eae401f825a12c6511006a0a6547d05153cc045b8fe4d527d5"}
+
+def generate_initial_data(engine: str, amount_addresses: int = 2000, proportion_workplaces: float = 0.3):
+
+    # Generate the initial data sets in memory (their messages are discarded)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_addr, df_dwe = create_initial_dwe_data(amount_addresses, proportion_workplaces, city_name="city", engine=engine, save=False,
+                                                  use_cache=False)
+        df_workplace, df_hhd = create_initial_hhd_data(amount_addresses, proportion_workplaces, city_name="city", engine=engine, save=False,
+                                                       use_cache=False)
+
+    return {"Addresses": df_addr, "Houses": df_dwe, "Workplaces": df_workplace, "Households": df_hhd}
+
+def get_hash(df, path: str):
+
+    write_dataset(df, path)
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def test_legacy_engine_reproduces_original_data_sets(tmp_path):
+
+    data_sets = generate_initial_data("legacy")
+    for name, df in data_sets.items():
+        assert get_hash(df, os.path.join(tmp_path, name + ".csv")) == ORIGINAL_HASHES[name], name
+
+    # The reduction reads the initial data sets back from their files, as create_final_data
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_dwe, df_hhd = reduce_initial_data(read_dataset(os.path.join(tmp_path, "Houses.csv")),
+                                             read_dataset(os.path.join(tmp_path, "Households.csv")), 5000, 4000, "legacy")
+    assert get_hash(df_dwe, os.path.join(tmp_path, "final_Houses.csv")) == ORIGINAL_HASHES["final Houses"]
+    assert get_hash(df_hhd, os.path.join(tmp_path, "final_Households.csv")) == ORIGINAL_HASHES["final Households"]
+
+@pytest.mark.parametrize("engine", ["batched", "philox"])
+def test_engines_generate_the_same_points_and_ids(engine):
+
+    legacy = generate_initial_data("legacy")
+    data_sets = generate_initial_data(engine)
+
+    for points, elements in [("Addresses", "Houses"), ("Workplaces", "Households")]:
+        df_points, df_elements = data_sets[points], data_sets[elements]
+        amount_column = "amount of dwellings per building" if points == "Addresses" else "hhd per workplace"
+
+        # Same number of points with the IDs 0, 1, ..., and the same columns
+        assert df_points.shape[0] == legacy[points].shape[0]
+        np.testing.assert_array_equal(df_points["ID"].to_numpy(), np.arange(df_points.shape[0]))
+        assert list(df_points.columns) == list(legacy[points].columns)
+        assert list(df_elements.columns) == list(legacy[elements].columns)
+
+        # Each point has as many elements as its amount, with the IDs "[ID of the point]_[index]"
+        assert df_elements.shape[0] == df_points[amount_column].sum()
+        expected_ids = [str(point_id) + "_" + str(index)
+                        for point_id, amount in zip(df_points["ID"], df_points[amount_column]) for index in range(amount)]
+        assert list(df_elements["ID"]) == expected_ids
+
+def test_batched_engine_is_deterministic():
+
+    first, second = generate_initial_data("batched", 500), generate_initial_data("batched", 500)
+    for name in first:
+        assert first[name].equals(second[name]), name
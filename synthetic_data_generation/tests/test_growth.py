@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the incremental growth of saved initial data sets (see code/growth.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+import contextlib
+import io
+import os
+
+import pytest
+
+from code.create_gmm_data_dwe import DWELLING_BRANCH, create_initial_dwe_data, grow_initial_dwe_data
+from code.create_gmm_data_hhd import create_initial_hhd_data, grow_initial_hhd_data
+from code.get_files import get_path_to_folder
+from code.initial_cache import get_initial_data_key, find_initial_data
+from code.growth import get_growth_state_path, read_growth_state
+from code.dataset_io import count_dataset_rows
+
+@pytest.fixture
+def data_paths(tmp_path):
+
+    # Sub-directories of a temporary directory, relative to "synthetic_data_generation" (see get_files.py)
+    for name in ["grown", "chunked"]:
+        os.makedirs(tmp_path / name)
+    return [os.path.relpath(tmp_path / name, get_path_to_folder("")) for name in ["grown", "chunked"]]
+
+def get_paths(data_path, amount_addresses):
+
+    return DWELLING_BRANCH.get_paths(get_path_to_folder(data_path), "city", amount_addresses, 0.3)
+
+def read_files(paths):
+
+    files = []
+    for path in paths:
+        with open(path, "rb") as f:
+            files.append(f.read())
+    return files
+
+# The first chunk has the saved points (2000 residential addresses or 600 workplaces). The
+# batched engine continues the draws of a single chunk, while the rows of the philox engine
+# only depend on their IDs
+@pytest.mark.parametrize("engine, amounts_new_addresses", [("batched", [500]), ("philox", [300, 200])])
+@pytest.mark.parametrize("create_initial_data, grow_initial_data, amount_points", [(create_initial_dwe_data, grow_initial_dwe_data, 2000),
+                                                                                   (create_initial_hhd_data, grow_initial_hhd_data, 600)])
+def test_growth_continues_the_chunks(data_paths, engine, amounts_new_addresses, create_initial_data, grow_initial_data, amount_points):
+
+    grown_path, chunked_path = data_paths
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_initial_data(2000, 0.3, city_name="city", data_path=grown_path, engine=engine, use_cache=False)
+        amount_addresses = 2000
+        for amount_new_addresses in amounts_new_addresses:
+            grow_initial_data(amount_addresses, amount_new_addresses, 0.3, city_name="city", data_path=grown_path)
+            amount_addresses += amount_new_addresses
+        create_initial_data(2500, 0.3, city_name="city", data_path=chunked_path, engine=engine, chunk_size=amount_points, use_cache=False)
+
+    grown_files = sorted(os.listdir(get_path_to_folder(grown_path)))
+    chunked_files = sorted(os.listdir(get_path_to_folder(chunked_path)))
+    data_files = [name for name in chunked_files if name.endswith(".csv")]
+
+    # Only the files of the extended data sets are left, with the rows of the chunks
+    assert grown_files == [name for name in chunked_files if not name.endswith(".meta.json")]
+    assert len(data_files) == 2
+    assert read_files([os.path.join(get_path_to_folder(grown_path), name) for name in data_files]) \
+        == read_files([os.path.join(get_path_to_folder(chunked_path), name) for name in data_files])
+
+def test_growth_state_counts_the_rows(data_paths):
+
+    grown_path = data_paths[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_initial_dwe_data(2000, 0.3, city_name="city", data_path=grown_path, use_cache=False)
+        df_addr, df_dwe = grow_initial_dwe_data(2000, 500, 0.3, city_name="city", data_path=grown_path)
+
+    state = read_growth_state(get_paths(grown_path, 2500)[0])
+    assert df_addr.shape[0] == 500 and df_addr["ID"].iloc[0] == 2000
+    assert state["amount_points"] == 2500
+    assert state["amount_elements"] == count_dataset_rows(get_paths(grown_path, 2500)[1])
+    assert not os.path.exists(get_growth_state_path(get_paths(grown_path, 2000)[0]))
+
+def test_grown_data_sets_replace_the_metadata_of_the_data_sets_of_their_names(data_paths):
+
+    grown_path = data_paths[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_addr, df_dwe = create_initial_dwe_data(2500, 0.3, city_name="city", data_path=grown_path)
+        expected_files = read_files(get_paths(grown_path, 2500))
+        create_initial_dwe_data(2000, 0.3, city_name="city", data_path=grown_path)
+        grow_initial_dwe_data(2000, 500, 0.3, city_name="city", data_path=grown_path)
+
+    # The grown data sets are not the ones generated at once with 2500 residential addresses
+    list_parameters = DWELLING_BRANCH.load_parameters(get_path_to_folder("data/GMM_parameters"), "city")
+    key = get_initial_data_key(list_parameters, 2500, 10, "batched", "standard")
+    assert not find_initial_data(key, list(get_paths(grown_path, 2500)))
+
+    # The data sets generated at once are restored from the cache
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        create_initial_dwe_data(2500, 0.3, city_name="city", data_path=grown_path)
+    assert "same inputs" in output.getvalue()
+    assert read_files(get_paths(grown_path, 2500)) == expected_files
+
+def test_invalid_growth_raises(data_paths):
+
+    grown_path = data_paths[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_initial_dwe_data(2000, 0.3, city_name="city", data_path=grown_path, num_shards=2, use_cache=False)
+
+        # Data sets generated in shards have no state file
+        with pytest.raises(Exception, match="no state file"):
+            grow_initial_dwe_data(2000, 500, 0.3, city_name="city", data_path=grown_path)
+
+        create_initial_dwe_data(2000, 0.3, city_name="city", data_path=grown_path, use_cache=False)
+        with pytest.raises(Exception, match="non-negative"):
+            grow_initial_dwe_data(2000, -1, 0.3, city_name="city", data_path=grown_path)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the cache of the initial data sets (see code/initial_cache.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+import contextlib
+import io
+import os
+
+import pytest
+
+from code.create_gmm_data_dwe import DWELLING_BRANCH, create_initial_dwe_data, grow_initial_dwe_data
+from code.get_files import get_path_to_folder
+from code.initial_cache import CACHE_DIRECTORY, get_initial_data_key, get_cached_paths, find_initial_data
+
+@pytest.fixture
+def data_path(tmp_path):
+
+    # Sub-directory of a temporary directory, relative to "synthetic_data_generation" (see get_files.py)
+    return os.path.relpath(tmp_path, get_path_to_folder(""))
+
+def create_data(data_path, **arguments):
+
+    # Generate the initial data sets and return them with the printed messages
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        df_addr, df_dwe = create_initial_dwe_data(1500, 0.3, city_name="city", data_path=data_path, **arguments)
+
+    return df_addr, df_dwe, output.getvalue()
+
+def get_paths(data_path, engine="batched", seed_value=10):
+
+    # Paths to the saved files and to the entry of the cache of the inputs
+    full_path = get_path_to_folder(data_path)
+    data_paths = list(DWELLING_BRANCH.get_paths(full_path, "city", 1500, 0.3, seed_value))
+    key = get_initial_data_key(DWELLING_BRANCH.load_parameters(get_path_to_folder("data/GMM_parameters"), "city"),
+                               1500, seed_value, engine, "standard")
+
+    return key, data_paths, get_cached_paths(key, data_paths)
+
+def assert_same_rows(df, expected):
+
+    # The data sets read from the files have the types of the files (e.g., no categories)
+    assert df.to_csv(index=False) == expected.to_csv(index=False)
+
+def read_file(path):
+
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_miss_writes_only_the_entry_and_hit_reads_it(data_path):
+
+    df_addr, df_dwe, output = create_data(data_path, save=False)
+    key, data_paths, cached_paths = get_paths(data_path)
+
+    assert "same inputs" not in output
+    assert not any(os.path.exists(path) for path in data_paths)
+    assert find_initial_data(key, cached_paths)
+
+    df_addr_hit, df_dwe_hit, output = create_data(data_path, save=False)
+
+    assert "same inputs" in output
+    assert_same_rows(df_addr_hit, df_addr)
+    assert_same_rows(df_dwe_hit, df_dwe)
+
+def test_cache_is_not_used_without_use_cache(data_path):
+
+    create_data(data_path, save=False, use_cache=False)
+
+    assert not os.path.exists(os.path.join(get_path_to_folder(data_path), CACHE_DIRECTORY))
+
+def test_other_inputs_miss_and_keep_the_entries_side_by_side(data_path):
+
+    _, df_dwe, _ = create_data(data_path)
+    key, data_paths, cached_paths = get_paths(data_path)
+    saved_file = read_file(data_paths[1])
+
+    # Another engine and another seed are other keys
+    _, df_dwe_philox, output = create_data(data_path, engine="philox")
+    assert "same inputs" not in output
+    assert not find_initial_data(key, data_paths)
+    key_philox, _, cached_paths_philox = get_paths(data_path, "philox")
+    assert key_philox != key
+    assert find_initial_data(key_philox, cached_paths_philox)
+
+    _, _, output = create_data(data_path, seed_value=11)
+    assert "same inputs" not in output
+    assert get_paths(data_path, seed_value=11)[0] != key
+
+    # The first entry is still in the cache and is restored at the names of the files
+    assert find_initial_data(key, cached_paths)
+    _, df_dwe_hit, output = create_data(data_path)
+
+    assert "same inputs" in output
+    assert read_file(data_paths[1]) == saved_file
+    assert_same_rows(df_dwe_hit, df_dwe)
+    assert not df_dwe_philox.equals(df_dwe)
+
+def test_growth_does_not_change_the_entry(data_path):
+
+    create_data(data_path)
+    key, data_paths, cached_paths = get_paths(data_path)
+    cached_files = [read_file(path) for path in cached_paths]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        grow_initial_dwe_data(1500, 500, 0.3, city_name="city", data_path=data_path)
+
+    assert [read_file(path) for path in cached_paths] == cached_files
+    assert find_initial_data(key, cached_paths)
+    assert not any(os.path.exists(path) for path in data_paths)
+
+    # The entry is restored at the names of the files
+    _, _, output = create_data(data_path)
+    assert "same inputs" in output
+    assert [read_file(path) for path in data_paths] == cached_files
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the lazy views of the data sets of the "philox" engine (see code/lazy_dataset.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from code.create_gmm_data_dwe import create_initial_dwe_data
+from code.create_gmm_data_hhd import create_initial_hhd_data
+from code.lazy_dataset import LazyDataset
+
+@pytest.mark.parametrize("data_set, create_initial_data, amount_points",
+                         [("Houses", create_initial_dwe_data, 2000), ("Households", create_initial_hhd_data, 600)])
+def test_view_matches_the_complete_data_set(data_set, create_initial_data, amount_points):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_points, df_elements = create_initial_data(2000, 0.3, city_name="city", engine="philox", save=False, use_cache=False)
+
+    view = LazyDataset(data_set, amount_points, "city", batch_size=333)
+    df = view.to_dataframe()
+
+    # The grid cells of the batches are merged into one categorical column
+    assert isinstance(df["Gitter_ID_100m"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(df, df_elements, check_categorical=False)
+    pd.testing.assert_frame_equal(view.to_dataframe(points=True), df_points, check_categorical=False)
+
+    # A range of IDs gives the rows of these points
+    df_range = view.filter(ids=(100, 250)).to_dataframe(points=True)
+    pd.testing.assert_frame_equal(df_range, df_points.iloc[100:250].reset_index(drop=True), check_categorical=False)
+
+def test_empty_view_keeps_the_columns():
+
+    view = LazyDataset("Houses", 2000, "city")
+    df = view.to_dataframe()
+    df_empty = view.filter(ids=(500, 500)).to_dataframe()
+    df_points_empty = view.filter(ids=(500, 500)).to_dataframe(points=True)
+
+    assert df_empty.shape[0] == 0 and df_points_empty.shape[0] == 0
+    assert list(df_empty.columns) == list(df.columns)
+    assert list(df_points_empty.columns) == list(view.to_dataframe(points=True).columns)
+
+    # The IDs of the dwellings are strings (object or str, depending on the version of pandas), and
+    # the grid cells are categorical without categories
+    pd.testing.assert_series_equal(df_empty.dtypes.drop("ID").astype(str), df.dtypes.drop("ID").astype(str))
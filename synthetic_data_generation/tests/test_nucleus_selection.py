@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the selection of the nuclei of the points (see code/nucleus_selection.py).
+"""
+
+import numpy as np
+import pytest
+
+from code.nucleus_selection import NucleusSelector
+
+PROBABILITIES = [0.1, 0.0, 0.25, 0.05, 0.6]
+
+def select_by_linear_scan(probabilities, u):
+
+    # Selection of the original implementation
+    cumulative = 0
+    for i, w in enumerate(probabilities):
+        cumulative += w
+        if u <= cumulative:
+            return i
+    return len(probabilities) - 1
+
+def test_searchsorted_matches_linear_scan():
+
+    uniforms = np.random.default_rng(0).random(10000)
+    selector = NucleusSelector(PROBABILITIES)
+
+    assert list(selector.select(uniforms)) == [select_by_linear_scan(PROBABILITIES, u) for u in uniforms]
+
+@pytest.mark.parametrize("method", ["searchsorted", "alias"])
+def test_selection_follows_probabilities(method):
+
+    # With a regular grid of numbers, the proportion of each nucleus is its probability
+    size = 100000
+    uniforms = (np.arange(size) + 0.5) / size
+    nuclei_selected, counts = NucleusSelector(PROBABILITIES, method).select(uniforms, return_counts=True)
+
+    np.testing.assert_allclose(counts / size, PROBABILITIES, atol=len(PROBABILITIES) / size)
+    np.testing.assert_array_equal(np.bincount(nuclei_selected, minlength=len(PROBABILITIES)), counts)
+    assert counts[1] == 0
+
+@pytest.mark.parametrize("method", ["searchsorted", "alias"])
+def test_selection_never_exceeds_last_nucleus(method):
+
+    # Probabilities whose sum is slightly smaller than 1
+    selector = NucleusSelector([0.5, 0.4999999], method)
+
+    assert selector.select([np.nextafter(1.0, 0.0)])[0] in (0, 1)
+
+@pytest.mark.parametrize("probabilities", [[0.5, 0.4], [0.5, 0.6], [], [1.2, -0.2]])
+def test_invalid_probabilities_raise(probabilities):
+
+    with pytest.raises(Exception):
+        NucleusSelector(probabilities)
+
+def test_sum_error_names_the_sum():
+
+    with pytest.raises(Exception, match="sum to 1"):
+        NucleusSelector([0.5, 0.4])
+
+def test_unknown_method_raises():
+
+    with pytest.raises(Exception, match="selection method"):
+        NucleusSelector(PROBABILITIES, "inverse")
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the counter-based generator of the "philox" engine (see code/philox.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from code.philox import philox4x32, PhiloxGenerator
+from code.get_files import get_path_to_folder
+from code.gmm_parameters import load_gmm_parameters
+from code.create_gmm_data_dwe import gmm_address, gmm_dwelling
+from code.create_gmm_data_hhd import gmm_workplace, gmm_hhd
+from code.sharding import concat_shards
+
+# Known-answer vectors of Philox4x32-10 of Random123 (counter, key, result)
+KNOWN_ANSWERS = [([0x00000000, 0x00000000, 0x00000000, 0x00000000], [0x00000000, 0x00000000],
+                  [0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8]),
+                 ([0xffffffff, 0xffffffff, 0xffffffff, 0xffffffff], [0xffffffff, 0xffffffff],
+                  [0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd]),
+                 ([0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344], [0xa4093822, 0x299f31d0],
+                  [0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1])]
+
+@pytest.mark.parametrize("counter, key, result", KNOWN_ANSWERS)
+def test_known_answers(counter, key, result):
+
+    assert [int(word) for word in philox4x32(counter, key)] == result
+
+def test_known_answers_vectorized():
+
+    # The rows of a vectorized call are the same as the single calls
+    counters = np.array([counter for counter, _, _ in KNOWN_ANSWERS], dtype=np.uint64).T
+    words = philox4x32(list(counters), [0, 0])
+
+    assert [int(word[0]) for word in words] == KNOWN_ANSWERS[0][2]
+    assert [int(word) for word in philox4x32(list(counters[:, 1]), [0, 0])] == [int(word[1]) for word in words]
+
+def test_rows_depend_only_on_ids():
+
+    rng = PhiloxGenerator(10, "addresses")
+    ids = np.arange(1000)
+
+    np.testing.assert_array_equal(rng.uniform(ids)[500:], rng.uniform(ids[500:]))
+    np.testing.assert_array_equal(rng.normal(ids, 5, first_block=1)[[3, 700]], rng.normal(np.array([3, 700]), 5, first_block=1))
+    assert not np.array_equal(rng.uniform(ids), PhiloxGenerator(11, "addresses").uniform(ids))
+    assert not np.array_equal(rng.uniform(ids), rng.for_table("workplaces").uniform(ids))
+
+@pytest.mark.parametrize("generate_points, generate_elements, kinds",
+                         [(gmm_address, gmm_dwelling, ("addresses", "houses")),
+                          (gmm_workplace, gmm_hhd, ("workplaces", "hhd"))])
+def test_chunks_match_complete_data_set(generate_points, generate_elements, kinds):
+
+    param_path = get_path_to_folder("data/GMM_parameters")
+    list_param_points = load_gmm_parameters(param_path, "city", kinds[0])
+    list_param_elements = load_gmm_parameters(param_path, "city", kinds[1])
+    amount_points, chunk_size = 2500, 700
+
+    def generate(size, first_id):
+        df_points = generate_points(size, list_param_points, "philox", first_id=first_id, rng=PhiloxGenerator(10))
+        return df_points, generate_elements(df_points, list_param_elements, "philox", rng=PhiloxGenerator(10))
+
+    # Generate the data sets at once and in chunks of points (np.random must not be used)
+    np.random.seed(0)
+    df_points, df_elements = generate(amount_points, 0)
+    np.random.seed(1)
+    chunks = [generate(min(chunk_size, amount_points - first_id), first_id) for first_id in range(0, amount_points, chunk_size)]
+
+    # The order of the categories of the grid cells depends on the chunks
+    pd.testing.assert_frame_equal(concat_shards([chunk[0] for chunk in chunks]), df_points, check_categorical=False)
+    pd.testing.assert_frame_equal(concat_shards([chunk[1] for chunk in chunks]), df_elements, check_categorical=False)
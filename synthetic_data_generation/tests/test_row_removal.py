@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the selection of the rows removed from the initial data sets (see
+code/create_final_datasets_from_initial_ones.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+import numpy as np
+import pytest
+
+from code.create_final_datasets_from_initial_ones import get_rows_to_remove, get_reduction_generators, seed_reduction
+
+def get_original_indices(original_amount: int, amount_to_remove: int):
+
+    # Loop of the original implementation of create_final_data
+    list_indices_to_remove = []
+    while len(list_indices_to_remove) < amount_to_remove:
+        index = np.random.randint(0, original_amount-1)
+        if index not in list_indices_to_remove:
+            list_indices_to_remove.append(index)
+
+    return list_indices_to_remove
+
+@pytest.mark.parametrize("original_amount, amount_to_remove", [(10, 0), (10, 1), (10, 9), (500, 250), (2000, 1999), (5000, 1000)])
+def test_legacy_engine_replays_the_original_loop(original_amount, amount_to_remove):
+
+    np.random.seed(10)
+    expected = np.zeros(original_amount, dtype=bool)
+    expected[get_original_indices(original_amount, amount_to_remove)] = True
+    expected_state = np.random.get_state()
+
+    np.random.seed(10)
+    rows_to_remove = get_rows_to_remove(original_amount, amount_to_remove, "legacy")
+    state = np.random.get_state()
+
+    np.testing.assert_array_equal(rows_to_remove, expected)
+
+    # The next random draws (e.g., the ones of the household data set) must not change
+    assert state[0] == expected_state[0]
+    np.testing.assert_array_equal(state[1], expected_state[1])
+    assert state[2:] == expected_state[2:]
+
+def test_legacy_engine_replays_consecutive_reductions():
+
+    np.random.seed(10)
+    expected = [get_original_indices(3000, 800), get_original_indices(2500, 2000)]
+
+    np.random.seed(10)
+    masks = [get_rows_to_remove(3000, 800, "legacy"), get_rows_to_remove(2500, 2000, "legacy")]
+
+    for mask, indices in zip(masks, expected):
+        np.testing.assert_array_equal(np.flatnonzero(mask), np.sort(indices))
+
+def test_seed_reduction_replays_the_previous_reductions():
+
+    np.random.seed(10)
+    get_rows_to_remove(3000, 800, "legacy")
+    expected = get_rows_to_remove(2500, 2000, "legacy")
+
+    rng = seed_reduction("legacy", [(3000, 2200)], 10, "household")
+    assert rng is None
+    np.testing.assert_array_equal(get_rows_to_remove(2500, 2000, "legacy"), expected)
+
+def test_batched_reductions_use_independent_streams():
+
+    rng_dwe, rng_hhd = get_reduction_generators("batched", 10)
+    expected_dwe = get_rows_to_remove(3000, 800, "batched", rng_dwe)
+    expected_hhd = get_rows_to_remove(2500, 2000, "batched", rng_hhd)
+
+    # The household data set does not depend on the reduction of the dwelling data set
+    np.testing.assert_array_equal(get_rows_to_remove(2500, 2000, "batched", seed_reduction("batched", [(3000, 2200)], 10, "household")),
+                                  expected_hhd)
+    np.testing.assert_array_equal(get_rows_to_remove(2500, 2000, "batched", seed_reduction("batched", (), 10, "household")),
+                                  expected_hhd)
+    np.testing.assert_array_equal(get_rows_to_remove(3000, 800, "batched", seed_reduction("batched", (), 10, "dwelling")),
+                                  expected_dwe)
+
+    # Other seeds give other rows
+    rng_dwe, rng_hhd = get_reduction_generators("batched", 11)
+    assert not np.array_equal(get_rows_to_remove(3000, 800, "batched", rng_dwe), expected_dwe)
+
+@pytest.mark.parametrize("engine", ["batched", "legacy"])
+def test_amount_of_rows_to_remove(engine):
+
+    np.random.seed(10)
+    rows_to_remove = get_rows_to_remove(1000, 321, engine)
+
+    assert rows_to_remove.dtype == bool
+    assert rows_to_remove.shape == (1000,)
+    assert rows_to_remove.sum() == 321
+
+def test_batched_engine_can_remove_all_rows():
+
+    np.random.seed(10)
+    assert get_rows_to_remove(100, 100, "batched").all()
+
+def test_legacy_engine_never_removes_the_last_row():
+
+    np.random.seed(10)
+    assert not get_rows_to_remove(100, 99, "legacy")[-1]
+
+@pytest.mark.parametrize("engine, amount_to_remove", [("batched", -1), ("batched", 101), ("legacy", 100)])
+def test_invalid_amounts_raise(engine, amount_to_remove):
+
+    with pytest.raises(Exception):
+        get_rows_to_remove(100, amount_to_remove, engine)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the checks of the jobs and of the order of the jobs of the generation service (see
+code/service.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import os
+
+import pytest
+
+import code.service as service
+import code.create_final_datasets_from_initial_ones as final_data
+from code.service import GenerationService, get_job, get_job_files, run_job
+
+def get_test_job(kind: str, **arguments):
+
+    # Job of a small municipality with all its arguments
+    request = {"kind": kind, "city_name": "city", "amount_addresses": 1000, "proportion_workplaces": 0.3}
+    if kind in ("generate", "final"):
+        request.update(amount_dwe=900, amount_hhd=800)
+    request.update(arguments)
+    return get_job(request)
+
+@pytest.mark.parametrize("arguments", [{"amount_addresses": 0}, {"amount_addresses": -5}, {"amount_addresses": 10.5},
+                                       {"amount_addresses": "1000"}, {"amount_addresses": True}, {"amount_dwe": 0},
+                                       {"amount_hhd": None}, {"proportion_workplaces": -0.1}, {"proportion_workplaces": 1.5},
+                                       {"proportion_workplaces": "0.3"}, {"seed_value": -1}, {"seed_value": 2**32},
+                                       {"seed_value": 1.0}, {"use_cache": "yes"}, {"engine": "other"}, {"city_name": 3}])
+def test_invalid_arguments_are_rejected(arguments):
+
+    with pytest.raises(Exception):
+        get_test_job("generate", **arguments)
+
+def test_valid_arguments_are_completed():
+
+    job = get_test_job("final", proportion_workplaces=0, seed_value=2**32 - 1)
+
+    assert job["engine"] == "batched" and job["output_format"] == "csv" and job["seed_value"] == 2**32 - 1
+    with pytest.raises(Exception):
+        get_job({"kind": "final", "city_name": "city"})
+    with pytest.raises(Exception):
+        get_test_job("initial_dwe", amount_dwe=10)
+
+def test_final_jobs_read_the_initial_data_sets_of_their_seed():
+
+    read_paths, write_paths = get_job_files(get_test_job("final", seed_value=11))
+
+    assert read_paths == [get_job_files(get_test_job("initial_dwe", seed_value=11))[1][1],
+                          get_job_files(get_test_job("initial_hhd", seed_value=11))[1][1]]
+    assert all("seed=11" in os.path.basename(path) for path in read_paths + write_paths)
+    assert read_paths[0] not in get_job_files(get_test_job("initial_dwe"))[1]
+
+@pytest.fixture
+def events(monkeypatch):
+
+    # The jobs run in threads and only record when they start and end
+    events = []
+    failures = {"initial_dwe": "no parameters"}
+    barrier = threading.Barrier(2, timeout=10)
+
+    def run_fake_job(job):
+        events.append(("start", job["kind"], job["city_name"]))
+        if job["city_name"] == "concurrent":
+            barrier.wait()
+        time.sleep(0.05)
+        events.append(("end", job["kind"], job["city_name"]))
+        if job["city_name"] == "failing" and job["kind"] in failures:
+            raise Exception(failures[job["kind"]])
+        return {"files": []}
+
+    monkeypatch.setattr(service, "run_job", run_fake_job)
+    return events
+
+@pytest.fixture
+def generation_service():
+
+    generation_service = GenerationService(port=0, max_workers=2)
+    generation_service.executor.shutdown()
+    generation_service.executor = ThreadPoolExecutor(max_workers=2)
+    yield generation_service
+    generation_service.server_close()
+
+def test_final_job_waits_for_the_initial_jobs(events, generation_service):
+
+    futures = [generation_service.submit(get_test_job(kind)) for kind in ["initial_dwe", "initial_hhd", "final"]]
+    for future in futures:
+        future.result(timeout=10)
+
+    assert events.index(("start", "final", "city")) > events.index(("end", "initial_dwe", "city"))
+    assert events.index(("start", "final", "city")) > events.index(("end", "initial_hhd", "city"))
+
+def test_writer_waits_for_the_previous_readers(events, generation_service):
+
+    futures = [generation_service.submit(get_test_job(kind)) for kind in ["final", "initial_hhd"]]
+    for future in futures:
+        future.result(timeout=10)
+
+    assert events.index(("start", "initial_hhd", "city")) > events.index(("end", "final", "city"))
+
+def test_jobs_with_other_files_run_concurrently(events, generation_service):
+
+    # Both jobs must be running at the same time to pass the barrier
+    futures = [generation_service.submit(get_test_job("initial_dwe", city_name="concurrent", seed_value=seed_value))
+               for seed_value in [1, 2]]
+    for future in futures:
+        assert future.result(timeout=10) == {"files": []}
+
+def test_jobs_reading_the_files_of_a_failed_job_fail(events, generation_service):
+
+    futures = [generation_service.submit(get_test_job(kind, city_name="failing"))
+               for kind in ["initial_dwe", "initial_hhd", "final", "initial_dwe"]]
+
+    with pytest.raises(Exception, match="no parameters"):
+        futures[0].result(timeout=10)
+    with pytest.raises(Exception, match="no parameters"):
+        futures[2].result(timeout=10)
+
+    # The final job did not run, but the jobs that do not read the files of the failed job did
+    assert ("start", "final", "failing") not in events
+    assert futures[1].result(timeout=10) == {"files": []}
+    with pytest.raises(Exception, match="no parameters"):
+        futures[3].result(timeout=10)
+    assert events.count(("start", "initial_dwe", "failing")) == 2
+
+def test_final_job_reports_the_written_files(monkeypatch, tmp_path):
+
+    paths = [str(tmp_path / "Houses.csv"), str(tmp_path / "Households.csv")]
+    monkeypatch.setattr(final_data, "create_final_data", lambda **arguments: tuple(paths))
+
+    with pytest.raises(Exception, match="did not write"):
+        run_job(get_test_job("final"))
+
+    for path in paths:
+        open(path, "w").close()
+    assert run_job(get_test_job("final"))["files"] == paths
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the generation of data sets with an exact number of elements (see
+code/target_size.py).
+
+Run them with "python -m pytest tests" at the sub-directory "synthetic_data_generation".
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from code.create_gmm_data_dwe import create_exact_dwe_data, gmm_address
+from code.create_gmm_data_hhd import create_exact_hhd_data
+from code.gmm_parameters import load_gmm_parameters
+from code.get_files import get_path_to_folder
+from code.target_size import get_expected_amount, generate_points_for_elements
+from code.dataset_io import get_final_df_name
+
+def generate_fake_points(size: int, first_id: int):
+
+    # Points with the amounts 1, 2, 3, 1, 2, 3, ...
+    ids = np.arange(first_id, first_id + size)
+    return pd.DataFrame({"ID": ids, "amount": ids % 3 + 1})
+
+@pytest.mark.parametrize("amount_elements", [1, 2, 3, 4, 5, 6, 100, 1001])
+def test_points_sum_up_to_the_number_of_elements(amount_elements):
+
+    df_points = generate_points_for_elements(amount_elements, "amount", generate_fake_points, 2.0)
+    expected = generate_fake_points(df_points.shape[0], 0)
+
+    assert df_points["amount"].sum() == amount_elements
+    np.testing.assert_array_equal(df_points["ID"], expected["ID"])
+
+    # Only the amount of the last point is reduced, and it is still positive
+    np.testing.assert_array_equal(df_points["amount"].to_numpy()[:-1], expected["amount"].to_numpy()[:-1])
+    assert 1 <= df_points["amount"].iloc[-1] <= expected["amount"].iloc[-1]
+    assert expected["amount"].iloc[:-1].sum() < amount_elements
+
+def test_points_are_generated_in_batches_with_consecutive_ids():
+
+    # An overestimated expected amount leads to several batches
+    sizes = []
+    def generate_points(size, first_id):
+        sizes.append(size)
+        return generate_fake_points(size, first_id)
+
+    df_points = generate_points_for_elements(1000, "amount", generate_points, 50.0)
+
+    assert len(sizes) > 1
+    assert df_points["amount"].sum() == 1000
+    np.testing.assert_array_equal(df_points["ID"], np.arange(df_points.shape[0]))
+
+def test_invalid_number_of_elements_raises():
+
+    with pytest.raises(Exception):
+        generate_points_for_elements(0, "amount", generate_fake_points, 2.0)
+
+def test_expected_amount_matches_the_sampled_points():
+
+    parameters = load_gmm_parameters(get_path_to_folder("data/GMM_parameters"), "city", "addresses")
+    np.random.seed(10)
+    df_addr = gmm_address(50000, parameters)
+
+    expected_amount = get_expected_amount(parameters)
+    assert df_addr["amount of dwellings per building"].mean() == pytest.approx(expected_amount, rel=0.02)
+
+@pytest.mark.parametrize("engine", ["batched", "legacy", "philox"])
+@pytest.mark.parametrize("create_exact_data, amount_column", [(create_exact_dwe_data, "amount of dwellings per building"),
+                                                              (create_exact_hhd_data, "hhd per workplace")])
+def test_data_sets_have_exactly_the_selected_size(engine, create_exact_data, amount_column):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_points, df_elements = create_exact_data(3001, city_name="city", engine=engine)
+
+    assert df_elements.shape[0] == 3001
+    assert df_points[amount_column].sum() == 3001
+
+def test_data_sets_depend_on_the_seed():
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_addr, df_dwe = create_exact_dwe_data(2000, city_name="city")
+        df_addr_same, df_dwe_same = create_exact_dwe_data(2000, city_name="city", seed_value=10)
+        df_addr_other, df_dwe_other = create_exact_dwe_data(2000, city_name="city", seed_value=11)
+
+    pd.testing.assert_frame_equal(df_dwe, df_dwe_same)
+    assert df_dwe_other.shape[0] == 2000
+    assert not df_addr.iloc[:10].equals(df_addr_other.iloc[:10])
+
+def test_names_of_the_exact_data_sets_are_tagged():
+
+    assert get_final_df_name("Houses", "city", 5000, 4000) == "Houses_city5000(4000hhd)seed=10.csv"
+    assert get_final_df_name("Houses", "city", 5000, 4000, 11, "parquet", exact=True) == "Houses_city5000(4000hhd,exact)seed=11.parquet"